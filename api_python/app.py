@@ -6,24 +6,29 @@ API Python para procesamiento eficiente de archivos Excel
 Sistema de Facturación - Módulo Python
 """
 
+import time
+T_INICIO = time.perf_counter()  # Para medir el tiempo de arranque
+
 import os
 import sys
 import json
+import atexit
 import logging
 import tempfile
-import time
+import threading
 import traceback
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 
 # Configurar logging
+LOG_FORMATO = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_ARCHIVO = os.path.join(os.path.dirname(__file__), 'logs', 'api_python.log')
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=LOG_FORMATO,
     handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(__file__), 'logs', 'api_python.log')),
+        logging.FileHandler(LOG_ARCHIVO),
         logging.StreamHandler()
     ]
 )
@@ -38,32 +43,408 @@ CORS(app)  # Habilitar CORS para todas las rutas
 
 # Configuración
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
-app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
-
-# Importar procesadores
-try:
-    from procesadores.recepcion_procesador import RecepcionProcesador
-    from procesadores.despacho_procesador import DespachoProcesador
-    from procesadores.paquete_procesador import PaqueteProcesador
-    from procesadores.almacen_procesador import AlmacenProcesador
-    logger.info("Procesadores importados correctamente")
-except Exception as e:
-    logger.error(f"Error importando procesadores: {e}")
-    raise
-
-# Diccionario de procesadores
-PROCESADORES = {
-    'recepcion': RecepcionProcesador(),
-    'despacho': DespachoProcesador(),
-    'paquete': PaqueteProcesador(),
-    'almacen': AlmacenProcesador()
-}
+app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()  # Solo subidas mayores a UPLOAD_MAX_EN_MEMORIA
+app.config['UPLOAD_MAX_EN_MEMORIA'] = 64 * 1024 * 1024  # Subidas hasta 64MB sin tocar disco
+app.config['RESULTADOS_TTL'] = 15 * 60  # Segundos que se guarda un resultado paginable
+app.config['RESULTADOS_MAX'] = 20  # Resultados paginables en memoria a la vez
+app.config['RESULTADOS_LIMITE_PAGINA'] = 10000  # Máximo de filas por página
+app.config['CACHE_HABILITADA'] = True  # Reutilizar frames normalizados de archivos ya subidos
+app.config['CACHE_DIR'] = os.path.join(tempfile.gettempdir(), 'portal_facturacion_cache')
+app.config['CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 2GB
+# 'procesos' (pool de procesos) o 'hilos' (en el hilo de la petición). servidor.py usa 'hilos'
+# cuando ya hay varios workers pre-fork
+app.config['EJECUTOR'] = os.environ.get('API_EJECUTOR', 'procesos')
+app.config['PROCESOS_WORKERS'] = max(1, min(4, os.cpu_count() or 1))
+app.config['PROCESOS_MAX_TRABAJOS'] = 50  # Reciclar workers tras N procesamientos
+app.config['PROCESOS_MAX_RSS_MB'] = 1536  # ... o al superar esta memoria residente
+# Recepción/despacho: si el camino en memoria se estima por encima de esto, se procesa por bloques
+app.config['MEMORIA_MAX_MB'] = int(os.environ.get('API_MEMORIA_MAX_MB', '1024'))
+# Memoria estimada de todos los procesamientos en curso a la vez (0 = sin límite); lo que no
+# entra prueba el camino por bloques, espera en cola y, pasada la espera, se rechaza
+app.config['MEMORIA_GLOBAL_MB'] = int(os.environ.get('API_MEMORIA_GLOBAL_MB', '3072'))
+app.config['MEMORIA_ESPERA_MAX'] = 60  # Segundos en cola por memoria (/procesar)
+app.config['MEMORIA_ESPERA_TRABAJOS'] = 15 * 60  # ... y para trabajos asíncronos (/jobs)
+# tracemalloc: pico de memoria asignada por etapa en la metadata (hace más lento el procesamiento)
+app.config['MEMORIA_TRAZAR'] = os.environ.get('API_MEMORIA_TRAZAR', '0') == '1'
+app.config['TRABAJOS_WORKERS'] = app.config['PROCESOS_WORKERS']  # Trabajos asíncronos (/jobs) a la vez
+app.config['TRABAJOS_TTL'] = 15 * 60  # Segundos que se conserva un trabajo terminado
+# Directorio para compartir trabajos y resultados paginables entre workers (None = solo memoria)
+app.config['ESTADO_DIR'] = os.environ.get('API_ESTADO_DIR') or None
+# Escritura directa del detalle en la BD ('odbc:<cadena>' o 'sqlite:<ruta>'; vacío = desactivada)
+app.config['PERSISTENCIA_DESTINO'] = os.environ.get('API_DB_DESTINO') or None
+app.config['PERSISTENCIA_FILAS_POR_LOTE'] = 5000
+app.config['ARRANQUE_CALENTAR'] = os.environ.get('API_CALENTAR', '1') == '1'  # Libro sintético al arrancar
+app.config['ARRANQUE_ESPERA_MAX'] = 60  # Segundos que una petición espera a que la API esté lista
+
+# Módulos livianos (sin pandas); pandas y los procesadores se cargan en cargar_componentes()
+from utils.trabajos import GestorTrabajos, Trabajo
+from utils.ejecutor_procesos import EjecutorProcesos
+from utils.metricas import CronometroEtapas, RegistroMetricas, ejecutar_medido
+from utils.presupuesto_memoria import PresupuestoMemoria, MemoriaInsuficiente, planificar
+from utils import subidas
+
+# Componentes pesados: quedan en None hasta que cargar_componentes() termina
+pd = None
+SerializadorJSON = MIME_JSON = MIME_NDJSON = None
+SerializadorBinario = None
+ResultadoNoEncontrado = CampoNoValido = None
+CACHE = None
+PROCESADORES = {}
+RESULTADOS = None
+PERSISTENCIA = None
+
+# Tiempos y memoria por etapa, filas y bytes por tipo (expuestos en /metrics)
+METRICAS = RegistroMetricas()
+
+# Memoria estimada reservada por los procesamientos en curso
+PRESUPUESTO = PresupuestoMemoria(app.config['MEMORIA_GLOBAL_MB'], espera_max=app.config['MEMORIA_ESPERA_MAX'])
+
+# Estado del arranque (expuesto en /health)
+LISTO = threading.Event()
+ARRANQUE = {'ready': False, 'calentado': False, 'error': None, 'tiempos': {}}
+
+class SolicitudAPI(Request):
+    """Request que guarda las subidas en memoria o en un temporal que se borra al cerrar"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return subidas.crear_stream(total_content_length, app.config['UPLOAD_MAX_EN_MEMORIA'],
+                                    app.config['UPLOAD_FOLDER'])
+
+app.request_class = SolicitudAPI
+
+ESTADO_DIR = app.config['ESTADO_DIR']
+
+# Trabajos asíncronos (POST /jobs/<tipo>, GET /jobs/<job_id>)
+TRABAJOS = GestorTrabajos(max_workers=app.config['TRABAJOS_WORKERS'],
+                          ttl=app.config['TRABAJOS_TTL'],
+                          directorio=os.path.join(ESTADO_DIR, 'trabajos') if ESTADO_DIR else None)
+
+# Pool de procesos para los procesadores (None = se procesa en el hilo de la petición)
+EJECUTOR = None
+if app.config['EJECUTOR'] == 'procesos':
+    EJECUTOR = EjecutorProcesos(workers=app.config['PROCESOS_WORKERS'],
+                                max_trabajos=app.config['PROCESOS_MAX_TRABAJOS'],
+                                max_rss_mb=app.config['PROCESOS_MAX_RSS_MB'],
+                                archivo_log=LOG_ARCHIVO, formato_log=LOG_FORMATO,
+                                trazar_memoria=app.config['MEMORIA_TRAZAR'])
+elif app.config['MEMORIA_TRAZAR']:
+    import tracemalloc
+    tracemalloc.start()
+
+_recursos_cerrados = False
+
+def cerrar_recursos():
+    """Apagado ordenado: termina los trabajos en curso y cierra el pool de procesos"""
+    global _recursos_cerrados
+    if _recursos_cerrados:
+        return
+    _recursos_cerrados = True
+    logger.info("Cerrando trabajos en curso y pool de procesos...")
+    TRABAJOS.cerrar(esperar=True)
+    if EJECUTOR is not None:
+        EJECUTOR.cerrar(esperar=True)
+
+atexit.register(cerrar_recursos)
+
+def cargar_componentes(calentar_en_pool=True):
+    """
+    Importa pandas, serializador y procesadores y arma los componentes
+    
+    Se separa del import de app.py para que el servidor pueda escuchar (y
+    responder /health) en milisegundos; ver iniciar_componentes().
+    
+    Args:
+        calentar_en_pool: Calentar también el pool de procesos (False antes
+            de un fork: el pool se crearía en el master)
+    """
+    global pd, SerializadorJSON, MIME_JSON, MIME_NDJSON, SerializadorBinario, ResultadoNoEncontrado, CampoNoValido
+    global CACHE, PROCESADORES, RESULTADOS, PERSISTENCIA
+    
+    try:
+        inicio = time.perf_counter()
+        import pandas as pd
+        from utils.serializador import SerializadorJSON, MIME_JSON, MIME_NDJSON
+        from utils.serializador_binario import SerializadorBinario
+        from utils.almacen_resultados import AlmacenResultados, ResultadoNoEncontrado, CampoNoValido
+        from utils.cache_resultados import CacheResultados
+        from utils.persistencia import crear_destino
+        from procesadores.recepcion_procesador import RecepcionProcesador
+        from procesadores.despacho_procesador import DespachoProcesador
+        from procesadores.paquete_procesador import PaqueteProcesador
+        from procesadores.almacen_procesador import AlmacenProcesador
+        ARRANQUE['tiempos']['importaciones_s'] = round(time.perf_counter() - inicio, 3)
+        logger.info("Procesadores importados correctamente")
+        
+        # Cache en disco compartida por todos los workers (clave = hash del archivo + tipo)
+        if app.config['CACHE_HABILITADA']:
+            CACHE = CacheResultados(app.config['CACHE_DIR'], max_bytes=app.config['CACHE_MAX_BYTES'])
+        
+        # Diccionario de procesadores
+        PROCESADORES = {
+            'recepcion': RecepcionProcesador(cache=CACHE, memoria_max_mb=app.config['MEMORIA_MAX_MB']),
+            'despacho': DespachoProcesador(cache=CACHE, memoria_max_mb=app.config['MEMORIA_MAX_MB']),
+            'paquete': PaqueteProcesador(),
+            'almacen': AlmacenProcesador()
+        }
+        
+        # Resultados procesados disponibles para paginar (GET /resultados/<request_id>)
+        RESULTADOS = AlmacenResultados(ttl=app.config['RESULTADOS_TTL'],
+                                       max_entradas=app.config['RESULTADOS_MAX'],
+                                       directorio=os.path.join(ESTADO_DIR, 'resultados') if ESTADO_DIR else None)
+        
+        # Destino para guardar el detalle directo en la BD (factura_id en la petición)
+        PERSISTENCIA = crear_destino(app.config['PERSISTENCIA_DESTINO'],
+                                     filas_por_lote=app.config['PERSISTENCIA_FILAS_POR_LOTE'])
+    except Exception as e:
+        logger.error(f"Error importando procesadores: {e}", exc_info=True)
+        ARRANQUE['error'] = str(e)
+        LISTO.set()
+        raise
+    
+    ARRANQUE['ready'] = True
+    ARRANQUE['tiempos']['listo_s'] = round(time.perf_counter() - T_INICIO, 3)
+    LISTO.set()
+    logger.info(f"API lista en {ARRANQUE['tiempos']['listo_s']:.3f}s desde el inicio "
+                f"(importaciones {ARRANQUE['tiempos']['importaciones_s']:.3f}s)")
+    
+    if app.config['ARRANQUE_CALENTAR']:
+        from utils.calentamiento import calentar
+        inicio = time.perf_counter()
+        ejecutar = EJECUTOR.ejecutar if EJECUTOR is not None and calentar_en_pool else None
+        por_tipo = calentar(PROCESADORES, ejecutar=ejecutar)
+        ARRANQUE['tiempos']['calentamiento_s'] = round(time.perf_counter() - inicio, 3)
+        ARRANQUE['tiempos']['calentamiento_por_tipo'] = por_tipo
+        ARRANQUE['calentado'] = True
+        logger.info(f"Calentamiento completado en {ARRANQUE['tiempos']['calentamiento_s']:.3f}s: {por_tipo}")
+
+def iniciar_componentes(en_segundo_plano=True):
+    """
+    Carga los componentes pesados
+    
+    Args:
+        en_segundo_plano: True para cargarlos en un hilo mientras el servidor
+            ya escucha; False para cargarlos antes de seguir (ej: pre-fork,
+            donde deben quedar importados en el master)
+    """
+    if 'app_importada_s' in ARRANQUE['tiempos']:
+        return  # Ya iniciada
+    ARRANQUE['tiempos']['app_importada_s'] = round(time.perf_counter() - T_INICIO, 3)
+    if not en_segundo_plano:
+        cargar_componentes(calentar_en_pool=False)
+        return
+    threading.Thread(target=cargar_componentes, name='carga-componentes', daemon=True).start()
+
+@app.before_request
+def esperar_componentes():
+    """Las rutas (salvo /health y /metrics) esperan a que terminen de cargarse los componentes"""
+    if request.endpoint in ('health_check', 'metricas'):
+        return None
+    if not LISTO.wait(app.config['ARRANQUE_ESPERA_MAX']) or ARRANQUE['error']:
+        return jsonify({
+            'success': False,
+            'error': ARRANQUE['error'] or 'La API se está iniciando, reintenta en unos segundos'
+        }), 503
+    return None
+
+def agrupa(procesador):
+    """True si el plan del módulo agrupa (recepción, despacho): admite procesar_dataframe"""
+    return procesador.plan.agrupa
+
+def ejecutar_procesador(procesador, metodo, progreso=None, **kwargs):
+    """
+    Llama procesador.<metodo>(**kwargs) en el pool de procesos si está activo
+    
+    procesar_dataframe devuelve el DataFrame agrupado, que viaja por pickle
+    desde el worker; la serialización a JSON se hace en este proceso.
+    
+    Returns:
+        tuple: (resultado del método, tiempos y memoria por etapa medidos
+                donde corrió; ver ejecutar_medido)
+    """
+    if EJECUTOR is None:
+        return ejecutar_medido(getattr(procesador, metodo), progreso=progreso, **kwargs)
+    # Cada worker corre un procesamiento a la vez: su pico de RSS es el del procesamiento
+    return EJECUTOR.ejecutar(ejecutar_medido, progreso=progreso, metodo=getattr(procesador, metodo),
+                             pico_exclusivo=True, **kwargs)
+
+def admitir_memoria(tipo, procesador, origen, request_id, espera=None):
+    """
+    Estima la memoria del procesamiento antes de parsear y la reserva en
+    PRESUPUESTO (eligiendo el camino por bloques si hace falta)
+    
+    Returns:
+        tuple: (Reserva, kwargs extra para el procesador)
+    
+    Raises:
+        MemoriaInsuficiente (contada en /metrics)
+    """
+    plan = planificar(procesador, origen, request_id)
+    try:
+        reserva = PRESUPUESTO.admitir(plan, request_id, espera=espera)
+    except MemoriaInsuficiente as e:
+        METRICAS.rechazar(tipo, 'ocupada' if e.temporal else 'excede')
+        logger.warning(f"[{request_id}] Rechazado por memoria: {e}")
+        raise
+    return reserva, {'por_bloques': reserva.por_bloques}
+
+def memoria_metadata(reserva, cronometro):
+    """'memoria' de la metadata: estimación, reserva y pico medido"""
+    return {
+        'estimado_mb': reserva.estimado_mb,
+        'reservado_mb': round(reserva.mb, 1),
+        'modo': 'bloques' if reserva.por_bloques else 'memoria',
+        'espera_s': round(reserva.espera_s, 2),
+        'rss_pico_mb': round(cronometro.rss_pico_mb(), 1)
+    }
+
+def respuesta_memoria_insuficiente(e, request_id, elapsed):
+    """413 si el archivo no entra nunca en el presupuesto, 503 si hay que reintentar"""
+    respuesta = jsonify({
+        'success': False,
+        'error': str(e),
+        'tipo_error': type(e).__name__,
+        'estimado_mb': round(e.estimado_mb, 1),
+        'disponible_mb': round(e.disponible_mb, 1),
+        'tiempo_procesamiento': round(elapsed, 2),
+        'request_id': request_id
+    })
+    if not e.temporal:
+        return respuesta, 413
+    return respuesta, 503, {'Retry-After': '60'}
+
+def formato_respuesta(admite_ndjson=True):
+    """
+    MIME de la respuesta según Accept: JSON (por defecto), NDJSON o binario
+    columnar (Arrow IPC / npz, ver SerializadorBinario)
+    """
+    formatos = [MIME_JSON] + ([MIME_NDJSON] if admite_ndjson else []) + SerializadorBinario.formatos()
+    return request.accept_mimetypes.best_match(formatos) or MIME_JSON
+
+def respuesta_binaria(cabecera, df, mime):
+    """Frame + cabecera en formato binario columnar"""
+    return Response(SerializadorBinario.codificar(cabecera, df, mime), mimetype=mime)
+
+def respuesta_json(datos, status=200):
+    """Respuesta JSON codificada directo a bytes (sin pasar por jsonify)"""
+    return Response(SerializadorJSON.codificar(datos), status=status, mimetype=MIME_JSON)
+
+def leer_filtros_fecha():
+    """
+    fecha_desde / fecha_hasta de la petición, validadas antes de procesar
+    
+    Returns:
+        tuple: ((fecha_desde o None, fecha_hasta o None), respuesta de error o None)
+    """
+    from utils.fecha_utils import FechaUtils
+    
+    fechas = (request.form.get('fecha_desde') or None, request.form.get('fecha_hasta') or None)
+    for fecha in fechas:
+        if fecha is None:
+            continue
+        try:
+            FechaUtils.limite_filtro(fecha)
+        except ValueError as e:
+            return fechas, (jsonify({'success': False, 'error': str(e)}), 400)
+    return fechas, None
+
+def leer_factura_id(valor):
+    """
+    factura_id opcional de la petición (guardar el detalle en la BD)
+    
+    Returns:
+        tuple: (int o None, respuesta de error o None)
+    """
+    if valor in (None, ''):
+        return None, None
+    if PERSISTENCIA is None:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Persistencia no configurada en la API (API_DB_DESTINO)'
+        }), 400)
+    try:
+        factura_id = int(valor)
+    except (TypeError, ValueError):
+        factura_id = 0
+    if factura_id <= 0:
+        return None, (jsonify({'success': False, 'error': 'factura_id debe ser un entero positivo'}), 400)
+    return factura_id, None
+
+def persistir_resultado(tipo, df_agrupado, factura_id, request_id, progreso=None):
+    """
+    Guarda el frame agrupado en la tabla de detalle del tipo (una transacción)
+    
+    Args:
+        progreso: Callback de etapas opcional (Trabajo.progreso)
+    
+    Returns:
+        Dict para 'persistencia' en la respuesta
+    """
+    aviso = None
+    if progreso is not None:
+        progreso('persistencia', filas=0, total=len(df_agrupado))
+        def aviso(filas, total):
+            progreso('persistencia', filas=filas, total=total)
+    return PERSISTENCIA.reemplazar_detalle(tipo, df_agrupado, factura_id,
+                                           request_id=request_id, progreso=aviso)
+
+def validar_subida(tipo, request_id):
+    """
+    Valida tipo de módulo y archivo recibido
+    
+    Returns:
+        tuple: (archivo, None) si es válido, o (None, respuesta de error 400)
+    """
+    if tipo not in PROCESADORES:
+        logger.error(f"[{request_id}] Tipo no válido: {tipo}")
+        return None, (jsonify({
+            'success': False,
+            'error': f'Tipo de módulo no válido: {tipo}'
+        }), 400)
+    
+    if 'archivo' not in request.files:
+        logger.error(f"[{request_id}] No se recibió archivo")
+        return None, (jsonify({
+            'success': False,
+            'error': 'No se recibió ningún archivo'
+        }), 400)
+    
+    archivo = request.files['archivo']
+    if archivo.filename == '':
+        logger.error(f"[{request_id}] Nombre de archivo vacío")
+        return None, (jsonify({
+            'success': False,
+            'error': 'Nombre de archivo vacío'
+        }), 400)
+    
+    # La extensión decide el formato (solo .csv/.csv.gz van por CSV) y el
+    # contenido tiene que corresponder: un .xlsx dañado es 400, no un 500 del parser
+    from utils.lector_csv import LectorCsv
+    
+    try:
+        LectorCsv.formato_subida(archivo.filename, archivo.stream)
+    except ValueError as e:
+        logger.error(f"[{request_id}] Archivo no válido: {e}")
+        return None, (jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400)
+    
+    return archivo, None
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Endpoint para verificar que la API está funcionando"""
+    """
+    Endpoint para verificar que la API está funcionando
+    
+    Responde aunque los procesadores se estén cargando; 'ready' indica si
+    ya se pueden procesar archivos y 'arranque' trae los tiempos medidos.
+    """
     return jsonify({
         'status': 'ok',
+        'ready': ARRANQUE['ready'],
+        'calentado': ARRANQUE['calentado'],
+        'error_arranque': ARRANQUE['error'],
+        'arranque': ARRANQUE['tiempos'],
         'timestamp': datetime.now().isoformat(),
         'python_version': sys.version
     })
@@ -75,96 +456,135 @@ def procesar_archivo(tipo):
     """
     start_time = datetime.now()
     request_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    # Etapas del worker + persistencia y serialización en este proceso
+    cronometro = CronometroEtapas()
+    etiqueta = etiqueta_metricas(tipo)
+    file_size = 0
+    reserva = None
     
     logger.info(f"[{request_id}] ===== INICIO PROCESAMIENTO {tipo.upper()} =====")
     
+    METRICAS.iniciar(etiqueta)
     try:
-        # Validar tipo
-        if tipo not in PROCESADORES:
-            logger.error(f"[{request_id}] Tipo no válido: {tipo}")
-            return jsonify({
-                'success': False,
-                'error': f'Tipo de módulo no válido: {tipo}'
-            }), 400
-        
-        # Validar archivo
-        if 'archivo' not in request.files:
-            logger.error(f"[{request_id}] No se recibió archivo")
-            return jsonify({
-                'success': False,
-                'error': 'No se recibió ningún archivo'
-            }), 400
-        
-        archivo = request.files['archivo']
-        if archivo.filename == '':
-            logger.error(f"[{request_id}] Nombre de archivo vacío")
-            return jsonify({
-                'success': False,
-                'error': 'Nombre de archivo vacío'
-            }), 400
-        
-        # Validar extensión
-        extension = archivo.filename.split('.')[-1].lower()
-        if extension not in ['xls', 'xlsx', 'csv']:
-            logger.error(f"[{request_id}] Extensión no válida: {extension}")
-            return jsonify({
-                'success': False,
-                'error': f'Formato no válido: {extension}. Solo .xls, .xlsx, .csv'
-            }), 400
-        
-        # Guardar archivo temporal
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{request_id}_{archivo.filename}")
-        archivo.save(temp_path)
-        file_size = os.path.getsize(temp_path)
-        logger.info(f"[{request_id}] Archivo guardado: {temp_path} ({file_size} bytes)")
-        
-        # Obtener filtros
-        fecha_desde = request.form.get('fecha_desde', '')
-        fecha_hasta = request.form.get('fecha_hasta', '')
+        # Validar tipo, archivo y extensión
+        archivo, error = validar_subida(tipo, request_id)
+        if error:
+            return error
+        
+        # Obtener filtros (una fecha mal formada es 400 antes de tocar el archivo)
+        (fecha_desde, fecha_hasta), error = leer_filtros_fecha()
+        if error:
+            return error
         
+        # El archivo se procesa desde el stream de la subida (memoria o temporal
+        # que se borra al cerrar la petición)
+        file_size = subidas.tamano(archivo.stream)
+        origen = subidas.origen_para(archivo.stream, otro_proceso=EJECUTOR is not None)
+        logger.info(f"[{request_id}] Archivo recibido: {archivo.filename} ({file_size} bytes)")
         logger.info(f"[{request_id}] Filtros: desde={fecha_desde}, hasta={fecha_hasta}")
         
+        # factura_id -> además de responder, guardar el detalle directo en la BD
+        factura_id, error = leer_factura_id(request.form.get('factura_id'))
+        if error:
+            return error
+        
+        # Modo cursor: el resultado queda en el servidor y se pide por páginas
+        modo = request.form.get('modo') or request.args.get('modo', '')
+        # Accept: application/x-ndjson -> filas transmitidas por bloques;
+        # Arrow IPC / npz -> frame completo en binario columnar
+        formato = formato_respuesta()
+        streaming = formato == MIME_NDJSON
+        binario = formato in SerializadorBinario.formatos()
+        
         # Procesar con el procesador correspondiente
         procesador = PROCESADORES[tipo]
-        resultado = procesador.procesar(
-            archivo_path=temp_path,
-            fecha_desde=fecha_desde if fecha_desde else None,
-            fecha_hasta=fecha_hasta if fecha_hasta else None,
-            request_id=request_id
-        )
+        por_dataframe = (modo == 'cursor' or streaming or binario or factura_id is not None) and \
+            agrupa(procesador)
+        if factura_id is not None and not por_dataframe:
+            return jsonify({'success': False, 'error': f'El módulo {tipo} no admite guardado directo'}), 400
+        
+        # Presupuesto de memoria: estimar antes de parsear; elige el camino,
+        # espera en cola o rechaza (MemoriaInsuficiente)
+        reserva, extra = admitir_memoria(etiqueta, procesador, origen, request_id)
+        if por_dataframe:
+            (df_agrupado, stats), medicion = ejecutar_procesador(
+                procesador, 'procesar_dataframe',
+                archivo_path=origen,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                request_id=request_id,
+                **extra
+            )
+            cronometro.agregar(medicion)
+            persistencia = None
+            if factura_id is not None:
+                with cronometro.medir('persistencia'):
+                    persistencia = persistir_resultado(tipo, df_agrupado, factura_id, request_id)
+            with cronometro.medir('serializacion'):
+                if streaming or binario:
+                    # Las filas viajan aparte (bloques NDJSON o columnas binarias)
+                    resultado = {
+                        'success': True,
+                        'total_registros': len(df_agrupado),
+                        'headers': procesador.HEADERS,
+                        'stats': stats
+                    }
+                elif modo != 'cursor':
+                    resultado = procesador.construir_respuesta(df_agrupado, stats)
+                else:
+                    resultado = procesador.construir_respuesta(df_agrupado, stats, incluir_completa=False)
+                if modo == 'cursor':
+                    resultado['cursor'] = RESULTADOS.guardar(request_id, df_agrupado, procesador.HEADERS,
+                                                             stats, tipo=tipo)
+            if persistencia is not None:
+                resultado['persistencia'] = persistencia
+        else:
+            resultado, medicion = ejecutar_procesador(
+                procesador, 'procesar',
+                archivo_path=origen,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                request_id=request_id,
+                **extra
+            )
+            cronometro.agregar(medicion)
         
         # Calcular tiempo de procesamiento
         elapsed = (datetime.now() - start_time).total_seconds()
         logger.info(f"[{request_id}] Procesamiento completado en {elapsed:.2f} segundos")
         
-        # Agregar metadatos
+        # Agregar metadatos (etapas: la codificación final de la respuesta
+        # se suma después y solo aparece en /metrics)
         resultado['metadata'] = {
             'request_id': request_id,
             'tiempo_procesamiento': round(elapsed, 2),
             'archivo_original': archivo.filename,
-            'tamano_bytes': file_size
+            'tamano_bytes': file_size,
+            'etapas': cronometro.etapas(),
+            'memoria': memoria_metadata(reserva, cronometro)
         }
         
-        # Limpiar archivo temporal con reintentos
-        for intento in range(3):
-            try:
-                if os.path.exists(temp_path):
-                    # Forzar cierre de archivos
-                    import gc
-                    gc.collect()
-                    time.sleep(0.5)
-                    os.remove(temp_path)
-                    logger.info(f"[{request_id}] Archivo temporal eliminado")
-                break
-            except Exception as e:
-                if intento < 2:
-                    logger.warning(f"[{request_id}] Reintentando eliminar archivo... ({intento+1}/3)")
-                    time.sleep(1)
+        if streaming and por_dataframe:
+            logger.info(f"[{request_id}] Enviando respuesta NDJSON en streaming")
+            partes = METRICAS.contar_salida(etiqueta, SerializadorJSON.ndjson(resultado, df_agrupado))
+            respuesta = Response(partes, mimetype=MIME_NDJSON)
+        else:
+            with cronometro.medir('serializacion'):
+                if binario and por_dataframe:
+                    logger.info(f"[{request_id}] Enviando respuesta binaria ({formato})")
+                    respuesta = respuesta_binaria(resultado, df_agrupado, formato)
                 else:
-                    logger.warning(f"[{request_id}] No se pudo eliminar archivo temporal: {e}")
+                    logger.info(f"[{request_id}] Enviando respuesta JSON exitosamente")
+                    respuesta = respuesta_json(resultado)
+            METRICAS.sumar_bytes_salida(etiqueta, respuesta.calculate_content_length() or 0)
         
-        logger.info(f"[{request_id}] Enviando respuesta JSON exitosamente")
-        return jsonify(resultado)
+        METRICAS.registrar(etiqueta, 'ok', (datetime.now() - start_time).total_seconds(), cronometro,
+                           bytes_entrada=file_size, filas_resultado=resultado.get('total_registros'))
+        return respuesta
+    
+    except MemoriaInsuficiente as e:
+        elapsed = (datetime.now() - start_time).total_seconds()
+        return respuesta_memoria_insuficiente(e, request_id, elapsed)
     
     except Exception as e:
         elapsed = (datetime.now() - start_time).total_seconds()
@@ -172,6 +592,7 @@ def procesar_archivo(tipo):
         error_trace = traceback.format_exc()
         
         logger.error(f"[{request_id}] ERROR: {error_msg}\n{error_trace}")
+        METRICAS.registrar(etiqueta, 'error', elapsed, cronometro, bytes_entrada=file_size)
         
         return jsonify({
             'success': False,
@@ -180,21 +601,278 @@ def procesar_archivo(tipo):
             'tiempo_procesamiento': round(elapsed, 2),
             'request_id': request_id
         }), 500
+    
+    finally:
+        if reserva is not None:
+            reserva.liberar()
+        METRICAS.terminar(etiqueta)
+
+def etiqueta_metricas(tipo):
+    """Tipo para las etiquetas de /metrics (los tipos no válidos van juntos)"""
+    return tipo if tipo in PROCESADORES else 'otro'
+
+def ejecutar_trabajo(trabajo, procesador, origen, fecha_desde, fecha_hasta, modo, tamano_bytes,
+                     factura_id=None):
+    """
+    Cuerpo de un trabajo asíncrono (corre en el pool de GestorTrabajos)
+    
+    Returns:
+        Dict con la misma forma que la respuesta de /procesar/<tipo>
+    """
+    request_id = trabajo.id
+    inicio = time.time()
+    cronometro = CronometroEtapas()
+    reserva = None
+    logger.info(f"[{request_id}] ===== INICIO TRABAJO {trabajo.tipo.upper()} =====")
+    
+    METRICAS.iniciar(trabajo.tipo)
+    try:
+        # Sigue 'en_cola' mientras espera memoria
+        reserva, extra = admitir_memoria(trabajo.tipo, procesador, origen, request_id,
+                                         espera=app.config['MEMORIA_ESPERA_TRABAJOS'])
+        if agrupa(procesador):
+            (df_agrupado, stats), medicion = ejecutar_procesador(
+                procesador, 'procesar_dataframe',
+                progreso=trabajo.progreso,
+                archivo_path=origen,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                request_id=request_id,
+                **extra
+            )
+            cronometro.agregar(medicion)
+            persistencia = None
+            if factura_id is not None:
+                with cronometro.medir('persistencia'):
+                    persistencia = persistir_resultado(trabajo.tipo, df_agrupado, factura_id, request_id,
+                                                       progreso=trabajo.progreso)
+            trabajo.progreso('serializacion', filas=len(df_agrupado))
+            with cronometro.medir('serializacion'):
+                if modo == 'cursor':
+                    resultado = procesador.construir_respuesta(df_agrupado, stats, incluir_completa=False)
+                    resultado['cursor'] = RESULTADOS.guardar(request_id, df_agrupado, procesador.HEADERS,
+                                                             stats, tipo=trabajo.tipo)
+                else:
+                    resultado = procesador.construir_respuesta(df_agrupado, stats)
+            if persistencia is not None:
+                resultado['persistencia'] = persistencia
+        else:
+            # Vista previa (paquete, almacén): lectura y serialización
+            resultado, medicion = ejecutar_procesador(
+                procesador, 'procesar',
+                progreso=trabajo.progreso,
+                archivo_path=origen,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                request_id=request_id,
+                **extra
+            )
+            cronometro.agregar(medicion)
+        
+        elapsed = time.time() - inicio
+        logger.info(f"[{request_id}] Trabajo completado en {elapsed:.2f} segundos")
+        resultado['metadata'] = {
+            'request_id': request_id,
+            'tiempo_procesamiento': round(elapsed, 2),
+            'archivo_original': trabajo.nombre_archivo,
+            'tamano_bytes': tamano_bytes,
+            'etapas': cronometro.etapas(),
+            'memoria': memoria_metadata(reserva, cronometro)
+        }
+        METRICAS.registrar(trabajo.tipo, 'ok', elapsed, cronometro, bytes_entrada=tamano_bytes,
+                           filas_resultado=resultado.get('total_registros'))
+        return resultado
+    
+    except MemoriaInsuficiente:
+        raise
+    
+    except Exception:
+        METRICAS.registrar(trabajo.tipo, 'error', time.time() - inicio, cronometro, bytes_entrada=tamano_bytes)
+        raise
+    
+    finally:
+        if reserva is not None:
+            reserva.liberar()
+        METRICAS.terminar(trabajo.tipo)
+        subidas.liberar(origen)
+
+@app.route('/jobs/<tipo>', methods=['POST'])
+def crear_trabajo(tipo):
+    """
+    Encola el procesamiento y responde al instante con el job_id
+    
+    Mismos campos que /procesar/<tipo> (archivo, fecha_desde, fecha_hasta, modo).
+    El avance y el resultado se consultan en GET /jobs/<job_id>.
+    """
+    archivo, error = validar_subida(tipo, 'jobs')
+    if error:
+        return error
+    
+    (fecha_desde, fecha_hasta), error = leer_filtros_fecha()
+    if error:
+        return error
+    
+    factura_id, error = leer_factura_id(request.form.get('factura_id'))
+    if error:
+        return error
+    if factura_id is not None and not agrupa(PROCESADORES[tipo]):
+        return jsonify({'success': False, 'error': f'El módulo {tipo} no admite guardado directo'}), 400
+    
+    trabajo = Trabajo(tipo, nombre_archivo=archivo.filename)
+    
+    # El archivo tiene que sobrevivir a la petición: lo libera el trabajo al terminar
+    file_size = subidas.tamano(archivo.stream)
+    origen = subidas.desvincular(archivo.stream)
+    logger.info(f"[{trabajo.id}] Trabajo {tipo} en cola: {archivo.filename} ({file_size} bytes)")
+    
+    modo = request.form.get('modo') or request.args.get('modo', '')
+    
+    TRABAJOS.enviar(trabajo, ejecutar_trabajo, PROCESADORES[tipo], origen,
+                    fecha_desde, fecha_hasta, modo, file_size, factura_id)
+    
+    return respuesta_json(dict(trabajo.a_dict(incluir_resultado=False),
+                               success=True, url=f'/jobs/{trabajo.id}'), status=202)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def consultar_trabajo(job_id):
+    """
+    Estado de un trabajo: estado, etapa, filas_procesadas, porcentaje y,
+    al completarse, 'resultado' con la respuesta de /procesar/<tipo>
+    """
+    estado = TRABAJOS.consultar(job_id)
+    if estado is None:
+        return jsonify({
+            'success': False,
+            'error': f'Trabajo no encontrado o expirado: {job_id}'
+        }), 404
+    return respuesta_json(dict(estado, success=True))
+
+@app.route('/resultados/<request_id>', methods=['GET'])
+def obtener_resultados(request_id):
+    """
+    Página de un resultado guardado en modo cursor
+    
+    Query params: offset, limit, fields (columnas separadas por coma)
+    Accept: JSON por defecto; Arrow IPC o npz devuelven la página en binario
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 1000))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset y limit deben ser enteros'}), 400
+    
+    if offset < 0 or limit <= 0:
+        return jsonify({'success': False, 'error': 'offset debe ser >= 0 y limit > 0'}), 400
+    limit = min(limit, app.config['RESULTADOS_LIMITE_PAGINA'])
+    
+    campos = [c.strip() for c in request.args.get('fields', '').split(',') if c.strip()]
+    
+    try:
+        pagina, headers, total = RESULTADOS.pagina(request_id, offset, limit, campos or None)
+    except ResultadoNoEncontrado:
+        return jsonify({
+            'success': False,
+            'error': f'Resultado no encontrado o expirado: {request_id}'
+        }), 404
+    except CampoNoValido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    siguiente = offset + len(pagina)
+    respuesta = {
+        'success': True,
+        'request_id': request_id,
+        'headers': headers,
+        'offset': offset,
+        'limit': limit,
+        'total_registros': total,
+        'siguiente_offset': siguiente if siguiente < total else None
+    }
+    formato = formato_respuesta(admite_ndjson=False)
+    if formato != MIME_JSON:
+        return respuesta_binaria(respuesta, pagina, formato)
+    respuesta['data'] = SerializadorJSON.dataframe_a_filas(pagina)
+    return respuesta_json(respuesta)
+
+@app.route('/resultados/<request_id>/persistir', methods=['POST'])
+def persistir_resultados(request_id):
+    """
+    Guarda en la BD un resultado en modo cursor, sin reenviar las filas
+    
+    Body (form o JSON): factura_id de la cabecera ya creada
+    """
+    datos = request.get_json(silent=True) or request.form
+    factura_id, error = leer_factura_id(datos.get('factura_id'))
+    if error:
+        return error
+    if factura_id is None:
+        return jsonify({'success': False, 'error': 'Falta factura_id'}), 400
+    
+    try:
+        entrada = RESULTADOS.obtener(request_id)
+    except ResultadoNoEncontrado:
+        return jsonify({
+            'success': False,
+            'error': f'Resultado no encontrado o expirado: {request_id}'
+        }), 404
+    
+    try:
+        persistencia = persistir_resultado(entrada['tipo'], entrada['df'], factura_id, request_id)
+    except Exception as e:
+        logger.error(f"[{request_id}] ERROR guardando en la BD: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e), 'request_id': request_id}), 500
+    
+    return respuesta_json({'success': True, 'request_id': request_id, 'persistencia': persistencia})
+
+@app.route('/resultados/<request_id>', methods=['DELETE'])
+def eliminar_resultados(request_id):
+    """Libera un resultado guardado antes de que expire"""
+    if not RESULTADOS.eliminar(request_id):
+        return jsonify({
+            'success': False,
+            'error': f'Resultado no encontrado o expirado: {request_id}'
+        }), 404
+    return jsonify({'success': True, 'request_id': request_id})
+
+@app.route('/metrics', methods=['GET'])
+def metricas():
+    """
+    Métricas en formato de texto de Prometheus: duración total y por etapa
+    (pared y CPU), pico de memoria, filas leídas y de resultado, bytes de
+    entrada y salida, procesamientos en curso y rechazados por memoria, por
+    tipo de módulo; además el uso del presupuesto de memoria
+    """
+    presupuesto = PRESUPUESTO.estado()
+    medidores = {
+        'memoria_presupuesto_mb': ('Memoria para procesamientos en curso (0 = sin límite)', presupuesto['total_mb']),
+        'memoria_reservada_mb': ('Memoria estimada reservada por los procesamientos en curso',
+                                 presupuesto['reservado_mb']),
+        'memoria_en_espera': ('Procesamientos esperando memoria', presupuesto['en_espera'])
+    }
+    return Response(METRICAS.exponer(medidores), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/info', methods=['GET'])
 def info():
     """Información de la API"""
+    import openpyxl
+    
     return jsonify({
         'nombre': 'API Python Procesador Excel',
         'version': '1.0.0',
         'modulos_soportados': list(PROCESADORES.keys()),
+        'ejecutor': EJECUTOR.estado() if EJECUTOR is not None else 'hilos',
+        'memoria': PRESUPUESTO.estado(),
+        'persistencia': type(PERSISTENCIA).__name__ if PERSISTENCIA is not None else None,
+        'formatos_respuesta': [MIME_JSON, MIME_NDJSON] + SerializadorBinario.formatos(),
         'librerias': {
             'pandas': pd.__version__,
-            'openpyxl': '3.1.2'
+            'openpyxl': openpyxl.__version__
         }
     })
 
 if __name__ == '__main__':
-    # Ejecutar en modo desarrollo
+    # Ejecutar en modo desarrollo (producción: python api_python/servidor.py)
     logger.info("Iniciando API Python en http://127.0.0.1:5000")
+    # Con el reloader de debug solo carga el proceso hijo, que es el que atiende
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        iniciar_componentes(en_segundo_plano=True)
     app.run(host='127.0.0.1', port=5000, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,4 @@
+# Este archivo hace que la carpeta sea un paquete Python
+# Benchmarks de los procesadores: no son tests, se corren a mano con
+#   python -m benchmark --filas 10000 100000 1000000
+# (ver benchmark/medicion.py; los libros se arman con benchmark/generador.py)
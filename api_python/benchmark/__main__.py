@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""python -m benchmark (desde api_python/): ver benchmark/medicion.py"""
+
+from benchmark.medicion import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Generador determinístico de libros Detail sintéticos (recepción y despacho)
+Arma la exportación del WMS con el layout real de cada procesador (columnas
+de COLUMNAS, de C a CN): STATUS válidos y no válidos, fechas en formatos
+mezclados (celdas de fecha, texto dd/mm/yyyy hh:mm:ss, dd/mm/yy, seriales
+sin estilo), cantidades en formato europeo ('2.413,00000') junto a números
+y vacíos, y una cantidad configurable de documentos y SKUs distintos (la
+cardinalidad de los grupos de CLAVES).
+
+El .xlsx se escribe directo como XML dentro del zip (openpyxl tarda minutos
+en un millón de filas); con la misma semilla y los mismos parámetros el
+archivo sale idéntico byte a byte.
+
+Uso:
+    python -m benchmark.generador recepcion 100000 --formato xlsx --salida /tmp/bench
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import logging
+import os
+import random
+import sys
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.excel_utils import ExcelUtils
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (módulo, clase) del procesador cuyo layout se genera
+TIPOS = {
+    'recepcion': ('procesadores.recepcion_procesador', 'RecepcionProcesador'),
+    'despacho': ('procesadores.despacho_procesador', 'DespachoProcesador'),
+}
+
+FORMATOS = ('xlsx', 'csv', 'csv.gz')
+
+# Ancho de la hoja Detail de la exportación (A..CN)
+ULTIMA_COLUMNA = 'CN'
+
+FECHA_BASE = datetime(2024, 1, 1)
+ORIGEN_EXCEL = datetime(1899, 12, 30)
+
+STORERKEYS = ['ARCOR', 'BAGLEY', 'LA SERENISIMA']
+UOMS = [('UN', 60), ('CJ', 30), ('PL', 8), (' un ', 2)]
+TIPOS_DOCUMENTO = ['1', '2', '5', None]
+
+# Códigos de STATUS que el filtro descarta (se mezclan con STATUS_VALIDOS)
+STATUS_NO_VALIDOS = ['0', '5', '9', '68', '98']
+
+# Variante -> peso (%) de cada celda de fecha y de cantidad. Las variantes
+# 'fecha', 'serial', 'entero' y 'decimal' son celdas numéricas en el .xlsx;
+# en el CSV todo es texto y se usan solo las de texto
+MEZCLA_FECHAS = {'fecha': 70, 'texto': 15, 'texto_corto': 5, 'serial': 5, 'vacia': 5}
+MEZCLA_CANTIDADES = {'europeo': 60, 'entero': 25, 'decimal': 5, 'vacia': 8, 'invalida': 2}
+VARIANTES_TEXTO = {'fecha': 'texto', 'serial': 'texto_corto', 'entero': 'europeo', 'decimal': 'europeo'}
+
+# Filas por escritura al zip/CSV
+FILAS_POR_ESCRITURA = 5000
+
+# Fecha fija en las entradas del zip (el archivo no depende de cuándo se generó)
+FECHA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet2.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Resumen" sheetId="1" r:id="rId1"/>'
+    '<sheet name="Detail" sheetId="2" r:id="rId2"/></sheets>'
+    '</workbook>'
+)
+
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet2.xml"/>'
+    '<Relationship Id="rId3" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '<Relationship Id="rId4" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 1 = fecha con formato propio (numFmtId 164), como las exportaciones del WMS
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+CABECERA_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+ESTILO_FECHA = 1
+
+
+def clase_procesador(tipo):
+    """Clase del procesador de 'tipo' (importa pandas)"""
+    import importlib
+
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo no soportado: {tipo} (opciones: {', '.join(TIPOS)})")
+    modulo, clase = TIPOS[tipo]
+    return getattr(importlib.import_module(modulo), clase)
+
+
+def letra_columna(indice):
+    """Índice 0-based -> letra de columna Excel (0 -> 'A', 91 -> 'CN')"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def _europeo(numero):
+    """1234.5 -> '1.234,50000' (formato de cantidades del WMS)"""
+    return f'{numero:,.5f}'.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def _variantes(mezcla):
+    """Mezcla {variante: peso} -> (variantes, pesos acumulados) para random.choices"""
+    variantes = list(mezcla)
+    acumulados = []
+    total = 0
+    for variante in variantes:
+        total += mezcla[variante]
+        acumulados.append(total)
+    return variantes, acumulados
+
+
+class GeneradorDetail:
+    """
+    Filas sintéticas de la hoja Detail de un módulo y su escritura a .xlsx o CSV
+
+    Las filas van ordenadas por documento (como la exportación): cada
+    documento tiene un bloque contiguo de líneas con SKUs al azar.
+    """
+
+    def __init__(self, tipo, filas, documentos=None, skus=2000, semilla=1, dias=365,
+                 proporcion_validos=0.85, relleno=False):
+        """
+        Args:
+            tipo: 'recepcion' o 'despacho'
+            filas: Filas de datos (sin contar el encabezado)
+            documentos: RECEIPTKEY/ORDERKEY distintos (None = una cada 20 filas)
+            skus: SKUs distintos
+            semilla: Semilla del generador (mismos parámetros = mismo archivo)
+            dias: Días desde FECHA_BASE que cubren las fechas
+            proporcion_validos: Fracción de filas con un STATUS de STATUS_VALIDOS
+            relleno: Completar también las columnas que el procesador no lee
+                (hoja de ancho real; más lenta de generar y de leer)
+        """
+        clase = clase_procesador(tipo)
+        self.tipo = tipo
+        self.filas = filas
+        self.documentos = max(1, documentos if documentos else filas // 20)
+        self.skus = max(1, skus)
+        self.semilla = semilla
+        self.dias = max(1, dias)
+        self.proporcion_validos = proporcion_validos
+        self.relleno = relleno
+        self.status_validos = list(clase.STATUS_VALIDOS)
+        self.ancho = ExcelUtils.excel_col_to_index(ULTIMA_COLUMNA) + 1
+
+        # Rol de cada columna leída por el procesador (las de letra '??' no existen)
+        roles = {}
+        for nombre, info in clase.COLUMNAS.items():
+            indice = ExcelUtils.excel_col_to_index(info['col'])
+            if 0 <= indice < self.ancho:
+                roles[indice] = (nombre, self._rol(clase, nombre))
+        self.encabezados = [roles[i][0] if i in roles else f'CAMPO_{letra_columna(i)}'
+                            for i in range(self.ancho)]
+        self.posiciones = sorted(roles) if not relleno else list(range(self.ancho))
+        self.roles = [roles[i][1] if i in roles else 'relleno' for i in self.posiciones]
+        self.letras = [letra_columna(i) for i in self.posiciones]
+
+    @staticmethod
+    def _rol(clase, nombre):
+        if nombre == clase.CLAVES[0]:
+            return 'documento'
+        if nombre == clase.COLUMNA_CANTIDAD:
+            return 'cantidad'
+        if nombre == clase.COLUMNA_FECHA:
+            return 'fecha'
+        if nombre.startswith('EXTERN'):
+            return 'externo'
+        if nombre in ('SKU', 'STORERKEY', 'UOM', 'STATUS'):
+            return nombre.lower()
+        return 'tipo'
+
+    def nombre_archivo(self, formato):
+        """Nombre que identifica los parámetros (para reutilizar lo ya generado)"""
+        relleno = '_relleno' if self.relleno else ''
+        return (f'{self.tipo}_{self.filas}_d{self.documentos}_s{self.skus}_'
+                f'v{int(self.proporcion_validos * 100)}_x{self.semilla}{relleno}.{formato}')
+
+    def iterar_filas(self, texto=False):
+        """
+        Valores de cada fila, alineados con self.posiciones
+
+        Args:
+            texto: Solo valores de texto (CSV): cantidades en formato europeo
+                y fechas como dd/mm/yyyy hh:mm:ss o dd/mm/yy
+
+        Yields:
+            list de str, int, float, datetime o None
+        """
+        azar = random.Random(self.semilla)
+        fechas, pesos_fechas = _variantes(MEZCLA_FECHAS)
+        cantidades, pesos_cantidades = _variantes(MEZCLA_CANTIDADES)
+        uoms, pesos_uoms = _variantes(dict(UOMS))
+        otros_status = [s for s in STATUS_NO_VALIDOS if s not in self.status_validos]
+        segundos = self.dias * 86400
+        por_documento = self.filas / self.documentos
+
+        for i in range(self.filas):
+            documento = int(i / por_documento) + 1
+            fila = []
+            for rol in self.roles:
+                if rol == 'documento':
+                    # Algunas claves llegan como número, sin los ceros a la izquierda
+                    valor = documento if not texto and documento % 50 == 0 else f'{documento:010d}'
+                elif rol == 'sku':
+                    valor = f'SKU{azar.randrange(self.skus):06d}'
+                elif rol == 'storerkey':
+                    valor = STORERKEYS[documento % len(STORERKEYS)]
+                elif rol == 'externo':
+                    valor = f'EXT{documento:08d}'
+                elif rol == 'uom':
+                    valor = azar.choices(uoms, cum_weights=pesos_uoms)[0]
+                elif rol == 'status':
+                    if azar.random() < self.proporcion_validos:
+                        valor = azar.choice(self.status_validos)
+                    else:
+                        valor = azar.choice(otros_status)
+                    if not texto and azar.random() < 0.3:
+                        valor = int(valor)
+                elif rol == 'cantidad':
+                    valor = self._cantidad(azar, azar.choices(cantidades, cum_weights=pesos_cantidades)[0], texto)
+                elif rol == 'fecha':
+                    momento = FECHA_BASE + timedelta(seconds=azar.randrange(segundos))
+                    valor = self._fecha(momento, azar.choices(fechas, cum_weights=pesos_fechas)[0], texto)
+                elif rol == 'tipo':
+                    valor = TIPOS_DOCUMENTO[documento % len(TIPOS_DOCUMENTO)]
+                else:
+                    valor = 'X'
+                fila.append(valor)
+            yield fila
+
+    @staticmethod
+    def _cantidad(azar, variante, texto):
+        if texto:
+            variante = VARIANTES_TEXTO.get(variante, variante)
+        if variante == 'vacia':
+            return None
+        if variante == 'invalida':
+            return 'S/D'
+        numero = azar.randrange(1, 5000)
+        if variante == 'entero':
+            return numero
+        if variante == 'decimal':
+            return numero + 0.5
+        return _europeo(numero)
+
+    @staticmethod
+    def _fecha(momento, variante, texto):
+        if texto:
+            variante = VARIANTES_TEXTO.get(variante, variante)
+        if variante == 'vacia':
+            return None
+        if variante == 'texto':
+            return momento.strftime('%d/%m/%Y %H:%M:%S')
+        if variante == 'texto_corto':
+            return momento.strftime('%d/%m/%y')
+        if variante == 'serial':
+            return round((momento - ORIGEN_EXCEL).total_seconds() / 86400, 6)
+        return momento
+
+    def escribir_xlsx(self, destino):
+        """
+        Escribe el libro (hojas 'Resumen' y 'Detail') en destino
+
+        Args:
+            destino: Ruta o archivo binario
+        """
+        cadenas = {}
+
+        def indice_cadena(texto):
+            indice = cadenas.get(texto)
+            if indice is None:
+                indice = cadenas[texto] = len(cadenas)
+            return indice
+
+        with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as libro:
+            for ruta, contenido in (('[Content_Types].xml', CONTENT_TYPES), ('_rels/.rels', RELS),
+                                    ('xl/workbook.xml', WORKBOOK), ('xl/_rels/workbook.xml.rels', WORKBOOK_RELS),
+                                    ('xl/styles.xml', STYLES)):
+                libro.writestr(self._entrada(ruta), contenido)
+
+            libro.writestr(self._entrada('xl/worksheets/sheet1.xml'), (
+                f'{CABECERA_HOJA}<dimension ref="A1"/><sheetData><row r="1">'
+                f'<c r="A1" t="s"><v>{indice_cadena(f"Detalle de {self.tipo} (sintético)")}</v></c>'
+                f'</row></sheetData></worksheet>'))
+
+            with libro.open(self._entrada('xl/worksheets/sheet2.xml'), 'w', force_zip64=True) as hoja:
+                ultima = letra_columna(self.ancho - 1)
+                encabezado = ''.join(f'<c r="{letra_columna(i)}1" t="s"><v>{indice_cadena(nombre)}</v></c>'
+                                     for i, nombre in enumerate(self.encabezados))
+                hoja.write((f'{CABECERA_HOJA}<dimension ref="A1:{ultima}{self.filas + 1}"/>'
+                            f'<sheetData><row r="1">{encabezado}</row>').encode('utf-8'))
+
+                partes = []
+                for numero, fila in enumerate(self.iterar_filas(), start=2):
+                    partes.append(f'<row r="{numero}">')
+                    for letra, valor in zip(self.letras, fila):
+                        if valor is None:
+                            continue
+                        if isinstance(valor, str):
+                            partes.append(f'<c r="{letra}{numero}" t="s"><v>{indice_cadena(valor)}</v></c>')
+                        elif isinstance(valor, datetime):
+                            serial = round((valor - ORIGEN_EXCEL).total_seconds() / 86400, 6)
+                            partes.append(f'<c r="{letra}{numero}" s="{ESTILO_FECHA}"><v>{serial}</v></c>')
+                        else:
+                            partes.append(f'<c r="{letra}{numero}"><v>{valor}</v></c>')
+                    partes.append('</row>')
+                    if numero % FILAS_POR_ESCRITURA == 0:
+                        hoja.write(''.join(partes).encode('utf-8'))
+                        partes = []
+                partes.append('</sheetData></worksheet>')
+                hoja.write(''.join(partes).encode('utf-8'))
+
+            with libro.open(self._entrada('xl/sharedStrings.xml'), 'w', force_zip64=True) as tabla:
+                tabla.write((f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                             f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                             f'uniqueCount="{len(cadenas)}">').encode('utf-8'))
+                # dict conserva el orden de inserción = orden de los índices
+                tabla.write(''.join(f'<si><t xml:space="preserve">{escape(texto)}</t></si>'
+                                    for texto in cadenas).encode('utf-8'))
+                tabla.write(b'</sst>')
+
+    @staticmethod
+    def _entrada(ruta):
+        info = zipfile.ZipInfo(ruta, date_time=FECHA_ZIP)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def escribir_csv(self, destino, separador=';', comprimir=False):
+        """
+        Escribe la hoja Detail como CSV (columnas en la posición de su letra)
+
+        Args:
+            destino: Ruta o archivo binario
+            comprimir: Escribir CSV.gz
+        """
+        propio = isinstance(destino, (str, bytes)) or hasattr(destino, '__fspath__')
+        archivo = open(destino, 'wb') if propio else destino
+        try:
+            # mtime=0: el .gz tampoco depende de cuándo se generó
+            binario = gzip.GzipFile(fileobj=archivo, mode='wb', mtime=0) if comprimir else archivo
+            texto = io.TextIOWrapper(binario, encoding='utf-8', newline='')
+            escritor = csv.writer(texto, delimiter=separador)
+            escritor.writerow(self.encabezados)
+
+            fila_completa = [None] * self.ancho
+            filas = []
+            for fila in self.iterar_filas(texto=True):
+                for posicion, valor in zip(self.posiciones, fila):
+                    fila_completa[posicion] = valor
+                filas.append(list(fila_completa))
+                if len(filas) == FILAS_POR_ESCRITURA:
+                    escritor.writerows(filas)
+                    filas = []
+            escritor.writerows(filas)
+            texto.flush()
+            texto.detach()
+            if comprimir:
+                binario.close()
+        finally:
+            if propio:
+                archivo.close()
+
+    def escribir(self, destino, formato='xlsx'):
+        """Escribe en el formato pedido ('xlsx', 'csv' o 'csv.gz')"""
+        if formato == 'xlsx':
+            self.escribir_xlsx(destino)
+        elif formato in ('csv', 'csv.gz'):
+            self.escribir_csv(destino, comprimir=formato == 'csv.gz')
+        else:
+            raise ValueError(f"Formato no soportado: {formato} (opciones: {', '.join(FORMATOS)})")
+
+
+def generar(tipo, filas, formato='xlsx', directorio=None, regenerar=False, **opciones):
+    """
+    Genera (o reutiliza, si ya existe con los mismos parámetros) un archivo sintético
+
+    Args:
+        directorio: Carpeta de salida (None = la temporal del sistema)
+        regenerar: Escribirlo aunque ya exista
+        **opciones: documentos, skus, semilla, dias, proporcion_validos, relleno
+
+    Returns:
+        Ruta del archivo
+    """
+    import tempfile
+
+    generador = GeneradorDetail(tipo, filas, **opciones)
+    directorio = directorio or os.path.join(tempfile.gettempdir(), 'portal_facturacion_benchmark')
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, generador.nombre_archivo(formato))
+    if os.path.exists(ruta) and not regenerar:
+        return ruta
+
+    # Se escribe a un temporal y se renombra: un archivo a medias nunca se reutiliza
+    temporal = f'{ruta}.parcial'
+    generador.escribir(temporal, formato)
+    os.replace(temporal, ruta)
+    logger.info(f"Generado {ruta} ({filas} filas, {os.path.getsize(ruta)} bytes)")
+    return ruta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera libros Detail sintéticos para benchmarks')
+    parser.add_argument('tipo', choices=list(TIPOS))
+    parser.add_argument('filas', type=int)
+    parser.add_argument('--formato', choices=FORMATOS, default='xlsx')
+    parser.add_argument('--salida', default=None, help='Carpeta de salida')
+    parser.add_argument('--documentos', type=int, default=None,
+                        help='Documentos distintos (por defecto uno cada 20 filas)')
+    parser.add_argument('--skus', type=int, default=2000, help='SKUs distintos')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--dias', type=int, default=365, help='Días que cubren las fechas')
+    parser.add_argument('--validos', type=float, default=0.85,
+                        help='Fracción de filas con STATUS válido')
+    parser.add_argument('--relleno', action='store_true',
+                        help='Completar todas las columnas de A a CN')
+    opciones = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    ruta = generar(opciones.tipo, opciones.filas, formato=opciones.formato, directorio=opciones.salida,
+                   regenerar=True, documentos=opciones.documentos, skus=opciones.skus,
+                   semilla=opciones.semilla, dias=opciones.dias,
+                   proporcion_validos=opciones.validos, relleno=opciones.relleno)
+    print(ruta)
+
+
+if __name__ == '__main__':
+    main()
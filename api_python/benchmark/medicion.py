@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de los procesadores de recepción y despacho
+Para cada tipo, formato y cantidad de filas genera (o reutiliza) un libro
+sintético con benchmark/generador.py y mide:
+- etapas: procesar_dataframe en este proceso con CronometroEtapas (lectura,
+  extraccion, filtro_fecha, agrupacion, ... + serializacion de la
+  respuesta JSON), con tiempo de pared, CPU y pico de memoria residente
+- ronda: POST /procesar/<tipo> completo (subida, presupuesto de memoria,
+  pool de procesos, respuesta JSON) contra la app en este proceso con el
+  cliente de pruebas de Flask, o contra un servidor con --url
+
+Informa filas por segundo, MB de archivo por segundo y pico de memoria, y
+guarda todo en un JSON para comparar corridas (--comparar).
+
+Uso:
+    python -m benchmark --filas 10000 100000 1000000 --salida bench.json
+    python -m benchmark --tipos despacho --formatos csv --comparar bench.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmark.generador import FORMATOS, TIPOS, clase_procesador, generar
+
+logger = logging.getLogger(__name__)
+
+ESCALAS = (10000, 100000, 1000000)
+
+MEDICIONES = ('etapas', 'ronda')
+
+# camino -> por_bloques de procesar_dataframe (auto = lo decide el procesador)
+CAMINOS = {'auto': None, 'memoria': False, 'bloques': True}
+
+BYTES_POR_MB = 1024 * 1024
+
+# Versión del formato del archivo de resultados
+VERSION_RESULTADOS = 1
+
+
+def entorno():
+    """Versiones y máquina (para no comparar corridas de entornos distintos sin saberlo)"""
+    import numpy as np
+    import pandas as pd
+
+    datos = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': None
+    }
+    try:
+        datos['commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return datos
+
+
+def _resumir(repeticiones, filas, tamano_bytes):
+    """
+    Junta las repeticiones de una medición: la mediana de los tiempos y el
+    mayor pico de memoria; throughput sobre la mediana
+    """
+    segundos = statistics.median(r['segundos'] for r in repeticiones)
+    etapas = {}
+    for r in repeticiones:
+        for etapa, medida in r['etapas'].items():
+            etapas.setdefault(etapa, []).append(medida)
+    return {
+        'segundos': round(segundos, 4),
+        'segundos_min': round(min(r['segundos'] for r in repeticiones), 4),
+        'filas_por_s': round(filas / segundos) if segundos else None,
+        'mb_por_s': round(tamano_bytes / BYTES_POR_MB / segundos, 2) if segundos else None,
+        'rss_pico_mb': max(r['rss_pico_mb'] for r in repeticiones),
+        'registros': repeticiones[-1]['registros'],
+        'modo': repeticiones[-1].get('modo'),
+        'etapas': {
+            etapa: {
+                'segundos': round(statistics.median(m['segundos'] for m in medidas), 4),
+                'cpu_segundos': round(statistics.median(m['cpu_segundos'] for m in medidas), 4),
+                'rss_pico_mb': max(m.get('rss_pico_mb', 0.0) for m in medidas)
+            }
+            for etapa, medidas in etapas.items()
+        },
+        'repeticiones': len(repeticiones)
+    }
+
+
+def medir_etapas(tipo, ruta, repeticiones=1, camino='auto', memoria_max_mb=None):
+    """
+    Tiempo y memoria por etapa de procesar_dataframe + serialización JSON
+
+    Corre en este proceso con pico exacto por etapa (VmHWM, Linux). Usa un
+    procesador sin cache, así cada repetición parsea el archivo.
+
+    Returns:
+        list de dicts: segundos, etapas, rss_pico_mb, registros y modo
+    """
+    from utils.metricas import CronometroEtapas, ejecutar_medido
+    from utils.serializador import SerializadorJSON
+
+    procesador = clase_procesador(tipo)(memoria_max_mb=memoria_max_mb)
+    por_bloques = CAMINOS[camino]
+    if por_bloques is None:
+        # Lo mismo que decidiría el procesador (los CSV siempre van por bloques)
+        por_bloques = procesador.planificar_memoria(ruta)['por_bloques']
+    resultados = []
+    for i in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        (df_agrupado, stats), medicion = ejecutar_medido(
+            procesador.procesar_dataframe, pico_exclusivo=True,
+            archivo_path=ruta, request_id=f'benchmark_{tipo}_{i}', por_bloques=por_bloques)
+        cronometro = CronometroEtapas(pico_exclusivo=True)
+        cronometro.agregar(medicion)
+        with cronometro.medir('serializacion'):
+            respuesta = SerializadorJSON.codificar(procesador.construir_respuesta(df_agrupado, stats))
+        segundos = time.perf_counter() - inicio
+        resultados.append({
+            'segundos': segundos,
+            'etapas': cronometro.etapas(),
+            'rss_pico_mb': round(cronometro.rss_pico_mb(), 1),
+            'registros': len(df_agrupado),
+            'modo': 'bloques' if por_bloques else 'memoria',
+            'respuesta_bytes': len(respuesta)
+        })
+        del df_agrupado, stats, respuesta
+    return resultados
+
+
+def _nombre_subida(ruta):
+    """Nombre con que se sube el archivo: la API acepta .csv y detecta el gzip por la firma"""
+    nombre = os.path.basename(ruta)
+    return nombre[:-len('.gz')] if nombre.endswith('.csv.gz') else nombre
+
+
+class ClienteApp:
+    """POST /procesar/<tipo> contra la app en este proceso (cliente de pruebas de Flask)"""
+
+    def __init__(self):
+        import app as modulo_app
+
+        # Sin cache: cada repetición debe parsear el archivo
+        modulo_app.app.config['CACHE_HABILITADA'] = False
+        modulo_app.app.config['ARRANQUE_CALENTAR'] = False
+        modulo_app.iniciar_componentes(en_segundo_plano=False)
+        self.modulo = modulo_app
+        self.cliente = modulo_app.app.test_client()
+        self.destino = f"app en proceso (ejecutor: {modulo_app.app.config['EJECUTOR']})"
+
+    def procesar(self, tipo, ruta):
+        """Returns: (status, dict de la respuesta, bytes de la respuesta)"""
+        with open(ruta, 'rb') as archivo:
+            respuesta = self.cliente.post(f'/procesar/{tipo}', content_type='multipart/form-data',
+                                          data={'archivo': (archivo, _nombre_subida(ruta))})
+        cuerpo = respuesta.get_data()
+        return respuesta.status_code, json.loads(cuerpo), len(cuerpo)
+
+    def cerrar(self):
+        if self.modulo.EJECUTOR is not None:
+            self.modulo.EJECUTOR.cerrar()
+
+
+class ClienteHttp:
+    """POST /procesar/<tipo> contra un servidor ya levantado (ej: servidor.py)"""
+
+    def __init__(self, url, timeout=600):
+        from urllib.parse import urlsplit
+
+        partes = urlsplit(url)
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.prefijo = partes.path.rstrip('/')
+        self.timeout = timeout
+        self.destino = url
+
+    def procesar(self, tipo, ruta):
+        import http.client
+
+        limite = uuid.uuid4().hex
+        inicio = (f'--{limite}\r\nContent-Disposition: form-data; name="archivo"; '
+                  f'filename="{_nombre_subida(ruta)}"\r\n'
+                  f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+        fin = f'\r\n--{limite}--\r\n'.encode('utf-8')
+        with open(ruta, 'rb') as archivo:
+            cuerpo = inicio + archivo.read() + fin
+
+        conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+        try:
+            conexion.request('POST', f'{self.prefijo}/procesar/{tipo}', body=cuerpo, headers={
+                'Content-Type': f'multipart/form-data; boundary={limite}'})
+            respuesta = conexion.getresponse()
+            datos = respuesta.read()
+        finally:
+            conexion.close()
+        return respuesta.status, json.loads(datos), len(datos)
+
+    def cerrar(self):
+        pass
+
+
+def medir_ronda(cliente, tipo, ruta, repeticiones=1):
+    """
+    POST /procesar/<tipo> completo
+
+    El pico de memoria es el que informa la respuesta (metadata.memoria:
+    el del worker que procesó el archivo).
+
+    Returns:
+        list de dicts: segundos, etapas, rss_pico_mb, registros, modo y
+        bytes de la respuesta
+    """
+    resultados = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        status, datos, tamano = cliente.procesar(tipo, ruta)
+        segundos = time.perf_counter() - inicio
+        if status != 200 or not datos.get('success'):
+            raise RuntimeError(f"/procesar/{tipo} respondió {status}: {datos.get('error')}")
+        metadata = datos.get('metadata', {})
+        memoria = metadata.get('memoria') or {}
+        resultados.append({
+            'segundos': segundos,
+            'etapas': metadata.get('etapas', {}),
+            'rss_pico_mb': memoria.get('rss_pico_mb', 0.0),
+            'registros': datos.get('total_registros'),
+            'modo': memoria.get('modo'),
+            'desde_cache': bool((datos.get('stats') or {}).get('desde_cache')),
+            'respuesta_bytes': tamano
+        })
+    return resultados
+
+
+def ejecutar(tipos=tuple(TIPOS), formatos=('xlsx',), escalas=ESCALAS, mediciones=MEDICIONES,
+             repeticiones=1, camino='auto', directorio=None, url=None, opciones_generador=None,
+             memoria_max_mb=None):
+    """
+    Corre el benchmark completo
+
+    Args:
+        mediciones: 'etapas' y/o 'ronda'
+        camino: 'auto', 'memoria' o 'bloques' (solo etapas; la ronda usa el
+            presupuesto de memoria de la app)
+        directorio: Carpeta de los archivos generados
+        url: Servidor para la ronda (None = app en este proceso)
+        opciones_generador: documentos, skus, semilla, ... (ver GeneradorDetail)
+        memoria_max_mb: Presupuesto por archivo de los procesadores de 'etapas'
+
+    Returns:
+        Dict serializable con entorno, parámetros y resultados
+    """
+    opciones_generador = opciones_generador or {}
+    informe = {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': entorno(),
+        'parametros': {
+            'tipos': list(tipos), 'formatos': list(formatos), 'escalas': list(escalas),
+            'mediciones': list(mediciones), 'repeticiones': repeticiones, 'camino': camino,
+            'memoria_max_mb': memoria_max_mb, 'generador': opciones_generador
+        },
+        'resultados': []
+    }
+
+    cliente = None
+    if 'ronda' in mediciones:
+        cliente = ClienteHttp(url) if url else ClienteApp()
+        informe['parametros']['ronda_destino'] = cliente.destino
+
+    try:
+        for filas in escalas:
+            for tipo in tipos:
+                for formato in formatos:
+                    inicio = time.perf_counter()
+                    ruta = generar(tipo, filas, formato=formato, directorio=directorio, **opciones_generador)
+                    tamano = os.path.getsize(ruta)
+                    logger.info(f"{os.path.basename(ruta)}: {tamano / BYTES_POR_MB:.1f} MB "
+                                f"(listo en {time.perf_counter() - inicio:.1f}s)")
+                    for medicion in mediciones:
+                        if medicion == 'etapas':
+                            repetidas = medir_etapas(tipo, ruta, repeticiones, camino, memoria_max_mb)
+                        else:
+                            repetidas = medir_ronda(cliente, tipo, ruta, repeticiones)
+                        resultado = dict({'tipo': tipo, 'formato': formato, 'filas': filas,
+                                          'medicion': medicion, 'archivo': os.path.basename(ruta),
+                                          'archivo_bytes': tamano},
+                                         **_resumir(repetidas, filas, tamano))
+                        if any(r.get('desde_cache') for r in repetidas):
+                            resultado['desde_cache'] = True
+                        informe['resultados'].append(resultado)
+                        logger.info(_linea(resultado))
+    finally:
+        if cliente is not None:
+            cliente.cerrar()
+    return informe
+
+
+def _clave(resultado):
+    return (resultado['tipo'], resultado['formato'], resultado['filas'], resultado['medicion'])
+
+
+def _linea(resultado):
+    etapas = ', '.join(f"{etapa} {medida['segundos']:.2f}s" for etapa, medida in resultado['etapas'].items())
+    return (f"{resultado['tipo']:<9} {resultado['formato']:<6} {resultado['filas']:>8} {resultado['medicion']:<6} "
+            f"{resultado['segundos']:>8.2f}s {resultado['filas_por_s'] or 0:>9} filas/s "
+            f"{resultado['rss_pico_mb']:>7.1f} MB pico [{etapas}]")
+
+
+def comparar(anterior, actual):
+    """
+    Líneas con la variación de tiempo y de pico de memoria respecto de otra
+    corrida (mismo tipo, formato, filas y medición)
+    """
+    previos = {_clave(r): r for r in anterior.get('resultados', [])}
+    lineas = []
+    if anterior.get('entorno', {}).get('plataforma') != actual['entorno']['plataforma']:
+        lineas.append('Atención: las corridas son de máquinas distintas')
+    for resultado in actual['resultados']:
+        previo = previos.get(_clave(resultado))
+        if previo is None:
+            continue
+        tiempo = resultado['segundos'] / previo['segundos'] - 1 if previo['segundos'] else 0.0
+        memoria = resultado['rss_pico_mb'] - previo['rss_pico_mb']
+        lineas.append(f"{resultado['tipo']:<9} {resultado['formato']:<6} {resultado['filas']:>8} "
+                      f"{resultado['medicion']:<6} {previo['segundos']:>8.2f}s -> {resultado['segundos']:>8.2f}s "
+                      f"({tiempo:+.1%})  pico {previo['rss_pico_mb']:.0f} -> {resultado['rss_pico_mb']:.0f} MB "
+                      f"({memoria:+.0f})")
+    return lineas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de los procesadores (no son tests)')
+    parser.add_argument('--tipos', nargs='+', choices=list(TIPOS), default=list(TIPOS))
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=['xlsx'])
+    parser.add_argument('--filas', nargs='+', type=int, default=list(ESCALAS))
+    parser.add_argument('--mediciones', nargs='+', choices=MEDICIONES, default=list(MEDICIONES))
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--camino', choices=list(CAMINOS), default='auto',
+                        help='Camino de los .xlsx en la medición de etapas')
+    parser.add_argument('--memoria-max-mb', type=int, default=None,
+                        help='Presupuesto por archivo en la medición de etapas (camino auto)')
+    parser.add_argument('--url', default=None,
+                        help='Servidor para la ronda (ej: http://127.0.0.1:5000); por defecto la app en proceso')
+    parser.add_argument('--datos', default=None, help='Carpeta de los archivos generados')
+    parser.add_argument('--documentos', type=int, default=None)
+    parser.add_argument('--skus', type=int, default=2000)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', default=None,
+                        help='Archivo JSON de resultados (por defecto benchmark_<fecha>.json)')
+    parser.add_argument('--comparar', default=None, help='JSON de una corrida anterior')
+    opciones = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # El detalle de cada procesamiento tapa el resumen
+    logging.getLogger('procesadores').setLevel(logging.WARNING)
+    logging.getLogger('utils').setLevel(logging.WARNING)
+
+    informe = ejecutar(
+        tipos=opciones.tipos, formatos=opciones.formatos, escalas=opciones.filas,
+        mediciones=opciones.mediciones, repeticiones=opciones.repeticiones, camino=opciones.camino,
+        directorio=opciones.datos, url=opciones.url, memoria_max_mb=opciones.memoria_max_mb,
+        opciones_generador={'documentos': opciones.documentos, 'skus': opciones.skus,
+                            'semilla': opciones.semilla})
+
+    salida = opciones.salida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+
+    print()
+    for resultado in informe['resultados']:
+        print(_linea(resultado))
+    if opciones.comparar:
+        with open(opciones.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nRespecto de {opciones.comparar}:")
+        for linea in comparar(anterior, informe):
+            print(linea)
+    print(f"\nResultados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,22 @@
 # Este archivo hace que la carpeta sea un paquete Python
-from .recepcion_procesador import RecepcionProcesador
-from .despacho_procesador import DespachoProcesador
-from .paquete_procesador import PaqueteProcesador
-from .almacen_procesador import AlmacenProcesador
+# Los procesadores se importan al primer uso (cargan pandas)
+import importlib
 
-__all__ = ['RecepcionProcesador', 'DespachoProcesador', 
-           'PaqueteProcesador', 'AlmacenProcesador']
\ No newline at end of file
+_EXPORTACIONES = {
+    'RecepcionProcesador': 'recepcion_procesador',
+    'DespachoProcesador': 'despacho_procesador',
+    'PaqueteProcesador': 'paquete_procesador',
+    'AlmacenProcesador': 'almacen_procesador',
+    'PlanEjecucion': 'plan_ejecucion',
+}
+
+__all__ = list(_EXPORTACIONES)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTACIONES.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f'.{modulo}', __name__), nombre)
+    globals()[nombre] = valor
+    return valor
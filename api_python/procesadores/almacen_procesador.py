@@ -6,48 +6,30 @@ Procesador para el módulo de Almacenamiento
 """
 
 import logging
-import pandas as pd
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from procesadores.procesador_base import ProcesadorBase
 
 logger = logging.getLogger(__name__)
 
-class AlmacenProcesador:
-    """Procesador para archivos de almacenamiento"""
+class AlmacenProcesador(ProcesadorBase):
+    """Procesador para archivos de almacenamiento (vista previa, sin agrupar)"""
     
-    def __init__(self):
-        self.nombre_modulo = 'AlmacenProcesador'
+    MODULO = 'almacen'
     
-    def procesar(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None):
-        """
-        Procesa archivo de almacenamiento
-        """
-        logger.info(f"[{request_id}] Procesando almacen: {archivo_path}")
-        
-        try:
-            df = pd.read_excel(archivo_path, engine='openpyxl')
-            
-            headers = ['CODIGO', 'PRODUCTO', 'UBICACION', 'STOCK', 
-                      'STOCK_MIN', 'STOCK_MAX', 'VALOR']
-            
-            datos_preview = []
-            for i in range(min(10, len(df))):
-                fila = [str(df.iloc[i, j]) if j < len(df.columns) else '-' for j in range(7)]
-                datos_preview.append(fila)
-            
-            return {
-                'success': True,
-                'total_registros': len(df),
-                'headers': headers,
-                'data': datos_preview,
-                'stats': {
-                    'total_filas': len(df),
-                    'mostrando': len(datos_preview)
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"[{request_id}] Error: {str(e)}")
-            raise
\ No newline at end of file
+    # Columnas por posición en la primera hoja
+    COLUMNAS = {
+        'CODIGO': {'col': 'A', 'tipo': 'string'},
+        'PRODUCTO': {'col': 'B', 'tipo': 'string'},
+        'UBICACION': {'col': 'C', 'tipo': 'string'},
+        'STOCK': {'col': 'D', 'tipo': 'string'},
+        'STOCK_MIN': {'col': 'E', 'tipo': 'string'},
+        'STOCK_MAX': {'col': 'F', 'tipo': 'string'},
+        'VALOR': {'col': 'G', 'tipo': 'string'}
+    }
+    
+    HEADERS = ['CODIGO', 'PRODUCTO', 'UBICACION', 'STOCK', 'STOCK_MIN', 'STOCK_MAX', 'VALOR']
+    
+    FILAS_PREVIEW = 10
@@ -6,48 +6,29 @@ Procesador para el módulo de Paquete
 """
 
 import logging
-import pandas as pd
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from procesadores.procesador_base import ProcesadorBase
 
 logger = logging.getLogger(__name__)
 
-class PaqueteProcesador:
-    """Procesador para archivos de paquete"""
+class PaqueteProcesador(ProcesadorBase):
+    """Procesador para archivos de paquete (vista previa, sin agrupar)"""
     
-    def __init__(self):
-        self.nombre_modulo = 'PaqueteProcesador'
+    MODULO = 'paquete'
     
-    def procesar(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None):
-        """
-        Procesa archivo de paquete
-        """
-        logger.info(f"[{request_id}] Procesando paquete: {archivo_path}")
-        
-        try:
-            df = pd.read_excel(archivo_path, engine='openpyxl')
-            
-            headers = ['ID_PAQUETE', 'TIPO', 'PESO', 'VOLUMEN', 
-                      'DIMENSIONES', 'ESTADO']
-            
-            datos_preview = []
-            for i in range(min(10, len(df))):
-                fila = [str(df.iloc[i, j]) if j < len(df.columns) else '-' for j in range(6)]
-                datos_preview.append(fila)
-            
-            return {
-                'success': True,
-                'total_registros': len(df),
-                'headers': headers,
-                'data': datos_preview,
-                'stats': {
-                    'total_filas': len(df),
-                    'mostrando': len(datos_preview)
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"[{request_id}] Error: {str(e)}")
-            raise
\ No newline at end of file
+    # Columnas por posición en la primera hoja
+    COLUMNAS = {
+        'ID_PAQUETE': {'col': 'A', 'tipo': 'string'},
+        'TIPO': {'col': 'B', 'tipo': 'string'},
+        'PESO': {'col': 'C', 'tipo': 'string'},
+        'VOLUMEN': {'col': 'D', 'tipo': 'string'},
+        'DIMENSIONES': {'col': 'E', 'tipo': 'string'},
+        'ESTADO': {'col': 'F', 'tipo': 'string'}
+    }
+    
+    HEADERS = ['ID_PAQUETE', 'TIPO', 'PESO', 'VOLUMEN', 'DIMENSIONES', 'ESTADO']
+    
+    FILAS_PREVIEW = 10
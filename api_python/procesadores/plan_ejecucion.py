@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Plan de ejecución compilado a partir de la especificación de un módulo
+La especificación es declarativa y vive en la clase del procesador:
+COLUMNAS (nombre -> letra y tipo), HEADERS, CLAVES, STATUS_VALIDOS,
+COLUMNA_FECHA, COLUMNA_CANTIDAD y COLUMNAS_UOM (pivot de la cantidad por
+UOM). compilar() la valida una sola vez, al crear el primer procesador del
+módulo (en el arranque de la API), y precalcula lo que el motor de
+ProcesadorBase resolvía en cada petición: índices de columna, dtypes de
+lectura, campos y reducers de la agrupación y el pivot de UOM.
+
+Un módulo sin CLAVES no agrupa: es de vista previa (paquete, almacén) y
+COLUMNAS indica qué columnas de la primera hoja se muestran.
+"""
+
+import logging
+
+from utils.excel_utils import ExcelUtils
+
+logger = logging.getLogger(__name__)
+
+TIPOS_COLUMNA = ('string', 'float', 'date')
+
+
+class EspecificacionInvalida(ValueError):
+    """La especificación del módulo es inconsistente (se detecta al arrancar)"""
+
+
+class ModuloSinAgrupacion(TypeError):
+    """Se pidió el resultado agrupado a un módulo de vista previa (sin CLAVES)"""
+
+
+class PlanEjecucion:
+    """Especificación validada con índices, tipos y reducers precalculados"""
+
+    def __init__(self, modulo, columnas, headers, claves=(), status_validos=(), columna_fecha=None,
+                 columna_cantidad=None, columnas_uom=None, columnas_categoria=()):
+        """
+        Args:
+            modulo: Nombre del módulo (para los mensajes)
+            columnas: Dict nombre -> {'col': letra Excel, 'tipo': TIPOS_COLUMNA}
+            headers: Columnas de salida en orden
+            claves: Columnas de agrupación (vacío = módulo de vista previa)
+            columnas_uom: Columna de salida -> UOM que la alimenta
+            columnas_categoria: Columnas candidatas a categoría
+
+        Raises:
+            EspecificacionInvalida
+        """
+        columnas_uom = dict(columnas_uom or {})
+        self.modulo = modulo
+        self._validar(columnas, headers, claves, columna_fecha, columna_cantidad, columnas_uom)
+
+        # Lectura: índices ya resueltos (las letras inválidas, como '??',
+        # quedan negativas y el lector las resuelve contra el ancho de la hoja)
+        self.columnas = {nombre: ExcelUtils.excel_col_to_index(info['col']) for nombre, info in columnas.items()}
+        self.tipos = {nombre: info.get('tipo', 'string') for nombre, info in columnas.items()}
+        self.headers = list(headers)
+        self.agrupa = bool(claves)
+
+        # Filtros y normalización
+        self.claves = list(claves)
+        self.columna_status = 'STATUS' if 'STATUS' in columnas else None
+        self.status_validos = [str(s).strip() for s in status_validos]
+        self.columna_fecha = columna_fecha
+        self.columna_cantidad = columna_cantidad
+        self.columnas_categoria = [c for c in columnas_categoria if c in columnas]
+
+        # Agrupación: campos que salen de la primera fila de cada grupo (se
+        # cruzan con las columnas presentes en el archivo), reducers del
+        # groupby y, por header de salida, la UOM que lo alimenta (o None)
+        self.columnas_codigo = [f'_C{i}' for i in range(len(self.claves))]
+        self.columnas_clave = [f'_K{i}' for i in range(len(self.claves))]
+        self.campos = [h for h in self.headers if h not in columnas_uom]
+        if 'UOM' not in self.campos:
+            self.campos.append('UOM')
+        self.reducers = {'_POS': ('_POS', 'first')}
+        if columna_cantidad:
+            self.reducers['CANTIDAD'] = ('QTY_ENTERO', 'sum')
+        self.salida = [(header, columnas_uom.get(header)) for header in self.headers]
+
+    def _validar(self, columnas, headers, claves, columna_fecha, columna_cantidad, columnas_uom):
+        errores = []
+        if not headers:
+            errores.append('HEADERS vacío')
+        for nombre, info in columnas.items():
+            if not info.get('col'):
+                errores.append(f"{nombre} sin letra de columna")
+            if info.get('tipo', 'string') not in TIPOS_COLUMNA:
+                errores.append(f"{nombre} con tipo desconocido {info.get('tipo')!r}")
+        for clave in claves:
+            if clave not in columnas:
+                errores.append(f"la clave {clave} no está en COLUMNAS")
+        for rol, columna in (('COLUMNA_FECHA', columna_fecha), ('COLUMNA_CANTIDAD', columna_cantidad)):
+            if columna and columna not in columnas:
+                errores.append(f"{rol} {columna} no está en COLUMNAS")
+        if not claves:
+            for header in headers:
+                if header not in columnas:
+                    errores.append(f"{header} (vista previa) no está en COLUMNAS")
+        if claves and columnas_uom and 'UOM' not in columnas:
+            errores.append('COLUMNAS_UOM sin columna UOM')
+        if errores:
+            raise EspecificacionInvalida(f"Especificación de {self.modulo} inválida: {'; '.join(errores)}")
+
+    @classmethod
+    def desde_clase(cls, clase):
+        """Compila la especificación declarada en los atributos de la clase del procesador"""
+        return cls(
+            modulo=clase.__name__,
+            columnas=clase.COLUMNAS,
+            headers=clase.HEADERS,
+            claves=clase.CLAVES,
+            status_validos=clase.STATUS_VALIDOS,
+            columna_fecha=clase.COLUMNA_FECHA,
+            columna_cantidad=clase.COLUMNA_CANTIDAD,
+            columnas_uom=clase.COLUMNAS_UOM if clase.CLAVES else None,
+            columnas_categoria=clase.COLUMNAS_CATEGORIA
+        )
+
+    def exigir_agrupacion(self):
+        """Falla si el módulo es de vista previa: solo recepción y despacho tienen resultado agrupado"""
+        if not self.agrupa:
+            raise ModuloSinAgrupacion(f"{self.modulo} no agrupa: solo admite vista previa")
+
+    def posiciones_vista_previa(self):
+        """Índices (0-based) de las columnas que muestra un módulo de vista previa, en orden de HEADERS"""
+        return [self.columnas[header] for header in self.headers]
+
+    def describir(self):
+        """Resumen del plan (para el log de arranque)"""
+        if not self.agrupa:
+            return f"vista previa de {len(self.columnas)} columnas"
+        return (f"{len(self.columnas)} columnas, claves {'+'.join(self.claves)}, "
+                f"{len(self.status_validos)} STATUS válidos, fecha {self.columna_fecha}, "
+                f"cantidad {self.columna_cantidad}")
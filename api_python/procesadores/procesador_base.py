@@ -9,73 +9,738 @@ Versión unificada con mejor manejo de datos
 import pandas as pd
 import numpy as np
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.excel_utils import ExcelUtils
+from utils.cantidad_utils import CantidadUtils
+from utils.fecha_utils import FechaUtils
+from utils.serializador import SerializadorJSON
+from utils.libro_excel import LibroExcel
+from utils.lector_csv import LectorCsv
+from utils.filtro_lectura import FiltroLectura
+from utils.memoria_utils import MemoriaUtils
+from utils.metricas import CronometroEtapas
+from utils import subidas
+from utils.presupuesto_memoria import estimar_libro, BYTES_POR_MB
+from procesadores.plan_ejecucion import PlanEjecucion
 
 logger = logging.getLogger(__name__)
 
 class ProcesadorBase:
-    """Clase base para todos los procesadores"""
+    """
+    Motor común de todos los módulos
     
-    def __init__(self):
+    Cada procesador solo declara su especificación (los atributos de abajo);
+    compilar() la convierte una vez en un PlanEjecucion que usa el resto de
+    los métodos. Con CLAVES el módulo lee la hoja Detail, filtra, normaliza
+    y agrupa; sin CLAVES es de vista previa (primeras filas de la primera hoja).
+    """
+    
+    # Especificación del módulo (definida por cada procesador)
+    MODULO = None             # Nombre para el log
+    COLUMNAS = {}             # nombre -> {'col': letra Excel, 'tipo': 'string' | 'float' | 'date'}
+    HEADERS = []              # Columnas de salida, en orden
+    STATUS_VALIDOS = []       # STATUS que pasan el filtro
+    CLAVES = []               # Columnas de agrupación (vacío = vista previa)
+    COLUMNA_CANTIDAD = None   # Cantidad cruda -> QTY_ENTERO
+    COLUMNA_FECHA = None      # Fecha del filtro por rango
+    
+    # Columna de salida -> valor de UOM (normalizado) que la alimenta
+    COLUMNAS_UOM = {'UNIDADES': 'UN', 'CAJAS': 'CJ', 'PALLETS': 'PL'}
+    
+    # Filas que viajan como vista previa en 'data'
+    FILAS_PREVIEW = 100
+    
+    # Pocos valores distintos repetidos en todas las filas: se guardan como categoría
+    COLUMNAS_CATEGORIA = ['STORERKEY', 'UOM', 'STATUS', 'TYPE']
+    
+    # Camino por bloques (CSV, o .xlsx que no entra en el presupuesto de memoria)
+    FILAS_POR_BLOQUE = 100000
+    PARCIALES_POR_COMPACTACION = 8   # Parciales acumulados antes de combinarlos en uno
+    
+    # Memoria pico del camino completo ~ FACTOR x bytes del XML de la hoja sin
+    # comprimir (medido con hojas Detail de 100k-200k filas)
+    FACTOR_MEMORIA_XLSX = 3
+    # Sin tamaño de hoja conocido (.xls): memoria ~ FACTOR x bytes del archivo
+    FACTOR_MEMORIA_ARCHIVO = 10
+    # Camino por bloques: un bloque de FILAS_POR_BLOQUE filas en sus distintas
+    # formas más los parciales (medido con 1M filas: ~230MB sobre la base del proceso)
+    MEMORIA_BLOQUES_MB = 256
+    # Vista previa de .xlsx o CSV: unas pocas filas, no depende del tamaño del archivo
+    MEMORIA_VISTA_PREVIA_MB = 16
+    
+    def __init__(self, cache=None, memoria_max_mb=None):
+        """
+        Args:
+            cache: CacheResultados opcional para reutilizar el frame normalizado
+            memoria_max_mb: Presupuesto de memoria por archivo; si la estimación
+                del camino completo lo supera se procesa por bloques (None = sin límite)
+        """
         self.utils = ExcelUtils()
+        self.cache = cache
+        self.memoria_max_mb = memoria_max_mb
+        self.plan = self.compilar()
+    
+    @classmethod
+    def compilar(cls):
+        """
+        PlanEjecucion del módulo, compilado una sola vez por clase
         
-    def _convertir_a_serializable(self, obj):
-        """Convierte objetos numpy a tipos nativos"""
-        if obj is None or pd.isna(obj):
-            return ''
-        if isinstance(obj, (np.int64, np.int32, np.int16, np.int8)):
-            return int(obj)
-        if isinstance(obj, (np.float64, np.float32, np.float16)):
-            return int(obj) if float(obj).is_integer() else float(obj)
-        if isinstance(obj, (np.datetime64, pd.Timestamp, datetime)):
-            return obj.strftime('%d/%m/%Y')
-        if isinstance(obj, (datetime)):
-            return obj.strftime('%d/%m/%Y')
-        return str(obj)
+        Raises:
+            EspecificacionInvalida: la especificación es inconsistente
+        """
+        plan = cls.__dict__.get('_plan')
+        if plan is None:
+            plan = PlanEjecucion.desde_clase(cls)
+            cls._plan = plan
+            logger.info(f"Plan de {cls.__name__} compilado: {plan.describir()}")
+        return plan
+        
+    def crear_filtro(self, fecha_desde=None, fecha_hasta=None):
+        """FiltroLectura con STATUS_VALIDOS y el rango de fechas (None = sin rango)"""
+        return FiltroLectura(
+            columna_status=self.plan.columna_status,
+            status_validos=self.plan.status_validos,
+            columna_fecha=self.plan.columna_fecha,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            claves=self.plan.claves,
+            columna_cantidad=self.plan.columna_cantidad
+        )
     
-    def _convertir_dataframe_a_lista(self, df):
-        """Convierte DataFrame a lista serializable"""
-        return [[self._convertir_a_serializable(val) for val in row] for _, row in df.iterrows()]
+    def leer_normalizado(self, archivo_path, request_id=None, progreso=None, fecha_desde=None, fecha_hasta=None):
+        """
+        Lee el archivo y devuelve el frame limpio, filtrado por STATUS y con
+        cantidades/fechas normalizadas
+        
+        STATUS (y el rango de fechas, si se pasa) se filtran al leer. Con rango,
+        info['descartes_fecha'] trae lo descartado al leer, para sumarlo a lo
+        que filtre aplicar_filtros_fecha (ver sumar_descartes_fecha).
+        
+        Args:
+            archivo_path: Ruta u objeto archivo binario (ej: el stream de la subida)
+            progreso: Callable opcional (etapa, filas=None, total=None), ver avisar_progreso
+        
+        Returns:
+            tuple: (DataFrame, dict info serializable a JSON)
+        """
+        # Leer Excel: un solo handle y solo las columnas de COLUMNAS
+        filtro = self.crear_filtro(fecha_desde, fecha_hasta)
+        with LibroExcel(archivo_path) as libro:
+            df_resultado, hoja = self.leer_columnas_detail(libro, progreso, filtro)
+            if filtro.descartadas_status and 'STATUS' not in df_resultado.columns:
+                # La hoja no llega a la columna STATUS: no se filtra por STATUS
+                logger.info(f"[{request_id}] Hoja sin columna STATUS, releyendo sin filtro")
+                filtro = self.crear_filtro(fecha_desde, fecha_hasta)
+                filtro.columna_status = None
+                df_resultado, hoja = self.leer_columnas_detail(libro, progreso, filtro)
+        logger.info(f"[{request_id}] Hoja: {hoja}, Filas: {len(df_resultado)} "
+                    f"({filtro.descartadas_status} descartadas por STATUS al leer)")
+        memoria = {'lectura': MemoriaUtils.mb_frame(df_resultado)}
+        
+        descartes = filtro.vaciar()
+        df_resultado, cantidades_invalidas = self.normalizar(df_resultado, request_id, progreso,
+                                                             cantidades_descartadas=descartes.pop('cantidades'))
+        memoria['normalizado'] = MemoriaUtils.mb_frame(df_resultado)
+        info = {'hoja': hoja, 'cantidades_invalidas': cantidades_invalidas, 'memoria_mb': memoria}
+        if filtro.columna_fecha is not None:
+            info['descartes_fecha'] = descartes
+        return df_resultado, info
     
-    def _extraer_parte_entera(self, valor):
-        """Extrae parte entera de número con coma"""
+    def normalizar(self, df_resultado, request_id=None, progreso=None, registrar=True, cantidades_descartadas=None):
+        """
+        Limpia, filtra STATUS y normaliza cantidades y fechas (sin filtro de fecha)
+        
+        Sirve para el frame completo y para cada bloque del camino por bloques.
+        
+        Args:
+            registrar: Loguear las filas tras cada paso (False en bloques)
+            cantidades_descartadas: Cantidades crudas de filas que el FiltroLectura
+                descartó por fecha; entran en la detección del formato y en el
+                conteo de inválidas como si siguieran en el frame
+        
+        Returns:
+            tuple: (DataFrame, cantidades no interpretables)
+        """
+        # Limpiar y filtrar
+        self.avisar_progreso(progreso, 'extraccion', filas=len(df_resultado))
+        df_resultado = df_resultado.dropna(subset=self.plan.claves, how='all')
+        if registrar:
+            logger.info(f"[{request_id}] Después de limpiar: {len(df_resultado)} filas")
+        
+        # Filtrar STATUS (sobre los valores distintos de la categoría, no fila a fila)
+        self.avisar_progreso(progreso, 'filtro_status', filas=len(df_resultado))
+        if 'STATUS' in df_resultado.columns and len(df_resultado) > 0:
+            status = MemoriaUtils.categorizar(df_resultado['STATUS'])
+            validas = status.cat.categories.astype(str).str.strip().isin(self.plan.status_validos)
+            mascara = np.append(validas, False)[status.cat.codes.to_numpy()]
+            df_resultado = df_resultado[mascara].copy()
+            df_resultado['STATUS'] = status[mascara]
+            if registrar:
+                logger.info(f"[{request_id}] Después de filtrar STATUS: {len(df_resultado)} filas")
+        df_resultado = self.compactar(df_resultado)
+        
+        # Procesar cantidades
+        cantidades_invalidas = 0
+        cantidad, fecha = self.plan.columna_cantidad, self.plan.columna_fecha
+        if cantidad in df_resultado.columns and (len(df_resultado) > 0 or cantidades_descartadas):
+            df_resultado['QTY_ENTERO'], cantidades_invalidas = self._extraer_cantidades(
+                df_resultado[cantidad], request_id, cantidades_descartadas)
+            df_resultado = df_resultado.drop(columns=[cantidad])
+        
+        # Normalizar fechas (el rango se filtra después, también sobre datos en cache)
+        if fecha in df_resultado.columns:
+            df_resultado[fecha] = FechaUtils.normalizar_fechas(df_resultado[fecha])
+        
+        return df_resultado, cantidades_invalidas
+    
+    def compactar(self, df):
+        """COLUMNAS_CATEGORIA como categoría y CLAVES con texto internado"""
+        for columna in self.plan.columnas_categoria:
+            if columna in df.columns:
+                df[columna] = MemoriaUtils.categorizar(df[columna])
+        for columna in self.plan.claves:
+            if columna in df.columns:
+                df[columna] = MemoriaUtils.internar(df[columna])
+        return df
+    
+    def cargar_normalizado(self, archivo_path, request_id=None, progreso=None, fecha_desde=None, fecha_hasta=None):
+        """
+        leer_normalizado pasando por la cache (si hay) por hash del archivo
+        
+        Sin cache el rango de fechas se filtra al leer; con cache no, para que
+        el frame guardado sirva para cualquier rango.
+        """
+        if self.cache is None:
+            return self.leer_normalizado(archivo_path, request_id, progreso, fecha_desde, fecha_hasta)
+        
+        clave = self.cache.clave(archivo_path, self.__class__.__name__)
+        en_cache = self.cache.obtener(clave)
+        if en_cache is not None:
+            df, info = en_cache
+            logger.info(f"[{request_id}] Frame normalizado desde cache ({clave[:12]}): {len(df)} filas")
+            self.avisar_progreso(progreso, 'filtro_status', filas=len(df))
+            df = self.compactar(df)
+            return df, dict(info, desde_cache=True, memoria_mb={'normalizado': MemoriaUtils.mb_frame(df)})
+        
+        df, info = self.leer_normalizado(archivo_path, request_id, progreso)
         try:
-            if pd.isna(valor) or valor is None:
-                return 0
-            if isinstance(valor, (int, float, np.integer, np.floating)):
-                return int(float(valor))
-            valor_str = str(valor).strip()
-            if ',' in valor_str:
-                return int(float(valor_str.split(',')[0].replace('.', '')))
-            if valor_str:
-                return int(float(valor_str.replace(',', '').replace('.', '')))
-            return 0
+            self.cache.guardar(clave, df, info)
         except Exception as e:
-            logger.warning(f"Error extrayendo parte entera: {e}")
-            return 0
+            logger.warning(f"[{request_id}] No se pudo guardar en cache: {e}")
+        return df, info
+    
+    def estimar_memoria(self, archivo_path):
+        """
+        Memoria estimada (bytes) de procesar el archivo completo en memoria
+        
+        Returns:
+            tuple: (bytes estimados o None si no se puede estimar, hoja Detail)
+        """
+        with LibroExcel(archivo_path) as libro:
+            if not libro.es_xlsx:
+                # .xls: listar las hojas ya sería parsear el libro entero
+                return None, None
+            hoja = self.buscar_hoja_detail(libro)
+            tamano = libro.tamano_hoja(hoja)
+        if tamano is None:
+            return None, hoja
+        return tamano * self.FACTOR_MEMORIA_XLSX, hoja
+    
+    def planificar_memoria(self, archivo_path, request_id=None):
+        """
+        Memoria estimada de cada camino, antes de parsear (para
+        PresupuestoMemoria.admitir)
+        
+        Returns:
+            dict: completo_mb (camino en memoria; None en CSV, que siempre va
+                  por bloques), bloques_mb (None si no hay camino por bloques,
+                  .xls) y por_bloques (True si el camino en memoria excede
+                  memoria_max_mb)
+        """
+        if not self.plan.agrupa:
+            # Vista previa: los .xls se leen enteros con pandas
+            with LibroExcel(archivo_path) as libro:
+                parcial = libro.es_xlsx
+            if parcial or LectorCsv.es_csv(archivo_path):
+                return {'completo_mb': self.MEMORIA_VISTA_PREVIA_MB, 'bloques_mb': None, 'por_bloques': False}
+            return {'completo_mb': round(estimar_libro(archivo_path) / BYTES_POR_MB, 1), 'bloques_mb': None,
+                    'por_bloques': False}
+        if LectorCsv.es_csv(archivo_path):
+            return {'completo_mb': None, 'bloques_mb': self.MEMORIA_BLOQUES_MB, 'por_bloques': True}
+        
+        estimado, hoja = self.estimar_memoria(archivo_path)
+        if estimado is None:
+            tamano = subidas.tamano_origen(archivo_path)
+            return {'completo_mb': round(tamano * self.FACTOR_MEMORIA_ARCHIVO / 1024 / 1024, 1),
+                    'bloques_mb': None, 'por_bloques': False}
+        
+        completo = estimado / 1024 / 1024
+        por_bloques = bool(self.memoria_max_mb) and completo > self.memoria_max_mb
+        if por_bloques:
+            logger.info(f"[{request_id}] Hoja {hoja}: ~{completo:.0f}MB estimados en memoria "
+                        f"(presupuesto {self.memoria_max_mb}MB), procesando por bloques")
+        return {'completo_mb': round(completo, 1), 'bloques_mb': self.MEMORIA_BLOQUES_MB,
+                'por_bloques': por_bloques}
     
-    def _procesar_fecha(self, valor):
-        """Procesa fecha unificada"""
+    def excede_presupuesto(self, archivo_path, request_id=None):
+        """True si el .xlsx debe ir por bloques según memoria_max_mb"""
+        if not self.memoria_max_mb:
+            return False
+        return self.planificar_memoria(archivo_path, request_id)['por_bloques']
+    
+    def procesar_dataframe(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None,
+                           progreso=None, por_bloques=None):
+        """
+        Procesa el archivo y devuelve el resultado agrupado sin serializar
+        
+        Args:
+            por_bloques: Camino de un .xlsx ya decidido por el presupuesto de
+                memoria (None = según excede_presupuesto)
+        
+        Returns:
+            tuple: (DataFrame con columnas HEADERS, dict de estadísticas)
+        
+        Raises:
+            ModuloSinAgrupacion: El módulo es de vista previa (usar procesar)
+        """
+        self.plan.exigir_agrupacion()
+        logger.info(f"[{request_id}] Procesando {self.MODULO or type(self).__name__}")
+        
         try:
-            if pd.isna(valor) or valor is None:
-                return None
-            fecha_str, fecha_iso = self.utils.convertir_fecha_excel(valor)
-            if fecha_iso:
-                anio, mes, dia = map(int, fecha_iso.split('-'))
-                return datetime(anio, mes, dia)
-            return None
+            # CSV del WMS: lectura por bloques, filtrando y agregando cada uno
+            if LectorCsv.es_csv(archivo_path):
+                return self.procesar_csv(archivo_path, fecha_desde, fecha_hasta, request_id, progreso)
+            
+            # Hoja demasiado grande para el presupuesto de memoria (o el
+            # presupuesto global pidió el camino más barato): por bloques
+            if por_bloques is None:
+                por_bloques = self.excede_presupuesto(archivo_path, request_id)
+            if por_bloques:
+                return self.procesar_xlsx_por_bloques(archivo_path, fecha_desde, fecha_hasta, request_id,
+                                                      progreso)
+            
+            df_resultado, info = self.cargar_normalizado(archivo_path, request_id, progreso,
+                                                         fecha_desde, fecha_hasta)
+            
+            # Aplicar filtros de fecha
+            self.avisar_progreso(progreso, 'filtro_fecha', filas=len(df_resultado))
+            df_resultado, stats_fecha = self.aplicar_filtros_fecha(df_resultado, self.plan.columna_fecha,
+                                                                   fecha_desde, fecha_hasta)
+            # Lo que ya se descartó al leer (sin cache)
+            stats_fecha = self.sumar_descartes_fecha(stats_fecha, info.get('descartes_fecha'))
+            memoria = dict(info.get('memoria_mb', {}), filtrado=MemoriaUtils.mb_frame(df_resultado))
+            
+            # Agrupar por CLAVES
+            self.avisar_progreso(progreso, 'agrupacion', filas=len(df_resultado))
+            if len(df_resultado) > 0:
+                df_agrupado = self.agrupar_por_claves(df_resultado)
+                logger.info(f"[{request_id}] Después de agrupar: {len(df_agrupado)} filas")
+            else:
+                df_agrupado = pd.DataFrame(columns=self.plan.headers)
+            memoria['agrupado'] = MemoriaUtils.mb_frame(df_agrupado)
+            
+            # Estadísticas
+            stats = {
+                'total_filas': len(df_agrupado),
+                'filas_filtradas_fecha': stats_fecha['filas_filtradas_fecha'],
+                'fecha_min': stats_fecha['fecha_min'],
+                'fecha_max': stats_fecha['fecha_max'],
+                'cantidades_invalidas': info['cantidades_invalidas'],
+                'hoja_procesada': info['hoja'],
+                'desde_cache': info.get('desde_cache', False),
+                'memoria_mb': memoria
+            }
+            
+            return df_agrupado, stats
+            
         except Exception as e:
-            logger.warning(f"Error procesando fecha: {e}")
+            logger.error(f"[{request_id}] Error: {str(e)}", exc_info=True)
+            raise
+    
+    def procesar_por_bloques(self, bloques, fecha_desde=None, fecha_hasta=None, request_id=None,
+                             progreso=None, filtro=None):
+        """
+        Camino por bloques: cada bloque se normaliza, se filtra por fecha y se
+        reduce a una fila por clave (agregar_parcial); al final se combinan
+        los parciales. La memoria depende del bloque y de las claves
+        distintas, no del total de filas.
+        
+        Args:
+            bloques: Iterable de DataFrames crudos con las columnas de COLUMNAS
+            progreso: Solo se avisa 'agrupacion' (la lectura la avisa quien lee);
+                el tiempo de cada bloque se reparte con medir_etapa
+            filtro: FiltroLectura que usa el lector de los bloques; tras cada
+                bloque se suman sus descartes por fecha
+        
+        Returns:
+            tuple: (DataFrame agrupado, dict con filas_leidas, cantidades_invalidas,
+                    las estadísticas de aplicar_filtros_fecha y memoria_mb: MB
+                    máximos por bloque de cada etapa, de los parciales y del
+                    resultado)
+        """
+        parciales = []
+        info = {'filas_leidas': 0, 'cantidades_invalidas': 0, 'filas_filtradas_fecha': 0,
+                'fecha_min': None, 'fecha_max': None}
+        # Máximo por bloque de cada etapa, total de parciales y resultado
+        memoria = {'lectura': 0.0, 'normalizado': 0.0, 'filtrado': 0.0, 'parciales': 0.0}
+        memoria_parciales = 0.0
+        filas_filtradas = 0
+        
+        for bloque in bloques:
+            info['filas_leidas'] += len(bloque)
+            memoria['lectura'] = max(memoria['lectura'], MemoriaUtils.mb_frame(bloque))
+            descartes = filtro.vaciar() if filtro is not None else {}
+            with self.medir_etapa(progreso, 'extraccion'):
+                df, invalidas = self.normalizar(bloque, request_id, registrar=False,
+                                                cantidades_descartadas=descartes.pop('cantidades', None))
+            info['cantidades_invalidas'] += invalidas
+            memoria['normalizado'] = max(memoria['normalizado'], MemoriaUtils.mb_frame(df))
+            
+            with self.medir_etapa(progreso, 'filtro_fecha'):
+                df, stats_fecha = self.aplicar_filtros_fecha(df, self.plan.columna_fecha, fecha_desde, fecha_hasta)
+            info.update(self.sumar_descartes_fecha(info, self.sumar_descartes_fecha(stats_fecha, descartes)))
+            memoria['filtrado'] = max(memoria['filtrado'], MemoriaUtils.mb_frame(df))
+            
+            if len(df) > 0:
+                with self.medir_etapa(progreso, 'agrupacion'):
+                    parciales.append(self.agregar_parcial(df, inicio=filas_filtradas))
+                memoria_parciales += MemoriaUtils.mb_frame(parciales[-1])
+                filas_filtradas += len(df)
+                if len(parciales) >= self.PARCIALES_POR_COMPACTACION:
+                    with self.medir_etapa(progreso, 'agrupacion'):
+                        parciales = [self.compactar_parciales(parciales)]
+                    memoria_parciales = MemoriaUtils.mb_frame(parciales[0])
+                memoria['parciales'] = max(memoria['parciales'], memoria_parciales)
+        
+        descartadas = f", {filtro.descartadas_status} descartadas por STATUS al leer" if filtro is not None else ''
+        logger.info(f"[{request_id}] {info['filas_leidas']} filas leídas en bloques{descartadas}, "
+                    f"{filas_filtradas} tras filtros, {len(parciales)} parciales")
+        
+        self.avisar_progreso(progreso, 'agrupacion', filas=filas_filtradas)
+        if parciales:
+            df_agrupado = self.combinar_parciales(parciales)
+        else:
+            df_agrupado = pd.DataFrame(columns=self.plan.headers)
+        memoria['agrupado'] = MemoriaUtils.mb_frame(df_agrupado)
+        info['memoria_mb'] = memoria
+        return df_agrupado, info
+    
+    def procesar_csv(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None, progreso=None):
+        """
+        CSV (o CSV.gz) del WMS por bloques, sin pasar por la cache
+        
+        Returns:
+            tuple: (DataFrame agrupado, dict de estadísticas)
+        """
+        filtro = self.crear_filtro(fecha_desde, fecha_hasta)
+        with LectorCsv(archivo_path) as lector:
+            logger.info(f"[{request_id}] CSV: separador {lector.separador!r}, {lector.codificacion}"
+                        f"{', gzip' if lector.comprimido else ''}, {lector.ancho} columnas")
+            self.avisar_progreso(progreso, 'lectura', filas=0)
+            bloques = lector.leer_por_bloques(
+                self.plan.columnas, tipos=self.plan.tipos, filas_por_bloque=self.FILAS_POR_BLOQUE,
+                progreso=self._aviso_lectura(progreso), filtro=filtro)
+            df_agrupado, info = self.procesar_por_bloques(bloques, fecha_desde, fecha_hasta,
+                                                          request_id, progreso, filtro)
+        logger.info(f"[{request_id}] Después de agrupar: {len(df_agrupado)} filas")
+        return df_agrupado, self._stats_bloques(df_agrupado, info, 'csv')
+    
+    def procesar_xlsx_por_bloques(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None,
+                                  progreso=None):
+        """
+        Hoja Detail de un .xlsx por bloques de FILAS_POR_BLOQUE filas, sin
+        pasar por la cache: la memoria depende del bloque y de las claves
+        distintas, no del tamaño de la hoja
+        
+        Returns:
+            tuple: (DataFrame agrupado, dict de estadísticas)
+        """
+        filtro = self.crear_filtro(fecha_desde, fecha_hasta)
+        with LibroExcel(archivo_path) as libro:
+            hoja = self.buscar_hoja_detail(libro)
+            self.avisar_progreso(progreso, 'lectura', filas=0)
+            bloques = libro.leer_columnas_por_bloques(
+                hoja, self.plan.columnas, self.FILAS_POR_BLOQUE, progreso=self._aviso_lectura(progreso), filtro=filtro)
+            df_agrupado, info = self.procesar_por_bloques(bloques, fecha_desde, fecha_hasta,
+                                                          request_id, progreso, filtro)
+        logger.info(f"[{request_id}] Hoja: {hoja}, después de agrupar: {len(df_agrupado)} filas")
+        return df_agrupado, self._stats_bloques(df_agrupado, info, hoja)
+    
+    @staticmethod
+    def _aviso_lectura(progreso):
+        """Adapta progreso al callback (filas_leidas, total) de los lectores"""
+        if progreso is None:
             return None
+        def aviso(filas, total):
+            progreso('lectura', filas=filas, total=total)
+        return aviso
     
-    def buscar_hoja_detail(self, excel_file):
-        """Busca hoja Detail en el Excel"""
-        hojas = excel_file.sheet_names
+    @staticmethod
+    def _stats_bloques(df_agrupado, info, hoja):
+        """Estadísticas del camino por bloques (mismas claves que el camino completo)"""
+        return {
+            'total_filas': len(df_agrupado),
+            'filas_filtradas_fecha': info['filas_filtradas_fecha'],
+            'fecha_min': info['fecha_min'],
+            'fecha_max': info['fecha_max'],
+            'cantidades_invalidas': info['cantidades_invalidas'],
+            'hoja_procesada': hoja,
+            'desde_cache': False,
+            'memoria_mb': info['memoria_mb']
+        }
+    
+    def procesar(self, archivo_path, fecha_desde=None, fecha_hasta=None, request_id=None, progreso=None,
+                 por_bloques=None):
+        """Procesa el archivo y arma la respuesta JSON completa"""
+        if not self.plan.agrupa:
+            return self.procesar_vista_previa(archivo_path, request_id, progreso)
+        df_agrupado, stats = self.procesar_dataframe(archivo_path, fecha_desde, fecha_hasta, request_id,
+                                                     progreso=progreso, por_bloques=por_bloques)
+        self.avisar_progreso(progreso, 'serializacion', filas=len(df_agrupado))
+        return self.construir_respuesta(df_agrupado, stats)
+    
+    def procesar_vista_previa(self, archivo_path, request_id=None, progreso=None):
+        """
+        Módulo sin CLAVES: primeras FILAS_PREVIEW filas de la primera hoja (o
+        del CSV) y el total de filas, sin parsear el archivo entero
+        """
+        logger.info(f"[{request_id}] Procesando {self.MODULO or type(self).__name__}: {archivo_path}")
+        
+        try:
+            if LectorCsv.es_csv(archivo_path):
+                with LectorCsv(archivo_path) as lector:
+                    df = lector.leer_tabla(filas=self.FILAS_PREVIEW)
+                    total = len(df) if len(df) < self.FILAS_PREVIEW else lector.contar_filas()
+            else:
+                with LibroExcel(archivo_path) as libro:
+                    df, total = libro.leer_vista_previa(libro.hojas[0], self.FILAS_PREVIEW)
+            
+            self.avisar_progreso(progreso, 'serializacion', filas=total)
+            return self.construir_vista_previa(df, total)
+            
+        except Exception as e:
+            logger.error(f"[{request_id}] Error: {str(e)}")
+            raise
+    
+    def construir_vista_previa(self, df, total=None):
+        """
+        Respuesta de un módulo de vista previa: COLUMNAS (por posición) como
+        texto, '-' si faltan; total = filas del archivo (None = len(df))
+        """
+        posiciones = self.plan.posiciones_vista_previa()
+        ancho = len(df.columns)
+        datos_preview = []
+        for i in range(min(self.FILAS_PREVIEW, len(df))):
+            datos_preview.append([str(df.iloc[i, j]) if -ancho <= j < ancho else '-' for j in posiciones])
+        
+        total = len(df) if total is None else total
+        return {
+            'success': True,
+            'total_registros': total,
+            'headers': self.plan.headers,
+            'data': datos_preview,
+            'stats': {
+                'total_filas': total,
+                'mostrando': len(datos_preview)
+            }
+        }
+    
+    @staticmethod
+    def avisar_progreso(progreso, etapa, filas=None, total=None):
+        """
+        Informa el avance al callback de progreso, si lo hay
+        
+        Args:
+            progreso: Callable (etapa, filas=None, total=None) o None
+            etapa: 'lectura', 'extraccion', 'filtro_status', 'filtro_fecha',
+                   'agrupacion', 'persistencia' o 'serializacion'
+            filas: Filas que entran a la etapa (o leídas hasta ahora en 'lectura')
+            total: Total estimado de filas de la etapa, si se conoce
+        """
+        if progreso is not None:
+            progreso(etapa, filas=filas, total=total)
+    
+    @staticmethod
+    def medir_etapa(progreso, etapa):
+        """
+        Contexto que carga su tiempo a 'etapa' sin avisar el cambio
+        
+        Para etapas intercaladas con la lectura (camino por bloques): solo
+        mide si progreso es un CronometroEtapas.
+        """
+        if isinstance(progreso, CronometroEtapas):
+            return progreso.medir(etapa)
+        return nullcontext()
+    
+    def leer_columnas_detail(self, libro, progreso=None, filtro=None):
+        """Lee las columnas de COLUMNAS de la hoja Detail avisando el avance de lectura"""
+        hoja = self.buscar_hoja_detail(libro)
+        self.avisar_progreso(progreso, 'lectura', filas=0)
+        df = libro.leer_columnas(hoja, self.plan.columnas, progreso=self._aviso_lectura(progreso),
+                                 filtro=filtro)
+        return df, hoja
+    
+    def construir_respuesta(self, df_agrupado, stats, incluir_completa=True):
+        """
+        Arma la respuesta estándar a partir del DataFrame agrupado
+        
+        Args:
+            incluir_completa: Si es False se omite 'data_completa' (solo vista previa)
+        """
+        if incluir_completa:
+            # Serializar una sola vez; la vista previa reutiliza las primeras filas
+            filas = self._convertir_dataframe_a_lista(df_agrupado)
+            preview = filas[:self.FILAS_PREVIEW]
+        else:
+            preview = self._convertir_dataframe_a_lista(df_agrupado.head(self.FILAS_PREVIEW))
+        
+        respuesta = {
+            'success': True,
+            'total_registros': len(df_agrupado),
+            'headers': self.HEADERS,
+            'data': preview,
+            'stats': stats
+        }
+        if incluir_completa:
+            respuesta['data_completa'] = filas
+        return respuesta
+    
+    def _convertir_a_serializable(self, obj):
+        """Convierte objetos numpy a tipos nativos"""
+        return SerializadorJSON.valor_a_json(obj)
+    
+    def _convertir_dataframe_a_lista(self, df):
+        """Convierte DataFrame a lista serializable (columna a columna, por dtype)"""
+        return SerializadorJSON.dataframe_a_filas(df)
+    
+    def _extraer_cantidades(self, serie, request_id=None, descartadas=None):
+        """
+        Extrae la parte entera de una columna de cantidades (vectorizado)
+        
+        Args:
+            descartadas: Cantidades crudas de filas ya descartadas; se parsean
+                junto con la columna (mismo formato detectado) y solo cuentan
+                para las inválidas
+        
+        Returns:
+            tuple: (Series int64, número de valores no interpretables)
+        """
+        if descartadas:
+            completa = pd.concat([serie, pd.Series(descartadas, dtype=object)], ignore_index=True)
+            cantidades, invalidas = CantidadUtils.parte_entera(completa)
+            cantidades = pd.Series(cantidades.to_numpy()[:len(serie)], index=serie.index)
+            serie = completa
+        else:
+            cantidades, invalidas = CantidadUtils.parte_entera(serie)
+        total_invalidas = int(invalidas.sum())
+        if total_invalidas:
+            ejemplos = serie[invalidas].head(3).tolist()
+            logger.warning(f"[{request_id}] {total_invalidas} cantidades no numéricas tomadas como 0 (ej: {ejemplos})")
+        return cantidades, total_invalidas
+    
+    def agrupar_por_claves(self, df):
+        """
+        Agrupa por las claves del plan con un groupby nativo multi-clave
+        
+        Por grupo: los campos salen de la primera fila (reducer 'first' sobre
+        la posición, así los NaN se respetan igual que con g.iloc[0]) y
+        QTY_ENTERO se suma. La cantidad se reparte en UNIDADES/CAJAS/PALLETS
+        según la UOM de la primera fila, con un pivot vectorizado.
+        
+        Args:
+            df: DataFrame filtrado
+        
+        Returns:
+            DataFrame agrupado con columnas HEADERS, ordenado por claves
+        """
+        return self.combinar_parciales([self.agregar_parcial(df)])
+    
+    def agregar_parcial(self, df, inicio=0):
+        """
+        Reduce un frame (o un bloque) a una fila por clave
+        
+        Args:
+            inicio: Posición global de la primera fila del bloque
+        
+        Returns:
+            DataFrame con las claves como texto (_K0, _K1...), _ORDEN (posición
+            global de la primera fila del grupo), CANTIDAD (suma de QTY_ENTERO)
+            y los campos de esa primera fila que necesitan los headers
+        """
+        # Claves como texto (1000 y '1000' caen en el mismo grupo), pero se
+        # agrupa por los códigos enteros de ese texto
+        textos = []
+        marco = pd.DataFrame({'_POS': np.arange(len(df))}, index=df.index)
+        for codigo, clave in zip(self.plan.columnas_codigo, self.plan.claves):
+            marco[codigo], textos_clave = MemoriaUtils.codigos_texto(df[clave])
+            textos.append(textos_clave)
+        if 'QTY_ENTERO' in df.columns:
+            marco['QTY_ENTERO'] = df['QTY_ENTERO']
+        reducers = {nombre: reducer for nombre, reducer in self.plan.reducers.items() if reducer[0] in marco.columns}
+        
+        resumen = marco.groupby(self.plan.columnas_codigo, sort=False).agg(**reducers).reset_index()
+        
+        campos = [c for c in self.plan.campos if c in df.columns]
+        parcial = df.iloc[resumen['_POS'].to_numpy()][campos].reset_index(drop=True)
+        for codigo, columna, texto in zip(self.plan.columnas_codigo, self.plan.columnas_clave, textos):
+            parcial[columna] = texto[resumen[codigo].to_numpy()]
+        parcial['_ORDEN'] = resumen['_POS'].to_numpy() + inicio
+        if 'CANTIDAD' in resumen.columns:
+            parcial['CANTIDAD'] = resumen['CANTIDAD'].to_numpy()
+        else:
+            parcial['CANTIDAD'] = np.zeros(len(resumen), dtype='int64')
+        return parcial
+    
+    def compactar_parciales(self, parciales):
+        """
+        Junta varios parciales en uno solo con el mismo formato (una fila por
+        clave, la de menor _ORDEN, con CANTIDAD sumada)
+        """
+        todos = pd.concat(parciales, ignore_index=True)
+        resumen = todos.groupby(self.plan.columnas_clave, sort=False, dropna=False).agg(
+            _FILA=('_ORDEN', 'idxmin'), CANTIDAD=('CANTIDAD', 'sum'))
+        compacto = todos.loc[resumen['_FILA'].to_numpy()].reset_index(drop=True)
+        compacto['CANTIDAD'] = resumen['CANTIDAD'].to_numpy()
+        return compacto
+    
+    def combinar_parciales(self, parciales):
+        """
+        Combina los parciales de agregar_parcial en el resultado final
+        
+        Por clave gana la fila de menor _ORDEN (la primera del archivo) y las
+        cantidades se suman; el resultado queda ordenado por claves.
+        """
+        todos = parciales[0] if len(parciales) == 1 else pd.concat(parciales, ignore_index=True)
+        resumen = todos.groupby(self.plan.columnas_clave, sort=True, dropna=False).agg(
+            _FILA=('_ORDEN', 'idxmin'), CANTIDAD=('CANTIDAD', 'sum'))
+        
+        primeros = todos.loc[resumen['_FILA'].to_numpy()].reset_index(drop=True)
+        cantidad = resumen['CANTIDAD'].to_numpy()
+        
+        if 'UOM' in primeros.columns:
+            uom = primeros['UOM'].astype(object).where(primeros['UOM'].notna(), '').astype(str).str.strip().str.upper()
+        else:
+            uom = pd.Series('', index=primeros.index)
+        
+        df_agrupado = pd.DataFrame(index=primeros.index)
+        for header, uom_header in self.plan.salida:
+            if uom_header:
+                df_agrupado[header] = np.where(uom == uom_header, cantidad, 0)
+            elif header in primeros.columns:
+                df_agrupado[header] = primeros[header]
+            else:
+                df_agrupado[header] = ''
+        
+        return df_agrupado
+    
+    def buscar_hoja_detail(self, libro):
+        """Busca hoja Detail en el Excel (LibroExcel, solo lee el manifiesto)"""
+        hojas = libro.hojas
         for hoja in hojas:
             if hoja.lower() == 'detail':
                 return hoja
@@ -84,34 +749,51 @@ class ProcesadorBase:
                 return hoja
         return hojas[1] if len(hojas) > 1 else hojas[0]
     
+    @staticmethod
+    def sumar_descartes_fecha(stats, descartes):
+        """
+        Suma a las estadísticas de aplicar_filtros_fecha otras del mismo
+        formato (descartes del FiltroLectura u otro bloque)
+        
+        Returns:
+            dict nuevo con filas_filtradas_fecha, fecha_min y fecha_max
+        """
+        if not descartes:
+            return {clave: stats[clave] for clave in ('filas_filtradas_fecha', 'fecha_min', 'fecha_max')}
+        # 'YYYY-MM-DD' ordena igual como texto
+        minimos = [f for f in (stats['fecha_min'], descartes['fecha_min']) if f]
+        maximos = [f for f in (stats['fecha_max'], descartes['fecha_max']) if f]
+        return {
+            'filas_filtradas_fecha': stats['filas_filtradas_fecha'] + descartes['filas_filtradas_fecha'],
+            'fecha_min': min(minimos) if minimos else None,
+            'fecha_max': max(maximos) if maximos else None
+        }
+    
     def aplicar_filtros_fecha(self, df, columna_fecha, fecha_desde, fecha_hasta):
-        """Aplica filtros de fecha de manera unificada"""
+        """
+        Aplica filtros de fecha de manera unificada (vectorizado)
+
+        La columna queda como datetime64 (solo fecha); el filtrado y el rango
+        min/max se calculan con comparaciones de array.
+        """
         stats = {'filas_filtradas_fecha': 0, 'fecha_min': None, 'fecha_max': None}
         
         if columna_fecha in df.columns:
-            df['_fecha_iso'] = None
-            for idx, val in df[columna_fecha].items():
-                fecha_obj = self._procesar_fecha(val)
-                if fecha_obj:
-                    fecha_iso = fecha_obj.strftime('%Y-%m-%d')
-                    df.at[idx, '_fecha_iso'] = fecha_iso
-                    df.at[idx, columna_fecha] = fecha_obj.strftime('%d/%m/%Y')
-                    
-                    if stats['fecha_min'] is None or fecha_iso < stats['fecha_min']:
-                        stats['fecha_min'] = fecha_iso
-                    if stats['fecha_max'] is None or fecha_iso > stats['fecha_max']:
-                        stats['fecha_max'] = fecha_iso
+            fechas = FechaUtils.normalizar_fechas(df[columna_fecha])
+            df[columna_fecha] = fechas
+            
+            if fechas.notna().any():
+                stats['fecha_min'] = fechas.min().strftime('%Y-%m-%d')
+                stats['fecha_max'] = fechas.max().strftime('%Y-%m-%d')
             
             if fecha_desde or fecha_hasta:
-                mask = pd.Series(True, index=df.index)
+                mask = np.ones(len(df), dtype=bool)
                 if fecha_desde:
-                    fecha_limpia = fecha_desde.split(' ')[0] if ' ' in fecha_desde else fecha_desde
-                    mask &= (df['_fecha_iso'] >= fecha_limpia)
+                    mask &= (fechas >= FechaUtils.limite_filtro(fecha_desde)).to_numpy()
                 if fecha_hasta:
-                    fecha_limpia = fecha_hasta.split(' ')[0] if ' ' in fecha_hasta else fecha_hasta
-                    mask &= (df['_fecha_iso'] <= fecha_limpia)
+                    mask &= (fechas <= FechaUtils.limite_filtro(fecha_hasta)).to_numpy()
                 
                 stats['filas_filtradas_fecha'] = int((~mask).sum())
                 df = df[mask].copy()
         
-        return df, stats
\ No newline at end of file
+        return df, stats
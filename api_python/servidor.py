@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Servidor de producción de la API Python
+- Linux/Mac: gunicorn pre-fork (app y pandas importados en el master antes
+  del fork, workers gthread, apagado ordenado con SIGTERM)
+- Windows: waitress (un proceso con hilos; el procesamiento va al pool de
+  procesos de app.py)
+- Sin ninguno de los dos: servidor de desarrollo de Flask, con aviso
+
+Configuración por argumentos o variables de entorno (API_HOST, API_PORT,
+API_WORKERS, API_THREADS, API_BACKLOG, API_KEEPALIVE, API_TIMEOUT,
+API_GRACEFUL_TIMEOUT, API_MAX_REQUESTS, API_SERVIDOR).
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger('servidor')
+
+
+def _entero_env(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+def leer_opciones(argv=None):
+    """Opciones del servidor: argumentos de línea de comandos > entorno > defecto"""
+    parser = argparse.ArgumentParser(description='API Python Procesador Excel (producción)')
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=_entero_env('API_PORT', 5000))
+    parser.add_argument('--workers', type=int,
+                        default=_entero_env('API_WORKERS', max(1, min(4, os.cpu_count() or 1))),
+                        help='Procesos worker (solo gunicorn)')
+    parser.add_argument('--threads', type=int, default=_entero_env('API_THREADS', 4),
+                        help='Hilos por worker')
+    parser.add_argument('--backlog', type=int, default=_entero_env('API_BACKLOG', 64),
+                        help='Conexiones en cola antes de rechazar')
+    parser.add_argument('--keepalive', type=int, default=_entero_env('API_KEEPALIVE', 5),
+                        help='Segundos de keep-alive entre peticiones')
+    parser.add_argument('--timeout', type=int, default=_entero_env('API_TIMEOUT', 600),
+                        help='Segundos máximos por petición (igual que PythonBridge)')
+    parser.add_argument('--graceful-timeout', type=int, default=_entero_env('API_GRACEFUL_TIMEOUT', 60),
+                        help='Segundos para terminar peticiones en curso al apagar')
+    parser.add_argument('--max-requests', type=int, default=_entero_env('API_MAX_REQUESTS', 500),
+                        help='Reiniciar cada worker tras N peticiones (0 = nunca)')
+    parser.add_argument('--servidor', choices=['auto', 'gunicorn', 'waitress', 'desarrollo'],
+                        default=os.environ.get('API_SERVIDOR', 'auto'))
+    return parser.parse_args(argv)
+
+
+def elegir_servidor(preferido):
+    if preferido != 'auto':
+        return preferido
+    if os.name != 'nt':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        return 'desarrollo'
+
+
+def servir_gunicorn(opciones):
+    from gunicorn.app.base import BaseApplication
+
+    if opciones.workers > 1:
+        # Varios workers: cada uno procesa en sus hilos (ya hay un proceso por
+        # núcleo) y trabajos/resultados paginables se comparten por disco
+        os.environ.setdefault('API_EJECUTOR', 'hilos')
+        os.environ.setdefault('API_ESTADO_DIR', os.path.join(tempfile.gettempdir(),
+                                                             'portal_facturacion_estado'))
+
+    def worker_exit(server, worker):
+        from wsgi import cerrar_recursos
+        cerrar_recursos()
+
+    class ServidorGunicorn(BaseApplication):
+        def load_config(self):
+            config = {
+                'bind': f'{opciones.host}:{opciones.port}',
+                'workers': opciones.workers,
+                'worker_class': 'gthread',
+                'threads': opciones.threads,
+                'backlog': opciones.backlog,
+                'keepalive': opciones.keepalive,
+                'timeout': opciones.timeout,
+                'graceful_timeout': opciones.graceful_timeout,
+                'max_requests': opciones.max_requests,
+                'max_requests_jitter': opciones.max_requests // 10,
+                'preload_app': True,
+                'worker_exit': worker_exit,
+            }
+            for clave, valor in config.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            # Con preload_app se llama una vez en el master: pandas, numpy y
+            # los procesadores quedan importados antes del fork
+            from wsgi import application
+            return application
+
+    ServidorGunicorn().run()
+
+
+def servir_waitress(opciones):
+    from waitress import serve
+    from app import app as application, cerrar_recursos, iniciar_componentes
+
+    # Un solo proceso: escucha enseguida y carga pandas/procesadores en un hilo
+    iniciar_componentes(en_segundo_plano=True)
+
+    def apagar(signum, frame):
+        raise KeyboardInterrupt
+
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, apagar)
+
+    try:
+        serve(application, host=opciones.host, port=opciones.port,
+              threads=opciones.threads, backlog=opciones.backlog,
+              channel_timeout=opciones.timeout, ident='API Python')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cerrar_recursos()
+
+
+def servir_desarrollo(opciones):
+    from app import app as application, iniciar_componentes
+    iniciar_componentes(en_segundo_plano=True)
+    logger.warning("gunicorn/waitress no instalados: usando el servidor de desarrollo de Flask")
+    application.run(host=opciones.host, port=opciones.port, debug=False, threaded=True)
+
+
+def main(argv=None):
+    # Handler propio: el logging global lo configura app.py al importarse
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    opciones = leer_opciones(argv)
+    servidor = elegir_servidor(opciones.servidor)
+    logger.info(f"Iniciando API Python en http://{opciones.host}:{opciones.port} con {servidor} "
+                f"(workers={opciones.workers}, threads={opciones.threads}, backlog={opciones.backlog})")
+
+    if servidor == 'gunicorn':
+        servir_gunicorn(opciones)
+    elif servidor == 'waitress':
+        servir_waitress(opciones)
+    else:
+        servir_desarrollo(opciones)
+
+
+if __name__ == '__main__':
+    main()
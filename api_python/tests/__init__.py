@@ -0,0 +1,2 @@
+# Este archivo hace que la carpeta sea un paquete Python
+# Tests de la API: python -m pytest tests (desde api_python/)
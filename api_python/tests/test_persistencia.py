@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistencia directa en SQLite (reemplazo local de SQL Server)
+Un resultado real de procesar_dataframe se guarda con crear_destino('sqlite:...')
+y se compara contra el mapeo de columnas de guardar_recepcion.php / guardar_despacho.php.
+"""
+
+import os
+import re
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from benchmark.generador import GeneradorDetail, clase_procesador
+from utils.persistencia import DESTINOS, crear_destino, preparar_filas
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONTROLADORES = {
+    'recepcion': os.path.join(RAIZ_REPO, 'controller', 'arcor', 'guardar_recepcion.php'),
+    'despacho': os.path.join(RAIZ_REPO, 'controller', 'arcor', 'guardar_despacho.php'),
+}
+FACTURA_ID = 7
+
+
+def columnas_php(tipo):
+    """Columnas del INSERT de detalle del controlador PHP, en orden"""
+    with open(CONTROLADORES[tipo], encoding='utf-8') as archivo:
+        codigo = archivo.read()
+    tabla = 'TABLA_RECEPCION' if tipo == 'recepcion' else 'TABLA_DESPACHO'
+    insert = re.search(r'INSERT INTO " \. ' + tabla + r' \. "\s*\(([^)]*)\)', codigo)
+    return [columna.strip() for columna in insert.group(1).split(',')]
+
+
+@pytest.fixture(scope='module', params=['recepcion', 'despacho'])
+def resultado(request, tmp_path_factory):
+    """(tipo, DataFrame agrupado) de un Detail sintético chico, con una fecha vacía"""
+    tipo = request.param
+    ruta = tmp_path_factory.mktemp('detail') / f'{tipo}.xlsx'
+    GeneradorDetail(tipo, 400, documentos=20, skus=25).escribir(str(ruta), 'xlsx')
+    clase = clase_procesador(tipo)
+    df, _stats = clase().procesar_dataframe(str(ruta))
+    df = df.copy()
+    df[clase.COLUMNA_FECHA] = df[clase.COLUMNA_FECHA].astype('datetime64[ns]')
+    df.loc[df.index[0], clase.COLUMNA_FECHA] = pd.NaT
+    return tipo, df
+
+
+def leer_detalle(ruta, tipo, factura_id=FACTURA_ID):
+    """Columna en BD -> lista de valores tal como quedaron en SQLite (NULL = None)"""
+    tabla = DESTINOS[tipo]['tabla'].split('.')[-1].strip('[]')
+    conexion = sqlite3.connect(ruta)
+    try:
+        cursor = conexion.execute(f"SELECT * FROM {tabla} WHERE factura_id = ? ORDER BY rowid", (factura_id,))
+        nombres = [descripcion[0] for descripcion in cursor.description]
+        filas = cursor.fetchall()
+    finally:
+        conexion.close()
+    return {nombre: [fila[i] for fila in filas] for i, nombre in enumerate(nombres)}
+
+
+def test_columnas_como_el_controlador_php(resultado):
+    tipo, _df = resultado
+    columnas = ['factura_id'] + [columna for columna, _, _ in DESTINOS[tipo]['columnas']]
+    assert [c.lower() for c in columnas] == [c.lower() for c in columnas_php(tipo)]
+
+
+def test_guarda_todas_las_filas_con_su_mapeo(resultado, tmp_path):
+    tipo, df = resultado
+    ruta = str(tmp_path / 'detalle.db')
+
+    info = crear_destino(f'sqlite:{ruta}').reemplazar_detalle(tipo, df, FACTURA_ID)
+
+    guardado = leer_detalle(ruta, tipo)
+    assert info['registros_guardados'] == len(df) == len(guardado['factura_id'])
+    assert set(guardado['factura_id']) == {FACTURA_ID}
+    for columna, header, tipo_valor in DESTINOS[tipo]['columnas']:
+        serie = df[header]
+        if tipo_valor == 'entero':
+            esperado = serie.astype('int64').tolist()
+        elif tipo_valor == 'fecha':
+            esperado = [None if pd.isna(fecha) else fecha.strftime('%Y-%m-%d') for fecha in serie]
+        else:
+            # Como el '?? ' de PHP: vacío en lugar de NULL
+            esperado = ['' if pd.isna(valor) else str(valor) for valor in serie]
+        assert guardado[columna] == esperado, columna
+
+
+def test_fecha_vacia_queda_null(resultado, tmp_path):
+    tipo, df = resultado
+    ruta = str(tmp_path / 'detalle.db')
+    crear_destino(f'sqlite:{ruta}').reemplazar_detalle(tipo, df, FACTURA_ID)
+
+    columnas = DESTINOS[tipo]['columnas']
+    posicion, columna_fecha = next((i, columna) for i, (columna, _, t) in enumerate(columnas) if t == 'fecha')
+    # Lo que recibe el driver (ODBC manda el parámetro tal cual): None, no NaN
+    filas = preparar_filas(df, columnas, FACTURA_ID)
+    assert filas[0][1 + posicion] is None
+    assert all(fila[1 + posicion] is None or isinstance(fila[1 + posicion], str) for fila in filas)
+
+    fechas = leer_detalle(ruta, tipo)[columna_fecha]
+    assert fechas[0] is None
+    assert all(re.fullmatch(r'\d{4}-\d{2}-\d{2}', fecha) for fecha in fechas[1:] if fecha is not None)
+
+
+def test_segunda_llamada_reemplaza_el_detalle(resultado, tmp_path):
+    tipo, df = resultado
+    ruta = str(tmp_path / 'detalle.db')
+    destino = crear_destino(f'sqlite:{ruta}', filas_por_lote=50)
+
+    destino.reemplazar_detalle(tipo, df, FACTURA_ID)
+    destino.reemplazar_detalle(tipo, df, FACTURA_ID + 1)
+    info = destino.reemplazar_detalle(tipo, df.head(10), FACTURA_ID)
+
+    assert info['registros_guardados'] == 10
+    assert len(leer_detalle(ruta, tipo)['factura_id']) == 10
+    # Las demás facturas no se tocan
+    assert len(leer_detalle(ruta, tipo, FACTURA_ID + 1)['factura_id']) == len(df)
+
+
+def test_error_al_insertar_deshace_la_transaccion(resultado, tmp_path):
+    tipo, df = resultado
+    ruta = str(tmp_path / 'detalle.db')
+    destino = crear_destino(f'sqlite:{ruta}', filas_por_lote=50)
+    destino.reemplazar_detalle(tipo, df, FACTURA_ID)
+
+    # Falla un insert de un lote intermedio, después del DELETE y de otros lotes ya insertados
+    tabla = DESTINOS[tipo]['tabla'].split('.')[-1].strip('[]')
+    columna_sku, header_sku, _ = DESTINOS[tipo]['columnas'][1]
+    nuevo = df.copy()
+    nuevo[header_sku] = nuevo[header_sku].astype(str)
+    nuevo.loc[nuevo.index[len(nuevo) - 1], header_sku] = 'FALLA'
+    with sqlite3.connect(ruta) as conexion:
+        conexion.execute(f"CREATE TRIGGER falla BEFORE INSERT ON {tabla} WHEN NEW.{columna_sku} = 'FALLA' "
+                         f"BEGIN SELECT RAISE(ABORT, 'insert rechazado'); END")
+
+    with pytest.raises(sqlite3.DatabaseError, match='insert rechazado'):
+        destino.reemplazar_detalle(tipo, nuevo, FACTURA_ID)
+
+    # El detalle anterior sigue completo
+    guardado = leer_detalle(ruta, tipo)
+    assert len(guardado['factura_id']) == len(df)
+    assert 'FALLA' not in guardado[columna_sku]
@@ -1,4 +1,32 @@
 # Utilidades
-from .excel_utils import ExcelUtils
+# Las exportaciones se importan al primer uso: `from utils.subidas import ...`
+# no debe cargar pandas (ver arranque diferido en app.py)
+import importlib
 
-__all__ = ['ExcelUtils']
\ No newline at end of file
+_EXPORTACIONES = {
+    'ExcelUtils': 'excel_utils',
+    'CantidadUtils': 'cantidad_utils',
+    'FechaUtils': 'fecha_utils',
+    'LibroExcel': 'libro_excel',
+    'LectorXlsx': 'lector_xlsx',
+    'TablaCadenas': 'lector_xlsx',
+    'SerializadorJSON': 'serializador',
+    'SerializadorBinario': 'serializador_binario',
+    'LectorCsv': 'lector_csv',
+    'FiltroLectura': 'filtro_lectura',
+    'MemoriaUtils': 'memoria_utils',
+    'CronometroEtapas': 'metricas',
+    'RegistroMetricas': 'metricas',
+    'PresupuestoMemoria': 'presupuesto_memoria',
+}
+
+__all__ = list(_EXPORTACIONES)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTACIONES.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f'.{modulo}', __name__), nombre)
+    globals()[nombre] = valor
+    return valor
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Almacén en memoria de resultados procesados
+Guarda el DataFrame agrupado bajo el request_id con un TTL para que el
+cliente lo pida por páginas en lugar de recibirlo entero. Con varios
+procesos sirviendo la API, los resultados se comparten por un directorio.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from utils.cache_resultados import guardar_frame, leer_frame
+
+# request_id válido como nombre de archivo en el directorio compartido
+_RE_ID = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+logger = logging.getLogger(__name__)
+
+
+class ResultadoNoEncontrado(KeyError):
+    """El request_id no existe o su resultado ya expiró"""
+
+
+class CampoNoValido(ValueError):
+    """Se pidió una columna que el resultado no tiene"""
+
+
+class AlmacenResultados:
+    """
+    Resultados procesados indexados por request_id
+
+    Cada entrada expira a los `ttl` segundos. Además se limita el número de
+    entradas: al superar `max_entradas` se descarta la más antigua.
+
+    Si se indica `directorio`, cada resultado también se escribe ahí (.npz)
+    y un request_id que no está en memoria se busca en disco: así cualquier
+    worker de un servidor pre-fork puede servir las páginas.
+    """
+
+    def __init__(self, ttl=900, max_entradas=20, directorio=None):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.directorio = directorio
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, request_id):
+        if not self.directorio or not _RE_ID.match(request_id):
+            return None
+        return os.path.join(self.directorio, f'{request_id}.npz')
+
+    def _purgar_directorio(self, ahora):
+        """Borra del directorio compartido los resultados expirados"""
+        for entrada in os.scandir(self.directorio):
+            if not entrada.name.endswith('.npz'):
+                continue
+            try:
+                if entrada.stat().st_mtime + self.ttl <= ahora:
+                    os.remove(entrada.path)
+            except FileNotFoundError:
+                pass
+
+    def _purgar(self, ahora):
+        """Elimina entradas expiradas y las que exceden el máximo (con lock tomado)"""
+        for request_id in [rid for rid, e in self._entradas.items() if e['expira'] <= ahora]:
+            del self._entradas[request_id]
+        while len(self._entradas) > self.max_entradas:
+            request_id, _ = self._entradas.popitem(last=False)
+            logger.info(f"[{request_id}] Resultado descartado (límite de {self.max_entradas} entradas)")
+
+    def guardar(self, request_id, df, headers, stats, tipo=None):
+        """
+        Guarda un resultado
+
+        Returns:
+            Dict cursor para incluir en la respuesta inicial
+        """
+        ahora = time.time()
+        with self._lock:
+            self._entradas[request_id] = {
+                'df': df,
+                'headers': list(headers),
+                'stats': stats,
+                'tipo': tipo,
+                'expira': ahora + self.ttl
+            }
+            self._entradas.move_to_end(request_id)
+            self._purgar(ahora)
+
+        ruta = self._ruta(request_id)
+        if ruta:
+            guardar_frame(ruta, df, {'headers': list(headers), 'stats': stats, 'tipo': tipo})
+            self._purgar_directorio(ahora)
+
+        return {
+            'request_id': request_id,
+            'total_registros': len(df),
+            'expira_en_segundos': self.ttl,
+            'url': f'/resultados/{request_id}'
+        }
+
+    def obtener(self, request_id):
+        """Devuelve la entrada completa o lanza ResultadoNoEncontrado"""
+        ahora = time.time()
+        with self._lock:
+            self._purgar(ahora)
+            entrada = self._entradas.get(request_id)
+        if entrada is None:
+            entrada = self._desde_directorio(request_id, ahora)
+        if entrada is None:
+            raise ResultadoNoEncontrado(request_id)
+        return entrada
+
+    def _desde_directorio(self, request_id, ahora):
+        """Carga un resultado guardado por otro proceso (y lo deja en memoria)"""
+        ruta = self._ruta(request_id)
+        if not ruta:
+            return None
+        try:
+            expira = os.path.getmtime(ruta) + self.ttl
+            if expira <= ahora:
+                return None
+            df, info = leer_frame(ruta)
+        except FileNotFoundError:
+            return None
+
+        entrada = dict(info, df=df, expira=expira)
+        with self._lock:
+            self._entradas[request_id] = entrada
+            self._purgar(ahora)
+        return entrada
+
+    def pagina(self, request_id, offset=0, limit=1000, campos=None):
+        """
+        Devuelve una página del resultado con proyección de columnas
+
+        Args:
+            offset: Primera fila (0-based)
+            limit: Máximo de filas
+            campos: Lista de columnas a devolver (None = todas, en orden de headers)
+
+        Returns:
+            tuple: (DataFrame de la página, headers proyectados, total de filas)
+        """
+        entrada = self.obtener(request_id)
+        df = entrada['df']
+        headers = entrada['headers']
+
+        if campos:
+            faltantes = [c for c in campos if c not in headers]
+            if faltantes:
+                raise CampoNoValido(f"Campos no válidos: {', '.join(faltantes)}")
+            headers = list(campos)
+
+        return df[headers].iloc[offset:offset + limit], headers, len(df)
+
+    def eliminar(self, request_id):
+        with self._lock:
+            eliminado = self._entradas.pop(request_id, None) is not None
+        ruta = self._ruta(request_id)
+        if ruta:
+            try:
+                os.remove(ruta)
+                eliminado = True
+            except FileNotFoundError:
+                pass
+        return eliminado
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cache en disco de frames normalizados, direccionado por contenido
+La clave es el hash del archivo subido + el tipo de módulo. Se guarda el frame
+ya limpio y filtrado por STATUS (antes del filtro de fecha), en formato
+columnar: columnas numéricas/fecha como arrays numpy y columnas de texto
+codificadas como diccionario (códigos int32 + valores únicos).
+Vive en un directorio, así que lo comparten todos los procesos worker.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.serializador import SerializadorJSON
+
+logger = logging.getLogger(__name__)
+
+# Cambiar si cambia el formato del frame normalizado (invalida entradas viejas)
+VERSION_CACHE = '1'
+
+EXTENSION = '.npz'
+
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+def _codificar(df):
+    """DataFrame -> dict de arrays numpy (sin objetos pickled) + metadatos"""
+    arrays = {}
+    columnas = []
+    for i, nombre in enumerate(df.columns):
+        serie = df[nombre]
+        dtype = serie.dtype
+        clave = f'c{i}'
+
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            arrays[clave] = serie.to_numpy(dtype='datetime64[ns]').view('int64')
+            columnas.append({'nombre': nombre, 'tipo': 'fecha'})
+        elif (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)) \
+                and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            arrays[clave] = serie.to_numpy()
+            columnas.append({'nombre': nombre, 'tipo': 'numero'})
+        else:
+            # Texto: mismo texto que termina en la respuesta JSON
+            valores = serie.to_numpy(dtype=object)
+            codigos, unicos = pd.factorize(valores)
+            arrays[clave] = codigos.astype('int32')
+            arrays[clave + '_u'] = np.array(
+                [str(SerializadorJSON.valor_a_json(v)) for v in unicos], dtype=str)
+            columnas.append({'nombre': nombre, 'tipo': 'texto'})
+
+    return arrays, columnas
+
+
+def _decodificar(datos, columnas):
+    """Inversa de _codificar"""
+    df = pd.DataFrame()
+    for i, columna in enumerate(columnas):
+        clave = f'c{i}'
+        if columna['tipo'] == 'fecha':
+            df[columna['nombre']] = pd.Series(datos[clave].view('datetime64[ns]'))
+        elif columna['tipo'] == 'numero':
+            df[columna['nombre']] = pd.Series(datos[clave])
+        else:
+            # Tabla de valores con None al final: el código -1 (NaN) cae ahí
+            tabla = np.append(datos[clave + '_u'].astype(object), None)
+            df[columna['nombre']] = pd.Series(tabla[datos[clave]], dtype=object)
+    return df
+
+
+def guardar_frame(ruta, df, info):
+    """
+    Escribe un DataFrame + info (dict JSON) en un .npz de forma atómica
+
+    Args:
+        ruta: Archivo destino; el temporal se crea en su mismo directorio
+    """
+    arrays, columnas = _codificar(df.reset_index(drop=True))
+    arrays['__meta__'] = np.array(json.dumps({
+        'columnas': columnas,
+        'info': info,
+        'filas': len(df)
+    }, default=str))
+
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporal, ruta)
+    except Exception:
+        try:
+            os.remove(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def leer_frame(ruta):
+    """
+    Inversa de guardar_frame
+
+    Returns:
+        tuple (DataFrame, info); FileNotFoundError si no existe
+    """
+    with np.load(ruta, allow_pickle=False) as datos:
+        meta = json.loads(str(datos['__meta__']))
+        return _decodificar(datos, meta['columnas']), meta['info']
+
+
+class CacheResultados:
+    """
+    Cache LRU en disco acotada por tamaño
+
+    Cada entrada es un único .npz escrito de forma atómica (archivo temporal +
+    os.replace). Un acierto actualiza el mtime del archivo; al superar
+    `max_bytes` se borran las entradas con mtime más antiguo.
+    """
+
+    def __init__(self, directorio, max_bytes=2 * 1024 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def __getstate__(self):
+        # Se copia a los procesos worker junto con el procesador (sin el lock)
+        estado = self.__dict__.copy()
+        del estado['_lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(archivo, tipo):
+        """
+        Hash SHA-256 del contenido del archivo + tipo + versión de formato
+
+        Args:
+            archivo: Ruta o objeto tipo archivo (se deja en la posición 0)
+            tipo: Identificador del procesador
+        """
+        h = hashlib.sha256()
+        h.update(f'{tipo}|{VERSION_CACHE}|'.encode('utf-8'))
+
+        propio = isinstance(archivo, (str, bytes)) or hasattr(archivo, '__fspath__')
+        f = open(archivo, 'rb') if propio else archivo
+        try:
+            f.seek(0)
+            for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b''):
+                h.update(bloque)
+        finally:
+            if propio:
+                f.close()
+            else:
+                f.seek(0)
+
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + EXTENSION)
+
+    def obtener(self, clave):
+        """
+        Returns:
+            tuple (DataFrame, info) o None si no está en cache
+        """
+        ruta = self._ruta(clave)
+        try:
+            df, info = leer_frame(ruta)
+            os.utime(ruta)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de cache ilegible {clave[:12]}: {e}")
+            self._borrar(ruta)
+            return None
+
+        return df, info
+
+    def guardar(self, clave, df, info):
+        """Guarda el frame normalizado y aplica el límite de tamaño"""
+        guardar_frame(self._ruta(clave), df, info)
+        self._evictar()
+
+    def _evictar(self):
+        """Borra las entradas menos usadas (mtime más antiguo) hasta caber en max_bytes"""
+        with self._lock:
+            entradas = []
+            total = 0
+            for entrada in os.scandir(self.directorio):
+                if not entrada.name.endswith(EXTENSION):
+                    continue
+                try:
+                    st = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, entrada.path))
+                total += st.st_size
+
+            for _mtime, tamano, ruta in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                self._borrar(ruta)
+                total -= tamano
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
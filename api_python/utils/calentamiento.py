@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Calentamiento de los procesadores al arrancar
+Pasa un libro sintético mínimo (armado en memoria con las columnas de cada
+procesador) por todo el camino de procesamiento, para que la primera subida
+real no pague imports diferidos, compilación de regex ni arranque de workers.
+"""
+
+import io
+import logging
+import time
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+from utils.excel_utils import ExcelUtils
+from utils.serializador import SerializadorJSON
+
+logger = logging.getLogger(__name__)
+
+FILAS_SINTETICAS = 3
+
+UOMS = ['UN', 'CJ', 'PL']
+
+
+def libro_sintetico(columnas=None, status_validos=None, filas=FILAS_SINTETICAS):
+    """
+    Libro .xlsx en memoria con hojas 'Resumen' y 'Detail'
+
+    Args:
+        columnas: Dict nombre -> {'col': letra, 'tipo': ...} (COLUMNAS del procesador)
+        status_validos: Valores de STATUS que deben pasar el filtro
+
+    Returns:
+        bytes del archivo
+    """
+    posiciones = {}
+    for nombre, info in (columnas or {}).items():
+        indice = ExcelUtils.excel_col_to_index(info['col'])
+        if indice >= 0:
+            posiciones[nombre] = (indice, info.get('tipo'))
+    ancho = max((indice for indice, _ in posiciones.values()), default=0) + 1
+
+    libro = Workbook(write_only=True)
+    libro.create_sheet('Resumen').append(['Calentamiento'])
+    hoja = libro.create_sheet('Detail')
+    hoja.append([f'COL{i}' for i in range(ancho)])
+
+    for i in range(filas):
+        fila = [None] * ancho
+        for nombre, (indice, tipo) in posiciones.items():
+            if nombre == 'STATUS' and status_validos:
+                fila[indice] = status_validos[0]
+            elif nombre == 'UOM':
+                fila[indice] = UOMS[i % len(UOMS)]
+            elif tipo == 'float':
+                fila[indice] = f'{i + 1}.000,00000'
+            elif tipo == 'date':
+                fila[indice] = datetime(2024, 1, 1) + timedelta(days=i)
+            else:
+                fila[indice] = f'{nombre}{i % 2}'
+        hoja.append(fila)
+
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def calentar(procesadores, ejecutar=None):
+    """
+    Procesa un libro sintético con cada procesador y serializa la respuesta
+
+    Args:
+        procesadores: Dict tipo -> procesador
+        ejecutar: Callable opcional (funcion, **kwargs) para correr en el pool
+                  de procesos (ej: EjecutorProcesos.ejecutar)
+
+    Returns:
+        Dict tipo -> segundos
+    """
+    tiempos = {}
+    for tipo, procesador in procesadores.items():
+        inicio = time.perf_counter()
+        try:
+            contenido = libro_sintetico(getattr(procesador, 'COLUMNAS', None),
+                                        getattr(procesador, 'STATUS_VALIDOS', None))
+            # Instancia sin cache: el libro sintético no debe quedar en la cache
+            copia = type(procesador)()
+            kwargs = {'archivo_path': io.BytesIO(contenido), 'request_id': f'calentamiento_{tipo}'}
+            resultado = ejecutar(copia.procesar, **kwargs) if ejecutar else copia.procesar(**kwargs)
+            SerializadorJSON.codificar(resultado)
+        except Exception as e:
+            logger.warning(f"Calentamiento de {tipo} falló: {e}")
+        tiempos[tipo] = round(time.perf_counter() - inicio, 3)
+    return tiempos
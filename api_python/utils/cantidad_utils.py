@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Parseo vectorizado de cantidades (QTYRECEIVED / SHIPPEDQTY)
+Extrae la parte entera de toda la columna con operaciones de array
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMATO_EUROPEO = 'europeo'  # 2.413,00000 -> miles con punto, decimales con coma
+FORMATO_PLANO = 'plano'      # 2413.00000  -> decimales con punto
+
+# Un punto seguido de algo distinto de exactamente 3 dígitos no puede ser
+# separador de miles: la columna usa el punto como decimal
+_RE_DECIMAL_PLANO = r'^\s*[+-]?\d*\.(?:\d{0,2}|\d{4,})\s*$'
+
+
+class CantidadUtils:
+    """Conversión de columnas de cantidad a enteros"""
+
+    @staticmethod
+    def detectar_formato(textos):
+        """
+        Detecta el formato numérico de una columna de textos
+
+        Args:
+            textos: pd.Series de cadenas
+
+        Returns:
+            FORMATO_EUROPEO si alguna cadena usa coma o si los puntos solo
+            aparecen como separador de miles; FORMATO_PLANO en otro caso
+        """
+        if textos.str.contains(',', regex=False).any():
+            return FORMATO_EUROPEO
+        if textos.str.contains(_RE_DECIMAL_PLANO, regex=True).any():
+            return FORMATO_PLANO
+        return FORMATO_EUROPEO
+
+    @staticmethod
+    def _textos_a_numero(textos, formato):
+        """Cadenas a float según el formato de la columna (NaN si no se puede)"""
+        if formato == FORMATO_EUROPEO:
+            textos = textos.str.split(',', n=1).str[0].str.replace('.', '', regex=False)
+        return pd.to_numeric(textos, errors='coerce').to_numpy(dtype='float64')
+
+    @staticmethod
+    def parte_entera(serie):
+        """
+        Extrae la parte entera de una columna de cantidades
+
+        Los vacíos valen 0. Los valores que no se pueden interpretar también
+        valen 0 y se marcan en la máscara devuelta, en lugar de loguear fila a
+        fila.
+
+        Args:
+            serie: pd.Series con los valores crudos
+
+        Returns:
+            tuple: (pd.Series int64 con el mismo índice, np.ndarray bool de inválidos)
+        """
+        valores = serie.to_numpy(dtype=object)
+        numeros = np.zeros(len(valores), dtype='float64')
+        vacios = pd.isna(valores)
+
+        tipos = np.frompyfunc(type, 1, 1)(valores)
+        es_texto = np.zeros(len(valores), dtype=bool)
+        for tipo in set(tipos.tolist()):
+            if issubclass(tipo, str):
+                es_texto |= (tipos == tipo)
+        es_otro = ~es_texto & ~vacios
+
+        if es_texto.any():
+            textos = pd.Series(valores[es_texto], dtype=object).str.strip()
+            formato = CantidadUtils.detectar_formato(textos)
+            en_blanco = (textos == '').to_numpy()
+            convertidos = CantidadUtils._textos_a_numero(textos, formato)
+            numeros[es_texto] = np.where(en_blanco, 0, convertidos)
+
+        if es_otro.any():
+            numeros[es_otro] = pd.to_numeric(
+                pd.Series(valores[es_otro], dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+        invalidos = ~np.isfinite(numeros)
+        numeros[invalidos] = 0
+
+        return pd.Series(np.trunc(numeros).astype('int64'), index=serie.index), invalidos
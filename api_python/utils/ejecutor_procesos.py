@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Pool de procesos para ejecutar los procesadores fuera del proceso web
+El parseo del Excel y los bucles de pandas retienen el GIL, así que con hilos
+dos subidas simultáneas se reparten un solo núcleo. Aquí cada llamada corre
+en un proceso worker y el resultado (DataFrame) vuelve por pickle.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+def rss_actual():
+    """
+    Memoria residente del proceso actual en bytes (None si no se puede medir)
+
+    Usa /proc en Linux; si no, psutil cuando está instalado.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def rss_pico():
+    """
+    Pico de memoria residente del proceso en bytes (VmHWM), desde el inicio
+    o desde el último reiniciar_rss_pico(); None si no se puede medir
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def reiniciar_rss_pico():
+    """Lleva VmHWM a la memoria residente actual (Linux); True si se pudo"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class AvisoProgreso:
+    """Callback de progreso serializable: envía los avisos del worker al proceso web"""
+
+    def __init__(self, cola, token):
+        self.cola = cola
+        self.token = token
+
+    def __call__(self, etapa, filas=None, total=None):
+        try:
+            self.cola.put((self.token, etapa, filas, total))
+        except Exception:
+            # El progreso es informativo; nunca debe romper el procesamiento
+            pass
+
+
+def _inicializar_worker(nivel_log, formato_log, archivo_log, trazar_memoria=False):
+    """Configura logging en el worker (no hace nada si ya está configurado)"""
+    handlers = [logging.StreamHandler()]
+    if archivo_log:
+        handlers.append(logging.FileHandler(archivo_log))
+    logging.basicConfig(level=nivel_log, format=formato_log, handlers=handlers)
+    if trazar_memoria:
+        import tracemalloc
+        tracemalloc.start()
+
+
+def _ejecutar_en_worker(funcion, kwargs):
+    """Corre en el worker; devuelve también pid y RSS para decidir el reciclado"""
+    resultado = funcion(**kwargs)
+    return resultado, os.getpid(), rss_actual()
+
+
+class EjecutorProcesos:
+    """
+    Ejecuta llamadas (ej: procesador.procesar_dataframe) en un pool de procesos
+
+    Los workers se reciclan cuando alguno completa `max_trabajos` llamadas o
+    queda con más de `max_rss_mb` de memoria residente: el pool se reemplaza
+    por uno nuevo y el anterior termina lo que tenga en curso antes de cerrar.
+    """
+
+    def __init__(self, workers=2, max_trabajos=50, max_rss_mb=1536, metodo_inicio=None,
+                 archivo_log=None, formato_log=logging.BASIC_FORMAT, trazar_memoria=False):
+        """
+        Args:
+            workers: Procesos worker
+            max_trabajos: Llamadas por worker antes de reciclar (0 = sin límite)
+            max_rss_mb: RSS en MB a partir del cual se recicla (0 = sin límite)
+            metodo_inicio: 'spawn', 'forkserver' o 'fork'; por defecto
+                forkserver donde existe (Linux/Mac) y spawn en Windows
+            archivo_log: Archivo de log compartido con el proceso web
+            formato_log: Formato de las líneas de log de los workers
+            trazar_memoria: Activar tracemalloc en los workers (pico de memoria
+                asignada por etapa; hace más lento el procesamiento)
+        """
+        if metodo_inicio is None:
+            metodo_inicio = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.workers = workers
+        self.max_trabajos = max_trabajos
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else 0
+        self._contexto = multiprocessing.get_context(metodo_inicio)
+        self._args_inicio = (logging.getLogger().getEffectiveLevel(), formato_log, archivo_log, trazar_memoria)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._generacion = 0
+        self._trabajos_por_pid = {}
+        self._manager = None
+        self._cola = None
+        self._avisos = {}
+
+    def _enviar(self, funcion, kwargs):
+        """
+        Envía la llamada al pool actual (creándolo si hace falta)
+
+        El submit va dentro del lock: así _reciclar no puede cerrar el pool
+        entre que se toma y se le envía la llamada.
+
+        Returns:
+            tuple: (Future, generación del pool)
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._contexto,
+                                                 initializer=_inicializar_worker,
+                                                 initargs=self._args_inicio)
+                self._generacion += 1
+                self._trabajos_por_pid = {}
+                logger.info(f"Pool de procesos iniciado (generación {self._generacion}, {self.workers} workers)")
+            generacion = self._generacion
+            try:
+                return self._pool.submit(_ejecutar_en_worker, funcion, kwargs), generacion
+            except BrokenProcessPool as e:
+                # El futuro lleva la generación para que ejecutar recicle el pool roto
+                futuro = Future()
+                futuro.set_exception(e)
+                return futuro, generacion
+
+    def _reciclar(self, generacion, motivo):
+        """Reemplaza el pool si sigue siendo el de `generacion`"""
+        with self._lock:
+            if self._pool is None or generacion != self._generacion:
+                return
+            pool = self._pool
+            self._pool = None
+        logger.info(f"Reciclando pool de procesos (generación {generacion}): {motivo}")
+        # Sin esperar: las llamadas en curso terminan en el pool viejo
+        pool.shutdown(wait=False)
+
+    def _registrar(self, generacion, pid, rss):
+        with self._lock:
+            if generacion != self._generacion:
+                return
+            trabajos = self._trabajos_por_pid.get(pid, 0) + 1
+            self._trabajos_por_pid[pid] = trabajos
+
+        if self.max_trabajos and trabajos >= self.max_trabajos:
+            self._reciclar(generacion, f"worker {pid} completó {trabajos} trabajos")
+        elif self.max_rss and rss and rss >= self.max_rss:
+            self._reciclar(generacion, f"worker {pid} con {rss / 1024 / 1024:.0f} MB de RSS")
+
+    def _cola_progreso(self):
+        """Cola compartida con los workers + hilo que reparte los avisos"""
+        with self._lock:
+            if self._cola is None:
+                self._manager = self._contexto.Manager()
+                self._cola = self._manager.Queue()
+                threading.Thread(target=self._repartir_avisos, args=(self._cola,),
+                                 name='avisos-progreso', daemon=True).start()
+            return self._cola
+
+    def _repartir_avisos(self, cola):
+        while True:
+            try:
+                mensaje = cola.get()
+            except Exception:
+                return
+            if mensaje is None:
+                return
+            token, etapa, filas, total = mensaje
+            callback = self._avisos.get(token)
+            if callback is not None:
+                callback(etapa, filas=filas, total=total)
+
+    def ejecutar(self, funcion, progreso=None, **kwargs):
+        """
+        Ejecuta funcion(**kwargs) en un worker y espera el resultado
+
+        Args:
+            funcion: Callable serializable (función de módulo o método de un
+                     objeto serializable, ej: procesador.procesar_dataframe)
+            progreso: Callback opcional (etapa, filas, total); se pasa a la
+                      función como kwarg 'progreso'
+        """
+        token = None
+        if progreso is not None:
+            token = uuid.uuid4().hex
+            self._avisos[token] = progreso
+            kwargs['progreso'] = AvisoProgreso(self._cola_progreso(), token)
+
+        try:
+            # _enviar no lanza BrokenProcessPool: lo entrega en el futuro
+            futuro, generacion = self._enviar(funcion, kwargs)
+            resultado, pid, rss = futuro.result()
+        except BrokenProcessPool as e:
+            self._reciclar(generacion, 'un worker terminó de forma inesperada')
+            raise RuntimeError(f"El proceso worker terminó de forma inesperada: {e}") from e
+        finally:
+            if token is not None:
+                self._avisos.pop(token, None)
+
+        self._registrar(generacion, pid, rss)
+        return resultado
+
+    def estado(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'generacion': self._generacion,
+                'trabajos_por_worker': dict(self._trabajos_por_pid)
+            }
+
+    def cerrar(self, esperar=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            cola, self._cola = self._cola, None
+            manager, self._manager = self._manager, None
+        if pool is not None:
+            pool.shutdown(wait=esperar)
+        if cola is not None:
+            try:
+                cola.put(None)
+            except Exception:
+                pass
+        if manager is not None:
+            manager.shutdown()
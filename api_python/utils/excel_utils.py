@@ -32,6 +32,16 @@ class ExcelUtils:
         
         return index - 1
     
+    @staticmethod
+    def indice_columna(columna):
+        """
+        Índice 0-based de una columna dada por su letra Excel o ya resuelta
+        (los planes compilados de los procesadores pasan el índice)
+        """
+        if isinstance(columna, int):
+            return columna
+        return ExcelUtils.excel_col_to_index(columna)
+    
     @staticmethod
     def convertir_fecha_excel(valor):
         """
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Normalización vectorizada de fechas
+Misma lógica que ExcelUtils.convertir_fecha_excel, pero por columna:
+seriales Excel en una sola operación, formato de texto detectado una vez
+y cada fecha distinta parseada una sola vez
+"""
+
+import logging
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Mismo orden de prioridad que ExcelUtils.convertir_fecha_excel
+FORMATOS_FECHA = ['%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d', '%m/%d/%y', '%m/%d/%Y']
+
+# Un número solo se toma como fecha Excel si supera este serial (~2009-07-06)
+SERIAL_MINIMO = 40000
+
+ORIGEN_EXCEL = '1899-12-30'
+
+TAMANO_MUESTRA = 200
+
+
+class FechaUtils:
+    """Conversión de columnas de fecha a datetime64 (solo fecha, sin hora)"""
+
+    @staticmethod
+    def detectar_formato(muestra):
+        """
+        Detecta el formato de texto de una columna a partir de una muestra
+
+        Args:
+            muestra: Index/array de cadenas ya limpias (sin hora)
+
+        Returns:
+            El formato de FORMATOS_FECHA que parsea más valores de la muestra
+            (a igualdad, el de mayor prioridad) o None si ninguno sirve
+        """
+        mejor, mejor_aciertos = None, 0
+        for fmt in FORMATOS_FECHA:
+            aciertos = int(pd.to_datetime(muestra, format=fmt, errors='coerce').notna().sum())
+            if aciertos > mejor_aciertos:
+                mejor, mejor_aciertos = fmt, aciertos
+                if aciertos == len(muestra):
+                    break
+        return mejor
+
+    @staticmethod
+    def _desde_seriales(numeros):
+        """Seriales Excel (> SERIAL_MINIMO) a datetime64 en una sola operación"""
+        numeros = pd.to_numeric(pd.Series(numeros), errors='coerce').astype('float64')
+        seriales = numeros.where(numeros > SERIAL_MINIMO)
+        fechas = pd.to_datetime(seriales, unit='D', origin=ORIGEN_EXCEL, errors='coerce')
+        return fechas.dt.floor('D').to_numpy(dtype='datetime64[ns]')
+
+    @staticmethod
+    def _desde_textos(textos):
+        """Cadenas a datetime64: factoriza y parsea cada valor distinto una vez"""
+        limpios = pd.Series(textos, dtype=object).str.strip().str.split(' ', n=1).str[0]
+        codigos, unicos = pd.factorize(limpios)
+        if len(unicos) == 0:
+            return np.full(len(codigos), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        unicos = pd.Index(unicos, dtype=object)
+        detectado = FechaUtils.detectar_formato(unicos[:TAMANO_MUESTRA])
+        orden = ([detectado] if detectado else []) + [f for f in FORMATOS_FECHA if f != detectado]
+
+        parseados = pd.Series(pd.NaT, index=range(len(unicos)), dtype='datetime64[ns]')
+        for fmt in orden:
+            pendientes = parseados.isna().to_numpy()
+            if not pendientes.any():
+                break
+            intento = pd.to_datetime(unicos[pendientes], format=fmt, errors='coerce')
+            parseados[pendientes] = np.asarray(intento, dtype='datetime64[ns]')
+
+        valores = parseados.to_numpy(dtype='datetime64[ns]')
+        resultado = valores[np.where(codigos >= 0, codigos, 0)]
+        resultado[codigos < 0] = np.datetime64('NaT')
+        return resultado
+
+    @staticmethod
+    def _desde_fechas(fechas):
+        """datetime/Timestamp/date a datetime64 truncado al día"""
+        convertidas = pd.to_datetime(pd.Series(fechas, dtype=object), errors='coerce')
+        return convertidas.dt.floor('D').to_numpy(dtype='datetime64[ns]')
+
+    @staticmethod
+    def _categoria(tipo):
+        """Categoría de conversión para un tipo Python/numpy"""
+        if issubclass(tipo, str):
+            return 'texto'
+        if issubclass(tipo, (datetime, date, np.datetime64)):
+            return 'fecha'
+        if issubclass(tipo, (bool, np.bool_)):
+            return None
+        if issubclass(tipo, (int, float, np.integer, np.floating)):
+            return 'numero'
+        return None
+
+    @staticmethod
+    def normalizar_fechas(serie):
+        """
+        Convierte una columna de fechas Excel a datetime64 (sin hora)
+
+        Acepta seriales Excel, cadenas ('dd/mm/yy', 'dd/mm/YYYY', 'YYYY-mm-dd',
+        'mm/dd/yy', 'mm/dd/YYYY', con o sin hora) y datetimes. Lo que no se
+        reconoce como fecha queda como NaT.
+
+        Args:
+            serie: pd.Series con los valores crudos de la columna
+
+        Returns:
+            pd.Series datetime64[ns] con el mismo índice
+        """
+        if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            return serie.dt.floor('D')
+
+        if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            return pd.Series(FechaUtils._desde_seriales(serie.to_numpy()), index=serie.index)
+
+        valores = serie.to_numpy(dtype=object)
+        resultado = np.full(len(valores), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+        # Clasificar por tipo: una comparación de array por cada tipo distinto
+        tipos = np.frompyfunc(type, 1, 1)(valores)
+        mascaras = {categoria: np.zeros(len(valores), dtype=bool) for categoria in ('numero', 'texto', 'fecha')}
+        for tipo in set(tipos.tolist()):
+            categoria = FechaUtils._categoria(tipo)
+            if categoria:
+                mascaras[categoria] |= (tipos == tipo)
+        es_numero, es_texto, es_fecha = mascaras['numero'], mascaras['texto'], mascaras['fecha']
+
+        if es_numero.any():
+            resultado[es_numero] = FechaUtils._desde_seriales(valores[es_numero])
+        if es_texto.any():
+            resultado[es_texto] = FechaUtils._desde_textos(valores[es_texto])
+        if es_fecha.any():
+            resultado[es_fecha] = FechaUtils._desde_fechas(valores[es_fecha])
+
+        return pd.Series(resultado, index=serie.index)
+
+    @staticmethod
+    def limite_filtro(fecha):
+        """
+        Convierte un filtro 'YYYY-MM-DD' (con o sin hora) a Timestamp del día
+
+        Solo se acepta el formato ISO: un '01/03/2024' no se reinterpreta
+        (pandas lo leería como 3 de enero) sino que se rechaza.
+
+        Raises:
+            ValueError: si la fecha del filtro no es 'YYYY-MM-DD'
+        """
+        fecha_limpia = fecha.strip().split(' ')[0]
+        try:
+            limite = datetime.strptime(fecha_limpia, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'Fecha de filtro no válida: {fecha} (formato YYYY-MM-DD)') from None
+        return pd.Timestamp(limite)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Filtros de STATUS y rango de fechas aplicados al leer la hoja
+El lector consulta el filtro por cada fila antes de convertir el resto de
+sus celdas: las filas descartadas no llegan a ser filas del DataFrame.
+
+Es solo una optimización: los filtros de siempre (normalizar y
+aplicar_filtros_fecha) se siguen aplicando después, así que lo que el
+filtro deja pasar (fechas en texto, cuyo formato se detecta por columna)
+se resuelve igual que antes. De las filas descartadas por fecha se guarda
+lo necesario para que las estadísticas no cambien: cuántas son, su rango
+de fechas y su cantidad cruda (el formato de cantidades también se
+detecta sobre toda la columna).
+"""
+
+import logging
+import math
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from utils.fecha_utils import FechaUtils, SERIAL_MINIMO, ORIGEN_EXCEL
+
+logger = logging.getLogger(__name__)
+
+ORIGEN_SERIAL = datetime.fromisoformat(ORIGEN_EXCEL)
+
+# Días representables en datetime64[ns] (fuera de este rango pandas da NaT)
+FECHA_MINIMA = pd.Timestamp.min.ceil('D').to_pydatetime()
+FECHA_MAXIMA = pd.Timestamp.max.floor('D').to_pydatetime()
+
+# Resultado de dia_decidible() cuando la fecha es texto y se decide después
+SIN_DECIDIR = object()
+
+
+def dia_decidible(valor):
+    """
+    Día (datetime a medianoche) de un valor crudo, con las reglas de
+    FechaUtils.normalizar_fechas, si se puede decidir sin ver la columna
+
+    Returns:
+        datetime, None (la columna quedaría NaT) o SIN_DECIDIR (texto)
+    """
+    if isinstance(valor, str):
+        return SIN_DECIDIR
+    if isinstance(valor, date):
+        dia = datetime(valor.year, valor.month, valor.day)
+    elif isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        return None
+    elif not valor > SERIAL_MINIMO or not math.isfinite(valor):
+        return None
+    else:
+        try:
+            dia = ORIGEN_SERIAL + timedelta(days=math.floor(valor))
+        except OverflowError:
+            return None
+    return dia if FECHA_MINIMA <= dia <= FECHA_MAXIMA else None
+
+
+class FiltroLectura:
+    """
+    STATUS válidos y rango de fechas para un lector por filas
+
+    Uso: el lector llama a aceptar(obtener) por fila, donde obtener(nombre)
+    devuelve el valor ya convertido de esa columna; el procesador llama a
+    vaciar() tras cada bloque para recoger lo descartado por fecha.
+    """
+
+    def __init__(self, columna_status=None, status_validos=None, columna_fecha=None,
+                 fecha_desde=None, fecha_hasta=None, claves=(), columna_cantidad=None):
+        """
+        Args:
+            columna_status / status_validos: Filtro de STATUS (texto sin espacios)
+            columna_fecha / fecha_desde / fecha_hasta: Rango 'YYYY-MM-DD' (None = sin límite)
+            claves: Columnas clave; las filas sin ninguna se dejan pasar (las
+                quita la limpieza, no cuentan como filtradas por fecha)
+            columna_cantidad: Cantidad cruda a conservar de las filas descartadas por fecha
+        """
+        self.columna_status = columna_status if status_validos else None
+        self.status_validos = frozenset(status_validos or ())
+        self.columna_fecha = columna_fecha if (fecha_desde or fecha_hasta) else None
+        self.desde = FechaUtils.limite_filtro(fecha_desde).to_pydatetime() if fecha_desde else None
+        self.hasta = FechaUtils.limite_filtro(fecha_hasta).to_pydatetime() if fecha_hasta else None
+        self.claves = list(claves)
+        self.columna_cantidad = columna_cantidad
+
+        self.descartadas_status = 0
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._filas_fecha = 0
+        self._cantidades = []
+        self._fecha_min = None
+        self._fecha_max = None
+
+    @property
+    def activo(self):
+        return self.columna_status is not None or self.columna_fecha is not None
+
+    @property
+    def columnas(self):
+        """Columnas que aceptar() puede consultar"""
+        columnas = [self.columna_status, self.columna_fecha, self.columna_cantidad] + self.claves
+        return [c for c in columnas if c]
+
+    def acepta_status(self, valor):
+        """Mismo criterio que normalizar: str(valor).strip() en STATUS_VALIDOS"""
+        return str(valor).strip() in self.status_validos
+
+    def aceptar(self, obtener):
+        """
+        Decide si la fila pasa
+
+        Args:
+            obtener: Callable nombre -> valor convertido de la fila (None si vacío)
+        """
+        if self.columna_status is not None and not self.acepta_status(obtener(self.columna_status)):
+            self.descartadas_status += 1
+            return False
+
+        if self.columna_fecha is None:
+            return True
+        if self.claves and all(obtener(clave) is None for clave in self.claves):
+            return True
+
+        dia = dia_decidible(obtener(self.columna_fecha))
+        if dia is SIN_DECIDIR:
+            return True
+        if dia is not None:
+            if (self.desde is None or dia >= self.desde) and (self.hasta is None or dia <= self.hasta):
+                return True
+            if self._fecha_min is None or dia < self._fecha_min:
+                self._fecha_min = dia
+            if self._fecha_max is None or dia > self._fecha_max:
+                self._fecha_max = dia
+
+        # Fuera de rango o sin fecha (NaT no pasa un filtro de fechas)
+        self._filas_fecha += 1
+        if self.columna_cantidad:
+            self._cantidades.append(obtener(self.columna_cantidad))
+        return False
+
+    def vaciar(self):
+        """
+        Descartes por fecha desde la última llamada
+
+        Returns:
+            dict con filas_filtradas_fecha, fecha_min y fecha_max ('YYYY-MM-DD'
+            o None) y cantidades (valores crudos de COLUMNA_CANTIDAD)
+        """
+        descartes = {
+            'filas_filtradas_fecha': self._filas_fecha,
+            'fecha_min': self._fecha_min.strftime('%Y-%m-%d') if self._fecha_min else None,
+            'fecha_max': self._fecha_max.strftime('%Y-%m-%d') if self._fecha_max else None,
+            'cantidades': self._cantidades
+        }
+        self._reiniciar()
+        return descartes
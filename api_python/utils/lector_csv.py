@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Lector de CSV por bloques (exportación del WMS)
+Usa el parser C de pandas, lee solo las columnas de COLUMNAS (misma posición
+que la letra Excel) y entrega el archivo en bloques de filas para que el
+procesador filtre y agregue cada uno sin tener el archivo entero en memoria.
+Acepta CSV comprimido con gzip; el separador y la codificación se detectan
+de la primera línea.
+"""
+
+import csv
+import gzip
+import logging
+import os
+
+import pandas as pd
+
+from utils.excel_utils import ExcelUtils
+
+logger = logging.getLogger(__name__)
+
+FIRMA_ZIP = b'PK\x03\x04'          # .xlsx
+FIRMA_OLE = b'\xd0\xcf\x11\xe0'    # .xls
+FIRMA_GZIP = b'\x1f\x8b'
+
+EXTENSIONES_CSV = ('.csv', '.csv.gz', '.gz')
+EXTENSIONES_EXCEL = ('.xlsx', '.xls')
+
+SEPARADORES = [';', ',', '\t', '|']
+
+FILAS_POR_BLOQUE = 200000
+
+BYTES_MUESTRA = 64 * 1024
+
+# tipo de COLUMNAS -> dtype de lectura. Todo entra como texto: las claves
+# conservan los ceros a la izquierda, las cantidades pueden venir en formato
+# europeo (2.413,00000) y las fechas como dd/mm/yy; CantidadUtils y
+# FechaUtils las convierten después, igual que con el Excel.
+DTYPES = {'string': str, 'float': str, 'date': str}
+
+
+def _firma(archivo):
+    archivo.seek(0)
+    firma = archivo.read(4)
+    archivo.seek(0)
+    return firma
+
+
+def _es_excel(firma):
+    return firma.startswith(FIRMA_ZIP) or firma.startswith(FIRMA_OLE)
+
+
+class LectorCsv:
+    """CSV (o CSV.gz) abierto una sola vez, leído por bloques de columnas"""
+
+    def __init__(self, origen):
+        """
+        Args:
+            origen: Ruta al archivo o un objeto tipo archivo (binario)
+        """
+        self._propio = isinstance(origen, (str, bytes)) or hasattr(origen, '__fspath__')
+        self._archivo = open(origen, 'rb') if self._propio else origen
+        self.comprimido = _firma(self._archivo).startswith(FIRMA_GZIP)
+
+        self._archivo.seek(0, os.SEEK_END)
+        self.tamano = self._archivo.tell()
+        self._archivo.seek(0)
+
+        self.separador, self.codificacion, self.ancho = self._detectar()
+
+    @staticmethod
+    def es_csv(origen):
+        """
+        True si el origen no es un libro Excel (ni .xlsx ni .xls)
+
+        Una ruta con extensión .xlsx/.xls nunca va por CSV (si está dañada
+        falla el lector Excel). Las subidas llegan sin nombre: su extensión
+        ya la validó formato_subida.
+        """
+        if isinstance(origen, (str, bytes)) or hasattr(origen, '__fspath__'):
+            if os.fsdecode(origen).lower().endswith(EXTENSIONES_EXCEL):
+                return False
+            with open(origen, 'rb') as archivo:
+                firma = archivo.read(4)
+        else:
+            firma = _firma(origen)
+        return bool(firma) and not _es_excel(firma)
+
+    @staticmethod
+    def formato_subida(nombre, archivo):
+        """
+        Formato de un archivo subido según su extensión, comprobando el contenido
+
+        Solo .csv, .csv.gz y .gz (con un CSV dentro) van por el camino CSV;
+        un .xlsx/.xls tiene que ser de verdad un libro (zip u OLE).
+
+        Args:
+            nombre: Nombre original del archivo
+            archivo: Stream binario de la subida (queda en la posición 0)
+
+        Returns:
+            str: 'csv' o 'excel'
+
+        Raises:
+            ValueError: Extensión no admitida o contenido que no corresponde
+        """
+        nombre = nombre.lower()
+        firma = _firma(archivo)
+        if nombre.endswith(EXTENSIONES_EXCEL):
+            if not _es_excel(firma):
+                raise ValueError(f'Archivo Excel inválido: {nombre} no es un libro .xlsx ni .xls')
+            return 'excel'
+        if not nombre.endswith(EXTENSIONES_CSV):
+            raise ValueError(f"Formato no válido: {nombre.rsplit('.', 1)[-1]}. Solo .xls, .xlsx, .csv, .csv.gz")
+        if nombre.endswith('.gz'):
+            if not firma.startswith(FIRMA_GZIP):
+                raise ValueError(f'Archivo comprimido inválido: {nombre} no es gzip')
+            try:
+                with gzip.GzipFile(fileobj=archivo) as descomprimido:
+                    firma = descomprimido.read(4)
+            except (OSError, EOFError):
+                raise ValueError(f'Archivo comprimido inválido: {nombre}')
+            finally:
+                archivo.seek(0)
+            if _es_excel(firma):
+                raise ValueError(f'Archivo comprimido inválido: {nombre} no contiene un CSV')
+        return 'csv'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+        return False
+
+    def _fuente(self):
+        """Stream de bytes sin comprimir, desde el inicio"""
+        self._archivo.seek(0)
+        if self.comprimido:
+            return gzip.GzipFile(fileobj=self._archivo, mode='rb')
+        return self._archivo
+
+    def _detectar(self):
+        """Separador, codificación y ancho (campos del header) de la primera línea"""
+        muestra = self._fuente().read(BYTES_MUESTRA)
+        self._archivo.seek(0)
+        try:
+            texto = muestra.decode('utf-8-sig')
+            codificacion = 'utf-8-sig'
+        except UnicodeDecodeError as e:
+            # Un carácter cortado al final de la muestra no cuenta
+            if e.start >= len(muestra) - 3:
+                texto = muestra[:e.start].decode('utf-8-sig')
+                codificacion = 'utf-8-sig'
+            else:
+                texto = muestra.decode('latin-1')
+                codificacion = 'latin-1'
+
+        primera = texto.splitlines()[0] if texto else ''
+        separador = max(SEPARADORES, key=primera.count) if primera else ','
+        if primera and not primera.count(separador):
+            separador = ','
+        ancho = len(next(csv.reader([primera], delimiter=separador), []))
+        return separador, codificacion, ancho
+
+    def _posiciones(self, columnas):
+        """nombre -> índice de columna (letras inválidas contra el ancho, como en el Excel)"""
+        posiciones = {}
+        for nombre, columna in columnas.items():
+            indice = ExcelUtils.indice_columna(columna)
+            if indice < 0:
+                indice += self.ancho
+            if 0 <= indice < self.ancho:
+                posiciones[nombre] = indice
+        return posiciones
+
+    def leer_por_bloques(self, columnas, tipos=None, filas_por_bloque=FILAS_POR_BLOQUE, progreso=None,
+                         filtro=None):
+        """
+        Genera DataFrames de hasta filas_por_bloque filas (salta el header)
+
+        Args:
+            columnas: Dict nombre -> letra de columna Excel o su índice 0-based
+            tipos: Dict nombre -> tipo de COLUMNAS ('string', 'float', 'date')
+            progreso: Callable opcional (filas_leidas, total_estimado); el total
+                se estima por los bytes consumidos del archivo
+            filtro: FiltroLectura opcional; se aplica su STATUS sobre el bloque
+                recién parseado. Las fechas del CSV son texto (su formato se
+                detecta por columna), así que el rango lo filtra el procesador
+
+        Yields:
+            DataFrame con las columnas presentes en el archivo
+        """
+        posiciones = self._posiciones(columnas)
+        usadas = sorted(set(posiciones.values()))
+        dtypes = {indice: DTYPES.get((tipos or {}).get(nombre), str) for nombre, indice in posiciones.items()}
+
+        posicion_status = posiciones.get(filtro.columna_status) if filtro is not None else None
+
+        lector = pd.read_csv(
+            self._fuente(), sep=self.separador, header=None, skiprows=1,
+            usecols=usadas, dtype=dtypes, encoding=self.codificacion,
+            encoding_errors='replace', engine='c', chunksize=filas_por_bloque
+        )
+        filas = 0
+        with lector:
+            for bloque in lector:
+                filas += len(bloque)
+                if posicion_status is not None:
+                    # Mismo criterio que normalizar (vacío -> 'nan', no válido)
+                    validos = bloque[posicion_status].astype(object).astype(str).str.strip().isin(
+                        list(filtro.status_validos))
+                    filtro.descartadas_status += int((~validos).sum())
+                    bloque = bloque[validos.to_numpy()]
+                yield pd.DataFrame({
+                    nombre: bloque[indice].astype(object) for nombre, indice in posiciones.items()
+                }, index=bloque.index)
+                if progreso is not None:
+                    leidos = self._archivo.tell()
+                    total = round(filas * self.tamano / leidos) if leidos else None
+                    progreso(filas, max(total, filas) if total else None)
+
+    def leer_tabla(self, filas=None):
+        """
+        Archivo con su header (para módulos sin columnas fijas)
+
+        Args:
+            filas: Leer solo las primeras filas de datos (None = todo el archivo)
+        """
+        return pd.read_csv(self._fuente(), sep=self.separador, encoding=self.codificacion,
+                           encoding_errors='replace', engine='c', dtype=str, nrows=filas)
+
+    def contar_filas(self):
+        """
+        Filas de datos (sin el header) contando líneas, sin separar campos
+
+        Las líneas en blanco no cuentan, como en read_csv; un salto de línea
+        dentro de un campo entre comillas sí (se cuenta de más).
+        """
+        lineas = sum(1 for linea in self._fuente() if linea.strip())
+        self._archivo.seek(0)
+        return max(lineas - 1, 0)
+
+    def cerrar(self):
+        if self._propio and self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
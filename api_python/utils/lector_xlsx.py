@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Lector streaming de hojas XLSX
+Parsea el XML de la hoja de forma incremental y solo convierte a valor
+las celdas de las columnas pedidas
+"""
+
+import logging
+import re
+from array import array
+from datetime import datetime, timedelta
+import xml.etree.ElementTree as ET
+
+from utils.excel_utils import ExcelUtils
+
+logger = logging.getLogger(__name__)
+
+# Valores que pandas.read_excel interpreta como NaN por defecto
+VALORES_NA = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null'
+])
+
+# Formatos de número predefinidos de Excel que son fechas/horas
+FORMATOS_FECHA_PREDEFINIDOS = frozenset(list(range(14, 23)) + list(range(45, 48)))
+
+_RE_LIMPIAR_FORMATO = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+_RE_CODIGO_FECHA = re.compile(r'[dmyhs]', re.IGNORECASE)
+
+EPOCH_1900 = datetime(1899, 12, 30)
+EPOCH_1904 = datetime(1904, 1, 1)
+
+# Cada cuántas filas se avisa el progreso de lectura
+FILAS_POR_AVISO = 10000
+
+# Bytes descomprimidos por lectura al contar filas
+BYTES_POR_LECTURA = 1024 * 1024
+
+_RE_INICIO_HOJA = re.compile(rb'<(\w+:)?sheetData\b')
+_RE_ATRIBUTO_R = re.compile(rb'<(?:\w+:)?row\b[^>]*?\sr="(\d+)"')
+
+
+def _nombre_local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _texto_rico(elem):
+    """Texto de un <si> o <is>: <t> directo o runs <r><t>, sin fonéticos <rPh>"""
+    partes = []
+    for hijo in elem:
+        nombre = _nombre_local(hijo.tag)
+        if nombre == 't':
+            partes.append(hijo.text or '')
+        elif nombre == 'r':
+            for t in hijo:
+                if _nombre_local(t.tag) == 't':
+                    partes.append(t.text or '')
+    return ''.join(partes)
+
+
+def _es_formato_fecha(codigo):
+    """Indica si un código de formato personalizado representa fecha/hora"""
+    if not codigo or codigo.lower() == 'general':
+        return False
+    return bool(_RE_CODIGO_FECHA.search(_RE_LIMPIAR_FORMATO.sub('', codigo)))
+
+
+class TablaCadenas:
+    """
+    Tabla de sharedStrings compacta
+
+    Guarda todas las cadenas en un único buffer de texto con un array de
+    offsets, en lugar de una lista de objetos str (o celdas de openpyxl).
+    Cada cadena se materializa solo cuando una celda pedida la referencia.
+    """
+
+    def __init__(self, buffer='', offsets=None):
+        self._buffer = buffer
+        self._offsets = offsets if offsets is not None else array('q', [0])
+
+    @classmethod
+    def desde_zip(cls, zip_file, ruta):
+        """Construye la tabla leyendo xl/sharedStrings.xml de forma incremental"""
+        if not ruta or ruta not in zip_file.namelist():
+            return cls()
+
+        partes = []
+        offsets = array('q', [0])
+        total = 0
+        with zip_file.open(ruta) as xml:
+            for _evento, elem in ET.iterparse(xml, events=('end',)):
+                if _nombre_local(elem.tag) != 'si':
+                    continue
+                texto = _texto_rico(elem)
+                partes.append(texto)
+                total += len(texto)
+                offsets.append(total)
+                elem.clear()
+
+        return cls(''.join(partes), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, indice):
+        return self._buffer[self._offsets[indice]:self._offsets[indice + 1]]
+
+
+class TablaCadenasParcial:
+    """
+    sharedStrings leídas a demanda: parsea xl/sharedStrings.xml solo hasta
+    la cadena más alta pedida (para leer unas pocas filas de la hoja sin
+    cargar la tabla entera). Hay que cerrarla.
+    """
+
+    def __init__(self, zip_file, ruta):
+        self._cadenas = []
+        self._xml = zip_file.open(ruta) if ruta and ruta in zip_file.namelist() else None
+        self._eventos = ET.iterparse(self._xml, events=('end',)) if self._xml is not None else iter(())
+
+    def __getitem__(self, indice):
+        while len(self._cadenas) <= indice:
+            for _evento, elem in self._eventos:
+                if _nombre_local(elem.tag) == 'si':
+                    self._cadenas.append(_texto_rico(elem))
+                    elem.clear()
+                    break
+            else:
+                raise IndexError(indice)
+        return self._cadenas[indice]
+
+    def cerrar(self):
+        if self._xml is not None:
+            self._xml.close()
+            self._xml = None
+
+
+def leer_estilos_fecha(zip_file, ruta):
+    """
+    Devuelve los índices de cellXfs cuyo formato de número es fecha/hora
+
+    Es lo que usa openpyxl para decidir si un número se convierte a datetime.
+    """
+    if not ruta or ruta not in zip_file.namelist():
+        return frozenset()
+
+    raiz = ET.fromstring(zip_file.read(ruta))
+    formatos_fecha = set(FORMATOS_FECHA_PREDEFINIDOS)
+    estilos = set()
+
+    for elem in raiz:
+        nombre = _nombre_local(elem.tag)
+        if nombre == 'numFmts':
+            for fmt in elem:
+                if _es_formato_fecha(fmt.get('formatCode')):
+                    formatos_fecha.add(int(fmt.get('numFmtId')))
+        elif nombre == 'cellXfs':
+            for indice, xf in enumerate(elem):
+                if int(xf.get('numFmtId', 0)) in formatos_fecha:
+                    estilos.add(indice)
+
+    return frozenset(estilos)
+
+
+class LectorXlsx:
+    """
+    Lector incremental de una hoja XLSX por columnas
+
+    Recorre <sheetData> con iterparse y libera cada fila al terminarla, de
+    modo que la memoria depende de las columnas pedidas y no del ancho de la
+    hoja. Los valores siguen las mismas reglas que pandas.read_excel con
+    openpyxl (números enteros como int, fechas con estilo como datetime,
+    cadenas vacías o 'NULL' como NaN).
+    """
+
+    def __init__(self, zip_file, ruta_hoja, cadenas=None, estilos_fecha=frozenset(), fecha1904=False):
+        self.zip_file = zip_file
+        self.ruta_hoja = ruta_hoja
+        self.cadenas = cadenas if cadenas is not None else TablaCadenas()
+        self.estilos_fecha = estilos_fecha
+        self.epoch = EPOCH_1904 if fecha1904 else EPOCH_1900
+
+    def _convertir(self, celda, tipo):
+        """Convierte una celda <c> a valor Python (None si está vacía)"""
+        if tipo == 'inlineStr':
+            for hijo in celda:
+                if _nombre_local(hijo.tag) == 'is':
+                    texto = _texto_rico(hijo)
+                    return None if texto in VALORES_NA else texto
+            return None
+
+        v = None
+        for hijo in celda:
+            if _nombre_local(hijo.tag) == 'v':
+                v = hijo.text
+                break
+        if v is None:
+            return None
+
+        if tipo == 's':
+            texto = self.cadenas[int(v)]
+            return None if texto in VALORES_NA else texto
+        if tipo is None or tipo == 'n':
+            estilo = celda.get('s')
+            if estilo is not None and int(estilo) in self.estilos_fecha:
+                return self.epoch + timedelta(days=float(v))
+            try:
+                return int(v)
+            except ValueError:
+                numero = float(v)
+                return int(numero) if numero.is_integer() else numero
+        if tipo == 'b':
+            return v == '1'
+        if tipo == 'd':
+            return datetime.fromisoformat(v.rstrip('Z'))
+        # 'str' (fórmula) y 'e' (error)
+        return None if v in VALORES_NA else v
+
+    def leer_filas(self, limite):
+        """
+        Primeras filas de la hoja, todas las columnas, como las arma pandas
+        con openpyxl antes de inferir los tipos (ver read_excel)
+
+        Las celdas vacías quedan como '', se recortan las celdas vacías al
+        final de cada fila y las filas se completan hasta el mismo ancho.
+        Las filas vacías al final solo se recortan si la hoja termina dentro
+        del límite; si sigue con datos, se completan hasta limite filas (como
+        las primeras filas de read_excel sobre la hoja entera). Deja de
+        parsear en la primera fila con valores pasado el límite, así que el
+        costo no depende del largo de la hoja.
+
+        Args:
+            limite: Filas de la hoja a leer (1-based, incluye el header)
+
+        Returns:
+            tuple: (lista de filas, última fila de <dimension> o None si la
+                    hoja no la declara, True si se llegó al final de la hoja)
+        """
+        filas = []
+        completa = True
+        ultima_dimension = None
+        indice_letras = {}
+        sheet_data = None
+        fila_actual = 0
+
+        with self.zip_file.open(self.ruta_hoja) as xml:
+            for evento, elem in ET.iterparse(xml, events=('start', 'end')):
+                nombre_tag = _nombre_local(elem.tag)
+
+                if evento == 'start':
+                    if nombre_tag == 'sheetData':
+                        sheet_data = elem
+                    continue
+
+                if nombre_tag == 'dimension':
+                    ultima_celda = elem.get('ref', '').split(':')[-1]
+                    digitos = ultima_celda.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz$')
+                    ultima_dimension = int(digitos) if digitos.isdigit() else None
+                    continue
+
+                if nombre_tag != 'row':
+                    continue
+
+                r = elem.get('r')
+                fila_actual = int(r) if r else fila_actual + 1
+
+                valores = []
+                posicion = -1
+                for celda in elem:
+                    ref = celda.get('r')
+                    if ref:
+                        letras = ref.rstrip('0123456789')
+                        posicion = indice_letras.get(letras)
+                        if posicion is None:
+                            posicion = indice_letras[letras] = ExcelUtils.excel_col_to_index(letras)
+                    else:
+                        posicion += 1
+                    tipo = celda.get('t')
+                    valor = None if tipo == 'e' else self._convertir(celda, tipo)
+                    if valor is not None:
+                        valores.extend([''] * (posicion - len(valores)))
+                        valores.append(valor)
+
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+                if fila_actual > limite:
+                    # Filas vacías (solo con estilo) después del límite no cuentan
+                    if valores:
+                        completa = False
+                        break
+                    continue
+                while len(filas) < fila_actual - 1:
+                    filas.append([])
+                filas.append(valores)
+
+        if completa:
+            while filas and not filas[-1]:
+                filas.pop()
+        else:
+            filas.extend([] for _ in range(limite - len(filas)))
+        ancho = max((len(fila) for fila in filas), default=0)
+        return [fila + [''] * (ancho - len(fila)) for fila in filas], ultima_dimension, completa
+
+    def contar_filas(self):
+        """
+        Última fila (1-based) con algún valor, sin parsear el XML ni convertir
+        celdas: recorre los bytes de <sheetData> buscando las etiquetas <v> e
+        <is> y el número de la fila que las contiene
+
+        Returns:
+            int (0 si la hoja no tiene valores)
+        """
+        prefijo = None
+        etiqueta_fila = None
+        etiquetas_valor = ()
+        fila_actual = 0
+        ultima = 0
+        resto = b''
+
+        def numero_fila(bloque, posicion, base):
+            # r="..." de la etiqueta <row> en posicion; sin r, se cuentan las filas
+            coincidencia = _RE_ATRIBUTO_R.match(bloque, posicion)
+            if coincidencia:
+                return int(coincidencia.group(1))
+            return base + bloque.count(etiqueta_fila, 0, posicion + 1)
+
+        with self.zip_file.open(self.ruta_hoja) as xml:
+            while True:
+                leido = xml.read(BYTES_POR_LECTURA)
+                texto = resto + leido
+                # Se procesa hasta la última etiqueta completa
+                corte = texto.rfind(b'<') if leido else len(texto)
+                if corte <= 0 and leido:
+                    resto = texto
+                    continue
+                bloque, resto = texto[:corte], texto[corte:]
+
+                if prefijo is None:
+                    inicio = _RE_INICIO_HOJA.search(bloque)
+                    if inicio is None:
+                        # Todavía en el encabezado de la hoja
+                        if not leido:
+                            break
+                        continue
+                    prefijo = inicio.group(1) or b''
+                    etiqueta_fila = b'<' + prefijo + b'row'
+                    etiquetas_valor = (b'<' + prefijo + b'v>', b'<' + prefijo + b'v ', b'<' + prefijo + b'is>')
+                    bloque = bloque[inicio.end():]
+
+                fin = bloque.find(b'</' + prefijo + b'sheetData')
+                if fin >= 0:
+                    bloque = bloque[:fin]
+
+                base = fila_actual
+                valor = max(bloque.rfind(etiqueta) for etiqueta in etiquetas_valor)
+                if valor >= 0:
+                    posicion = bloque.rfind(etiqueta_fila, 0, valor)
+                    ultima = numero_fila(bloque, posicion, base) if posicion >= 0 else base
+                posicion = bloque.rfind(etiqueta_fila)
+                if posicion >= 0:
+                    fila_actual = numero_fila(bloque, posicion, base)
+
+                if fin >= 0 or not leido:
+                    break
+
+        return ultima
+
+    def leer_columnas(self, columnas, fila_inicio=2, progreso=None, filtro=None):
+        """
+        Lee solo las columnas indicadas
+
+        Args:
+            columnas: Dict nombre -> letra de columna Excel ('C', 'AH', ...) o su índice 0-based
+            fila_inicio: Primera fila de datos (1-based); por defecto salta el header
+            progreso: Callable opcional (filas_leidas, total_estimado) llamado
+                cada FILAS_POR_AVISO filas; el total sale de <dimension> (o None)
+            filtro: FiltroLectura opcional; de cada fila se convierten primero
+                las celdas que consulta y, si la descarta, ninguna más
+
+        Returns:
+            Dict nombre -> lista de valores. Como al recortar la hoja completa,
+            se omiten las columnas que quedan fuera del ancho usado de la hoja
+            (con filtro, aunque no haya quedado ninguna fila).
+        """
+        for bloque in self.leer_bloques(columnas, None, fila_inicio, progreso, filtro):
+            return bloque
+        return {}
+
+    def leer_bloques(self, columnas, filas_por_bloque, fila_inicio=2, progreso=None, filtro=None):
+        """
+        Igual que leer_columnas pero entrega la hoja en bloques de filas
+
+        Args:
+            filas_por_bloque: Filas (que pasan el filtro) por bloque; None = un
+                solo bloque al final
+
+        Yields:
+            Dict nombre -> lista de valores del bloque. Con un solo bloque se
+            omiten las columnas fuera del ancho usado de la hoja; en bloques
+            ese ancho no se conoce hasta el final, así que todos llevan las
+            mismas columnas (las vacías, con None). Con filtro el último
+            bloque se entrega aunque quede vacío, para que quien lee recoja
+            los descartes pendientes.
+        """
+        indices = {nombre: ExcelUtils.indice_columna(columna) for nombre, columna in columnas.items()}
+        valores = {nombre: [] for nombre in columnas}
+        indice_letras = {}
+        objetivo = {}
+        resueltos = {}
+        ancho = 0
+        fila_actual = 0
+        total_estimado = None
+        proximo_aviso = fila_inicio + FILAS_POR_AVISO - 1
+        filas_bloque = 0
+        sheet_data = None
+        fila = {}
+        pendientes = {}
+
+        def obtener(nombre):
+            # Valor de la fila actual, convirtiendo la celda solo al pedirlo
+            if nombre not in fila:
+                celda = pendientes.get(nombre)
+                fila[nombre] = self._convertir(celda, celda.get('t')) if celda is not None else None
+            return fila[nombre]
+
+        def indice_columna(letras):
+            indice = indice_letras.get(letras)
+            if indice is None:
+                indice = indice_letras[letras] = ExcelUtils.excel_col_to_index(letras)
+            return indice
+
+        def preparar_objetivo(ancho_dimension):
+            # Índices negativos (letras inválidas) se resuelven contra el ancho
+            # de la hoja, igual que df.iloc[:, idx] sobre la hoja completa
+            for nombre, indice in indices.items():
+                if indice < 0 and ancho_dimension:
+                    indice += ancho_dimension
+                if indice >= 0:
+                    resueltos[nombre] = indice
+                    objetivo.setdefault(indice, []).append(nombre)
+
+        with self.zip_file.open(self.ruta_hoja) as xml:
+            for evento, elem in ET.iterparse(xml, events=('start', 'end')):
+                nombre_tag = _nombre_local(elem.tag)
+
+                if evento == 'start':
+                    if nombre_tag == 'sheetData':
+                        sheet_data = elem
+                        if not objetivo:
+                            preparar_objetivo(0)
+                    continue
+
+                if nombre_tag == 'dimension':
+                    ref = elem.get('ref', '')
+                    ultima_celda = ref.split(':')[-1]
+                    ultima = ultima_celda.rstrip('0123456789')
+                    preparar_objetivo(indice_columna(ultima) + 1 if ultima else 0)
+                    digitos = ultima_celda[len(ultima):]
+                    if digitos:
+                        total_estimado = max(int(digitos) - fila_inicio + 1, 0)
+                    continue
+
+                if nombre_tag != 'row':
+                    continue
+
+                r = elem.get('r')
+                fila_actual = int(r) if r else fila_actual + 1
+
+                if fila_actual >= fila_inicio:
+                    fila = {}
+                    posicion = -1
+                    if filtro is not None:
+                        pendientes = {}
+                    for celda in elem:
+                        ref = celda.get('r')
+                        posicion = indice_columna(ref.rstrip('0123456789')) if ref else posicion + 1
+                        nombres = objetivo.get(posicion)
+                        if nombres is None:
+                            if posicion >= ancho and len(celda):
+                                ancho = posicion + 1
+                            continue
+                        if filtro is not None:
+                            for nombre in nombres:
+                                pendientes[nombre] = celda
+                            continue
+                        valor = self._convertir(celda, celda.get('t'))
+                        if valor is not None:
+                            if posicion >= ancho:
+                                ancho = posicion + 1
+                            for nombre in nombres:
+                                fila[nombre] = valor
+
+                    aceptada = filtro is None or filtro.aceptar(obtener)
+                    if filtro is not None:
+                        for nombre, celda in pendientes.items():
+                            # Las celdas de filas descartadas no se convierten:
+                            # para el ancho cuenta que tengan contenido
+                            con_valor = obtener(nombre) is not None if aceptada or nombre in fila else len(celda)
+                            if con_valor and resueltos[nombre] >= ancho:
+                                ancho = resueltos[nombre] + 1
+                    if aceptada:
+                        for nombre, lista in valores.items():
+                            lista.append(fila.get(nombre))
+                        filas_bloque += 1
+                    if progreso is not None and fila_actual >= proximo_aviso:
+                        progreso(fila_actual - fila_inicio + 1, total_estimado)
+                        proximo_aviso = fila_actual + FILAS_POR_AVISO
+                else:
+                    for celda in elem:
+                        ref = celda.get('r')
+                        if ref and len(celda):
+                            posicion = indice_columna(ref.rstrip('0123456789'))
+                            if posicion >= ancho:
+                                ancho = posicion + 1
+
+                elem.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+                if filas_por_bloque and filas_bloque >= filas_por_bloque:
+                    yield {nombre: lista for nombre, lista in valores.items() if nombre in resueltos}
+                    valores = {nombre: [] for nombre in columnas}
+                    filas_bloque = 0
+
+        if filas_por_bloque:
+            if filas_bloque or filtro is not None:
+                yield {nombre: lista for nombre, lista in valores.items() if nombre in resueltos}
+        else:
+            yield {
+                nombre: lista for nombre, lista in valores.items()
+                if (lista or filtro is not None) and nombre in resueltos and resueltos[nombre] < ancho
+            }
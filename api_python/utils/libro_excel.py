@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Manejador de libros Excel abiertos una sola vez
+Lee el manifiesto del libro (xl/workbook.xml) sin parsear las hojas
+"""
+
+import logging
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from utils.excel_utils import ExcelUtils
+from utils.lector_xlsx import LectorXlsx, TablaCadenas, TablaCadenasParcial, leer_estilos_fecha
+
+logger = logging.getLogger(__name__)
+
+RUTA_WORKBOOK = 'xl/workbook.xml'
+RUTA_RELS_WORKBOOK = 'xl/_rels/workbook.xml.rels'
+
+
+def _nombre_local(tag):
+    """Quita el namespace de un tag XML ('{ns}sheet' -> 'sheet')"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _atributo_local(elem, nombre):
+    """Busca un atributo ignorando su namespace (r:id, id, ...)"""
+    for clave, valor in elem.attrib.items():
+        if _nombre_local(clave) == nombre:
+            return valor
+    return None
+
+
+class LibroExcel:
+    """
+    Libro Excel abierto una sola vez
+
+    Para .xlsx los nombres de hoja salen del manifiesto del libro, sin
+    descomprimir ninguna hoja. La lectura de la hoja usa el mismo handle.
+    Los .xls (binarios) se delegan a pandas.
+    """
+
+    def __init__(self, origen):
+        """
+        Args:
+            origen: Ruta al archivo o un objeto tipo archivo (binario)
+        """
+        self._propio = isinstance(origen, (str, bytes)) or hasattr(origen, '__fspath__')
+        self._archivo = open(origen, 'rb') if self._propio else origen
+        self._zip = None
+        self._excel_file = None
+        self._hojas = None
+        self._rutas_hojas = None
+        self._ruta_cadenas = None
+        self._ruta_estilos = None
+        self._fecha1904 = False
+        self._cadenas = None
+        self._estilos_fecha = None
+
+        self._archivo.seek(0)
+        if zipfile.is_zipfile(self._archivo):
+            self._archivo.seek(0)
+            self._zip = zipfile.ZipFile(self._archivo)
+        self._archivo.seek(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+        return False
+
+    @property
+    def es_xlsx(self):
+        return self._zip is not None
+
+    @property
+    def hojas(self):
+        """Nombres de las hojas en el orden del libro"""
+        if self._hojas is None:
+            if self.es_xlsx:
+                self._leer_manifiesto()
+            else:
+                self._excel_file = pd.ExcelFile(self._archivo)
+                self._hojas = list(self._excel_file.sheet_names)
+        return self._hojas
+
+    def _leer_manifiesto(self):
+        """Lee xl/workbook.xml y sus relaciones para ubicar cada hoja"""
+        rels = {}
+        if RUTA_RELS_WORKBOOK in self._zip.namelist():
+            raiz_rels = ET.fromstring(self._zip.read(RUTA_RELS_WORKBOOK))
+            for rel in raiz_rels:
+                destino = rel.get('Target', '')
+                if destino.startswith('/'):
+                    destino = destino.lstrip('/')
+                else:
+                    destino = posixpath.normpath(posixpath.join('xl', destino))
+                rels[rel.get('Id')] = destino
+
+                tipo = rel.get('Type', '')
+                if tipo.endswith('/sharedStrings'):
+                    self._ruta_cadenas = destino
+                elif tipo.endswith('/styles'):
+                    self._ruta_estilos = destino
+
+        hojas = []
+        rutas = {}
+        raiz = ET.fromstring(self._zip.read(RUTA_WORKBOOK))
+        for elem in raiz.iter():
+            nombre_tag = _nombre_local(elem.tag)
+            if nombre_tag == 'workbookPr':
+                self._fecha1904 = elem.get('date1904', '').lower() in ('1', 'true')
+            if nombre_tag != 'sheet':
+                continue
+            nombre = elem.get('name')
+            hojas.append(nombre)
+            rutas[nombre] = rels.get(_atributo_local(elem, 'id'))
+
+        self._hojas = hojas
+        self._rutas_hojas = rutas
+
+    def ruta_hoja(self, nombre):
+        """Ruta interna (dentro del zip) del XML de una hoja"""
+        if not self.es_xlsx:
+            return None
+        self.hojas
+        return self._rutas_hojas.get(nombre)
+
+    def leer_hoja(self, nombre, header=None):
+        """Lee una hoja completa como DataFrame reutilizando el handle abierto"""
+        if not self.es_xlsx:
+            if self._excel_file is None:
+                self.hojas
+            return self._excel_file.parse(nombre, header=header)
+
+        self._archivo.seek(0)
+        return pd.read_excel(self._archivo, sheet_name=nombre, engine='openpyxl', header=header)
+
+    def leer_columnas(self, nombre, columnas, progreso=None, filtro=None):
+        """
+        Lee solo algunas columnas de una hoja, saltando la fila de header
+
+        Args:
+            nombre: Nombre de la hoja
+            columnas: Dict nombre_columna -> letra Excel o su índice 0-based
+            progreso: Callable opcional (filas_leidas, total_estimado); solo
+                se llama con el lector incremental de .xlsx
+            filtro: FiltroLectura opcional, aplicado por fila al leer; solo
+                lo usa el lector incremental de .xlsx (en .xls se ignora y
+                quedan los filtros posteriores)
+
+        Returns:
+            DataFrame (dtype object) con las columnas presentes en la hoja
+        """
+        if not self.es_xlsx or not self.ruta_hoja(nombre):
+            df = self.leer_hoja(nombre, header=None)
+            resultado = pd.DataFrame()
+            for nombre_col, columna in columnas.items():
+                idx = ExcelUtils.indice_columna(columna)
+                if idx < len(df.columns) and len(df) > 1:
+                    resultado[nombre_col] = df.iloc[1:, idx].reset_index(drop=True)
+            return resultado
+
+        valores = self._lector(nombre).leer_columnas(columnas, progreso=progreso, filtro=filtro)
+        return pd.DataFrame({
+            nombre_col: pd.Series(lista, dtype=object) for nombre_col, lista in valores.items()
+        })
+
+    def leer_columnas_por_bloques(self, nombre, columnas, filas_por_bloque, progreso=None, filtro=None):
+        """
+        leer_columnas en bloques de filas (para no tener la hoja entera en memoria)
+
+        Yields:
+            DataFrame (dtype object) por bloque, con índice global de fila.
+            Los .xls (y hojas sin ruta en el zip) salen en un único bloque.
+        """
+        if not self.es_xlsx or not self.ruta_hoja(nombre):
+            yield self.leer_columnas(nombre, columnas, progreso)
+            return
+
+        inicio = 0
+        lector = self._lector(nombre)
+        for valores in lector.leer_bloques(columnas, filas_por_bloque, progreso=progreso, filtro=filtro):
+            filas = max((len(lista) for lista in valores.values()), default=0)
+            indice = pd.RangeIndex(inicio, inicio + filas)
+            inicio += filas
+            yield pd.DataFrame({
+                nombre_col: pd.Series(lista, dtype=object, index=indice) for nombre_col, lista in valores.items()
+            }, index=indice)
+
+    def leer_vista_previa(self, nombre, filas):
+        """
+        Primeras filas de una hoja (con header) y su total de filas, sin
+        parsear la hoja entera
+
+        Las filas pasan por el mismo TextParser que usa pandas.read_excel, así
+        que los valores son los de read_excel(...).head(filas), filas vacías
+        intermedias incluidas (los tipos se infieren sobre esas filas). El
+        total sale de <dimension>; si la hoja no la declara (o no cuadra con
+        lo leído), de LectorXlsx.contar_filas.
+
+        Returns:
+            tuple: (DataFrame con hasta 'filas' filas, total de filas de datos)
+        """
+        if not self.es_xlsx or not self.ruta_hoja(nombre):
+            df = self.leer_hoja(nombre, header=0)
+            return df.head(filas), len(df)
+
+        # Solo las cadenas que usan esas filas, no la tabla entera
+        cadenas = TablaCadenasParcial(self._zip, self._ruta_cadenas)
+        try:
+            lector = LectorXlsx(self._zip, self.ruta_hoja(nombre), cadenas,
+                                leer_estilos_fecha(self._zip, self._ruta_estilos), self._fecha1904)
+            datos, ultima_dimension, completa = lector.leer_filas(filas + 1)
+        finally:
+            cadenas.cerrar()
+        df = TextParser(datos, header=0, skip_blank_lines=False).read() if datos else pd.DataFrame()
+        if completa:
+            return df, len(df)
+
+        if ultima_dimension is None or ultima_dimension < filas + 1:
+            ultima_dimension = lector.contar_filas()
+        return df, max(ultima_dimension - 1, len(df))
+
+    def tamano_hoja(self, nombre):
+        """Bytes del XML de la hoja sin comprimir (None si no es .xlsx)"""
+        ruta = self.ruta_hoja(nombre)
+        if not ruta:
+            return None
+        try:
+            return self._zip.getinfo(ruta).file_size
+        except KeyError:
+            return None
+
+    def _lector(self, nombre):
+        """LectorXlsx de la hoja, con sharedStrings y estilos cargados una vez"""
+        if self._cadenas is None:
+            self._cadenas = TablaCadenas.desde_zip(self._zip, self._ruta_cadenas)
+            self._estilos_fecha = leer_estilos_fecha(self._zip, self._ruta_estilos)
+        return LectorXlsx(self._zip, self.ruta_hoja(nombre), self._cadenas,
+                          self._estilos_fecha, self._fecha1904)
+
+    def cerrar(self):
+        """Cierra el zip y, si lo abrimos nosotros, el archivo"""
+        if self._excel_file is not None:
+            self._excel_file.close()
+            self._excel_file = None
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._propio and self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tipos compactos para los frames de procesamiento
+Columnas con pocos valores distintos (STORERKEY, UOM, STATUS, TYPE) como
+categorías, claves como texto internado y códigos enteros para agrupar
+sin comparar cadenas fila a fila.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BYTES_POR_MB = 1024 * 1024
+
+
+class MemoriaUtils:
+    """Conversión a dtypes compactos y medición de memoria de frames"""
+
+    @staticmethod
+    def categorizar(serie):
+        """
+        Columna a categoría (códigos + valores distintos en orden de aparición)
+
+        Los vacíos (None/NaN) quedan con código -1: se leen como NaN y
+        serializan igual que antes ('').
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie
+        codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+        categorias = pd.Index(unicos, dtype=object)
+        return pd.Series(pd.Categorical.from_codes(codigos, categorias), index=serie.index, name=serie.name)
+
+    @staticmethod
+    def internar(serie):
+        """
+        Columna object con una sola instancia por valor distinto
+
+        Mantiene dtype y valores (None sigue siendo None, 1000 sigue siendo
+        int): solo cambia que las filas iguales apuntan al mismo objeto.
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype != object:
+            return serie
+        valores = serie.to_numpy(dtype=object)
+        codigos, unicos = pd.factorize(valores)
+        internados = np.asarray(unicos, dtype=object)[codigos]
+        vacios = codigos < 0
+        if vacios.any():
+            internados[vacios] = valores[vacios]
+        return pd.Series(internados, index=serie.index, name=serie.name, dtype=object)
+
+    @staticmethod
+    def codigos_texto(serie):
+        """
+        Códigos enteros que agrupan igual que serie.astype(str) en pandas 2
+        (1000 y '1000' juntos; None -> 'None', NaN -> 'nan')
+
+        Returns:
+            tuple: (np.ndarray int64 de códigos por fila, np.ndarray object
+                    con el texto de cada código)
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy().astype('int64')
+            unicos = serie.cat.categories.to_numpy(dtype=object)
+            valores = None
+        else:
+            valores = serie.to_numpy(dtype=object)
+            codigos, unicos = pd.factorize(valores)
+            codigos = codigos.astype('int64')
+        textos = [str(v) for v in unicos]
+
+        vacios = codigos < 0
+        if vacios.any():
+            # Cada vacío con su propio texto ('None' o 'nan')
+            originales = valores[vacios] if valores is not None else np.full(int(vacios.sum()), np.nan, dtype=object)
+            codigos_vacios, textos_vacios = pd.factorize(np.array([str(v) for v in originales], dtype=object))
+            codigos[vacios] = codigos_vacios + len(textos)
+            textos.extend(textos_vacios)
+
+        # Valores distintos con el mismo texto (1000 y '1000') se unen
+        union, textos_unicos = pd.factorize(np.array(textos, dtype=object))
+        return union[codigos], np.asarray(textos_unicos, dtype=object)
+
+    @staticmethod
+    def mb_frame(df):
+        """
+        Memoria del frame en MB (memory_usage(deep=True): cada fila de una
+        columna object cuenta su objeto, aunque esté compartido)
+        """
+        if df is None:
+            return 0.0
+        return round(float(df.memory_usage(index=True, deep=True).sum()) / BYTES_POR_MB, 2)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tiempos y memoria por etapa del procesamiento y métricas en formato Prometheus
+CronometroEtapas se pone como callback de progreso del procesador (en el
+worker, donde corre el trabajo) y reparte el tiempo de pared y de CPU, la
+memoria residente y su pico entre las etapas que este avisa;
+RegistroMetricas acumula esos valores, filas y bytes por tipo de módulo
+para GET /metrics.
+
+Con varios workers pre-fork (servidor.py) cada proceso expone su propio
+registro, como el resto del estado en memoria de la API.
+"""
+
+import logging
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils.ejecutor_procesos import rss_actual, rss_pico, reiniciar_rss_pico
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de duración
+LIMITES_SEGUNDOS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Límites (MB) del histograma de pico de memoria por procesamiento
+LIMITES_MB = (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096)
+
+BYTES_POR_MB = 1024 * 1024
+
+PREFIJO = 'portal_facturacion'
+
+
+class CronometroEtapas:
+    """
+    Callback de progreso que mide cuánto dura cada etapa y cuánta memoria usa
+
+    Una etapa dura desde su primer aviso hasta el aviso de otra etapa (o
+    detener()); si una etapa se repite se suman sus tramos. El CPU es el del
+    hilo que llama (time.thread_time), así que no se mezcla con otras
+    peticiones atendidas en paralelo.
+
+    La memoria es la residente del proceso: la de cierre de la etapa y su
+    pico, muestreado en cada aviso (la lectura avisa cada pocas miles de
+    filas). Con pico_exclusivo (un worker que atiende un solo
+    procesamiento) el pico es el exacto del kernel (VmHWM), reiniciado en
+    cada cambio de etapa. Si tracemalloc está activo se agrega además el
+    pico de memoria asignada por Python y numpy en la etapa.
+    """
+
+    def __init__(self, progreso=None, etapa_inicial=None, pico_exclusivo=False):
+        """
+        Args:
+            progreso: Callback (etapa, filas=None, total=None) al que se reenvían los avisos
+            etapa_inicial: Etapa a la que se carga el tiempo antes del primer aviso
+            pico_exclusivo: El proceso solo corre este procesamiento (pool de procesos)
+        """
+        self.progreso = progreso
+        self.filas_leidas = 0
+        self.pico_exclusivo = pico_exclusivo and reiniciar_rss_pico()
+        self._etapas = OrderedDict()
+        self._actual = None
+        self._marca = None
+        self._pico = 0
+        if etapa_inicial:
+            self._cambiar(etapa_inicial)
+
+    def __call__(self, etapa, filas=None, total=None):
+        if etapa != self._actual:
+            self._cambiar(etapa)
+        else:
+            self._pico = max(self._pico, rss_actual() or 0)
+        if etapa == 'lectura' and filas:
+            self.filas_leidas = max(self.filas_leidas, filas)
+        if self.progreso is not None:
+            self.progreso(etapa, filas=filas, total=total)
+
+    def _cambiar(self, etapa):
+        """Cierra el tramo de la etapa actual y empieza uno de 'etapa'"""
+        ahora = (time.perf_counter(), time.thread_time())
+        rss = rss_actual() or 0
+        if self._actual is not None:
+            pico = max(self._pico, rss, (rss_pico() or 0) if self.pico_exclusivo else 0)
+            asignado = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            self._sumar(self._actual, {
+                'segundos': ahora[0] - self._marca[0],
+                'cpu_segundos': ahora[1] - self._marca[1],
+                'rss_mb': rss / BYTES_POR_MB,
+                'rss_pico_mb': pico / BYTES_POR_MB,
+                'asignado_pico_mb': asignado / BYTES_POR_MB if asignado is not None else None
+            })
+        if self.pico_exclusivo:
+            reiniciar_rss_pico()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._actual = etapa
+        self._marca = ahora
+        self._pico = rss
+
+    def _sumar(self, etapa, tramo):
+        """Tiempos sumados; memoria: la del último tramo y el mayor pico"""
+        medida = self._etapas.setdefault(etapa, {'segundos': 0.0, 'cpu_segundos': 0.0})
+        medida['segundos'] += tramo['segundos']
+        medida['cpu_segundos'] += tramo['cpu_segundos']
+        if tramo.get('rss_mb'):
+            medida['rss_mb'] = tramo['rss_mb']
+        for clave in ('rss_pico_mb', 'asignado_pico_mb'):
+            if tramo.get(clave) is not None:
+                medida[clave] = max(medida.get(clave, 0.0), tramo[clave])
+
+    @contextmanager
+    def medir(self, etapa):
+        """
+        Carga a 'etapa' el tiempo del bloque with, sin avisar al progreso
+
+        Para etapas que se intercalan (lectura por bloques) y cuyo aviso
+        haría retroceder el porcentaje de un trabajo.
+        """
+        previa = self._actual
+        self._cambiar(etapa)
+        try:
+            yield
+        finally:
+            self._cambiar(previa)
+
+    def agregar(self, medicion):
+        """Suma una medición de otro cronómetro (ver resumen())"""
+        for etapa, tramo in (medicion or {}).get('etapas', {}).items():
+            self._sumar(etapa, tramo)
+        self.filas_leidas = max(self.filas_leidas, (medicion or {}).get('filas_leidas', 0))
+
+    def detener(self):
+        """Cierra la etapa en curso"""
+        self._cambiar(None)
+
+    def etapas(self):
+        """
+        Etapa -> {'segundos', 'cpu_segundos', 'rss_mb', 'rss_pico_mb' y, con
+        tracemalloc, 'asignado_pico_mb'} hasta ahora (sin la etapa en curso)
+        """
+        return OrderedDict(
+            (etapa, {clave: round(valor, 4 if clave.endswith('segundos') else 1)
+                     for clave, valor in medida.items()})
+            for etapa, medida in self._etapas.items()
+        )
+
+    def rss_pico_mb(self):
+        """Mayor pico de memoria residente entre las etapas medidas"""
+        return max((medida.get('rss_pico_mb', 0.0) for medida in self._etapas.values()), default=0.0)
+
+    def resumen(self):
+        """Dict serializable (viaja por pickle desde el worker)"""
+        return {'etapas': dict(self.etapas()), 'filas_leidas': self.filas_leidas}
+
+
+def ejecutar_medido(metodo, progreso=None, etapa_unica=None, pico_exclusivo=False, **kwargs):
+    """
+    Llama metodo(**kwargs) con un CronometroEtapas como callback de progreso
+
+    Args:
+        metodo: Método del procesador (serializable, para el pool de procesos)
+        progreso: Callback a notificar, o None
+        etapa_unica: Para procesadores que no avisan etapas: todo el tiempo
+            va a esta etapa y el método no recibe 'progreso'
+        pico_exclusivo: Ver CronometroEtapas (True en los workers del pool)
+
+    Returns:
+        tuple: (resultado del método, resumen() del cronómetro)
+    """
+    if etapa_unica:
+        cronometro = CronometroEtapas(etapa_inicial=etapa_unica, pico_exclusivo=pico_exclusivo)
+    else:
+        cronometro = CronometroEtapas(progreso, etapa_inicial='lectura', pico_exclusivo=pico_exclusivo)
+        kwargs['progreso'] = cronometro
+    resultado = metodo(**kwargs)
+    cronometro.detener()
+    return resultado, cronometro.resumen()
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    if valor == int(valor) and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Familia:
+    """Una métrica con sus series por combinación de etiquetas"""
+
+    def __init__(self, nombre, tipo, ayuda, etiquetas, limites=None):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = limites
+        self.series = OrderedDict()
+
+    def sumar(self, valores, cantidad=1):
+        self.series[valores] = self.series.get(valores, 0) + cantidad
+
+    def observar(self, valores, valor):
+        serie = self.series.get(valores)
+        if serie is None:
+            serie = self.series[valores] = {'cubetas': [0] * len(self.limites), 'suma': 0.0, 'cuenta': 0}
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                serie['cubetas'][i] += 1
+        serie['suma'] += valor
+        serie['cuenta'] += 1
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        for valores, serie in self.series.items():
+            if self.tipo != 'histogram':
+                lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(serie)}')
+                continue
+            for limite, cuenta in zip(self.limites, serie['cubetas']):
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {cuenta}')
+            infinito = 'le="+Inf"'
+            lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, infinito)} {serie["cuenta"]}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(serie["suma"])}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {serie["cuenta"]}')
+        return lineas
+
+
+class RegistroMetricas:
+    """Métricas de procesamiento por tipo de módulo (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._peticiones = _Familia(f'{PREFIJO}_peticiones_total', 'counter',
+                                    'Procesamientos terminados por tipo y resultado', ('tipo', 'resultado'))
+        self._en_curso = _Familia(f'{PREFIJO}_peticiones_en_curso', 'gauge',
+                                  'Procesamientos en curso por tipo', ('tipo',))
+        self._duracion = _Familia(f'{PREFIJO}_duracion_segundos', 'histogram',
+                                  'Duración total del procesamiento', ('tipo',), LIMITES_SEGUNDOS)
+        self._etapa = _Familia(f'{PREFIJO}_etapa_segundos', 'histogram',
+                               'Tiempo de pared por etapa', ('tipo', 'etapa'), LIMITES_SEGUNDOS)
+        self._etapa_cpu = _Familia(f'{PREFIJO}_etapa_cpu_segundos_total', 'counter',
+                                   'Tiempo de CPU acumulado por etapa', ('tipo', 'etapa'))
+        self._rss_pico = _Familia(f'{PREFIJO}_rss_pico_mb', 'histogram',
+                                  'Pico de memoria residente por procesamiento (MB)', ('tipo',), LIMITES_MB)
+        self._rechazos = _Familia(f'{PREFIJO}_rechazos_memoria_total', 'counter',
+                                  'Procesamientos rechazados por el presupuesto de memoria', ('tipo', 'motivo'))
+        self._filas_leidas = _Familia(f'{PREFIJO}_filas_leidas_total', 'counter',
+                                      'Filas leídas de la hoja o CSV', ('tipo',))
+        self._filas_resultado = _Familia(f'{PREFIJO}_filas_resultado_total', 'counter',
+                                         'Filas del resultado agrupado', ('tipo',))
+        self._bytes_entrada = _Familia(f'{PREFIJO}_bytes_entrada_total', 'counter',
+                                       'Bytes de archivos recibidos', ('tipo',))
+        self._bytes_salida = _Familia(f'{PREFIJO}_bytes_salida_total', 'counter',
+                                      'Bytes de respuestas enviadas', ('tipo',))
+
+    def _familias(self):
+        return [self._peticiones, self._en_curso, self._duracion, self._etapa, self._etapa_cpu,
+                self._rss_pico, self._rechazos, self._filas_leidas, self._filas_resultado,
+                self._bytes_entrada, self._bytes_salida]
+
+    def iniciar(self, tipo):
+        """Un procesamiento de 'tipo' más en curso (cerrar con terminar())"""
+        with self._lock:
+            self._en_curso.sumar((tipo,), 1)
+
+    def terminar(self, tipo):
+        with self._lock:
+            self._en_curso.sumar((tipo,), -1)
+
+    def registrar(self, tipo, resultado, segundos, cronometro=None, bytes_entrada=0, filas_resultado=None):
+        """
+        Registra un procesamiento terminado
+
+        Args:
+            resultado: 'ok' o 'error'
+            segundos: Duración total
+            cronometro: CronometroEtapas con las etapas medidas (worker + API)
+        """
+        with self._lock:
+            self._peticiones.sumar((tipo, resultado))
+            self._duracion.observar((tipo,), segundos)
+            if cronometro is not None:
+                for etapa, tiempos in cronometro.etapas().items():
+                    self._etapa.observar((tipo, etapa), tiempos['segundos'])
+                    self._etapa_cpu.sumar((tipo, etapa), tiempos['cpu_segundos'])
+                self._filas_leidas.sumar((tipo,), cronometro.filas_leidas)
+                if cronometro.rss_pico_mb():
+                    self._rss_pico.observar((tipo,), round(cronometro.rss_pico_mb(), 1))
+            if filas_resultado is not None:
+                self._filas_resultado.sumar((tipo,), filas_resultado)
+            self._bytes_entrada.sumar((tipo,), bytes_entrada or 0)
+
+    def rechazar(self, tipo, motivo):
+        """Cuenta un procesamiento rechazado por memoria ('excede' o 'ocupada')"""
+        with self._lock:
+            self._rechazos.sumar((tipo, motivo))
+
+    def sumar_bytes_salida(self, tipo, cantidad):
+        with self._lock:
+            self._bytes_salida.sumar((tipo,), cantidad)
+
+    def contar_salida(self, tipo, partes):
+        """Envuelve un generador de bytes (NDJSON) sumando lo que se envía"""
+        for parte in partes:
+            self.sumar_bytes_salida(tipo, len(parte))
+            yield parte
+
+    def exponer(self, medidores=None):
+        """
+        Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)
+
+        Args:
+            medidores: Dict nombre -> (ayuda, valor) de gauges sin etiquetas
+                leídos al momento (ej: memoria reservada)
+        """
+        with self._lock:
+            lineas = []
+            for familia in self._familias():
+                lineas.extend(familia.exponer())
+        for nombre, (ayuda, valor) in (medidores or {}).items():
+            lineas.extend([f'# HELP {PREFIJO}_{nombre} {ayuda}', f'# TYPE {PREFIJO}_{nombre} gauge',
+                           f'{PREFIJO}_{nombre} {_numero(valor)}'])
+        return '\n'.join(lineas) + '\n'
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistencia directa del resultado agrupado en las tablas de detalle
+Reemplaza el viaje Python -> PHP -> navegador -> guardar_*.php: el frame
+agrupado se escribe desde la API con executemany en lotes, en una sola
+transacción por factura (borra el detalle anterior e inserta el nuevo).
+
+Destinos (API_DB_DESTINO):
+- 'odbc:<cadena de conexión>'  SQL Server vía pyodbc (fast_executemany)
+- 'sqlite:<ruta>'              SQLite, reemplazo local para pruebas
+"""
+
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Filas por executemany (con fast_executemany el límite de 2100 parámetros
+# por sentencia de SQL Server no aplica: los parámetros viajan como arreglo)
+FILAS_POR_LOTE = 5000
+
+# Tipo -> tabla y columnas (columna en BD, header del resultado, tipo de valor).
+# Mismo mapeo que controller/arcor/guardar_recepcion.php / guardar_despacho.php
+DESTINOS = {
+    'recepcion': {
+        'tabla': '[FacBol].[facturas_recepcion_detalle]',
+        'columnas': [
+            ('receiptkey', 'RECEIPTKEY', 'texto'),
+            ('sku', 'SKU', 'texto'),
+            ('storerkey', 'STORERKEY', 'texto'),
+            ('unidades', 'UNIDADES', 'entero'),
+            ('cajas', 'CAJAS', 'entero'),
+            ('pallets', 'PALLETS', 'entero'),
+            ('status', 'STATUS', 'texto'),
+            ('fecha_recepcion', 'DATERECEIVED', 'fecha'),
+            ('external_receiptkey', 'EXTERNRECEIPTKEY', 'texto'),
+            ('type', 'TYPE', 'texto'),
+        ]
+    },
+    'despacho': {
+        'tabla': '[FacBol].[facturas_despacho_detalle]',
+        'columnas': [
+            ('ORDERKEY', 'ORDERKEY', 'texto'),
+            ('SKU', 'SKU', 'texto'),
+            ('STORERKEY', 'STORERKEY', 'texto'),
+            ('EXTERNORDERKEY', 'EXTERNORDERKEY', 'texto'),
+            ('UNIDADES', 'UNIDADES', 'entero'),
+            ('CAJAS', 'CAJAS', 'entero'),
+            ('PALLETS', 'PALLETS', 'entero'),
+            ('STATUS', 'STATUS', 'texto'),
+            ('ADDDATE', 'ADDDATE', 'fecha'),
+            ('TYPE', 'TYPE', 'texto'),
+        ]
+    }
+}
+
+
+def _valores(serie, tipo):
+    """Columna del frame -> lista de valores Python listos para el driver (vectorizado)"""
+    if tipo == 'entero':
+        return pd.to_numeric(serie, errors='coerce').fillna(0).astype('int64').tolist()
+    if tipo == 'fecha':
+        fechas = pd.to_datetime(serie, errors='coerce')
+        texto = fechas.dt.strftime('%Y-%m-%d')
+        # object antes del where: en un Series de texto (pandas 3) None vuelve a ser NaN
+        return texto.astype(object).where(fechas.notna(), None).tolist()
+    return serie.astype(object).where(serie.notna(), '').astype(str).tolist()
+
+
+def preparar_filas(df, columnas, factura_id):
+    """
+    Filas (tuplas) para executemany: factura_id + columnas en el orden del destino
+
+    Args:
+        df: DataFrame agrupado (columnas HEADERS)
+        columnas: Lista (columna_bd, header, tipo) de DESTINOS
+        factura_id: ID de la cabecera en facturas_cabecera
+    """
+    listas = []
+    for _, header, tipo in columnas:
+        serie = df[header] if header in df.columns else pd.Series('', index=df.index)
+        listas.append(_valores(serie, tipo))
+    return [(factura_id,) + fila for fila in zip(*listas)]
+
+
+class DestinoBulk(ABC):
+    """
+    Destino de escritura masiva sobre una conexión DB-API (paramstyle qmark)
+
+    Las subclases implementan conectar() y, si hace falta, nombre_tabla().
+    """
+
+    def __init__(self, filas_por_lote=FILAS_POR_LOTE):
+        self.filas_por_lote = filas_por_lote
+
+    @abstractmethod
+    def conectar(self):
+        """Nueva conexión DB-API sin autocommit (se cierra al terminar cada factura)"""
+
+    def nombre_tabla(self, tabla):
+        return tabla
+
+    def preparar_cursor(self, cursor):
+        """Ajustes del driver antes del executemany"""
+
+    def reemplazar_detalle(self, tipo, df, factura_id, request_id=None, progreso=None):
+        """
+        Borra el detalle de la factura e inserta el frame, en una transacción
+
+        Args:
+            tipo: Clave de DESTINOS ('recepcion', 'despacho')
+            df: DataFrame agrupado
+            factura_id: ID de la cabecera
+            progreso: Callable opcional (filas_insertadas, total)
+
+        Returns:
+            Dict con factura_id, tabla, registros_guardados, lotes y tiempo_segundos
+        """
+        if tipo not in DESTINOS:
+            raise ValueError(f"Tipo sin tabla de detalle: {tipo}")
+        destino = DESTINOS[tipo]
+        tabla = self.nombre_tabla(destino['tabla'])
+        nombres = ['factura_id'] + [columna for columna, _, _ in destino['columnas']]
+
+        inicio = time.time()
+        filas = preparar_filas(df, destino['columnas'], factura_id)
+        total = len(filas)
+        sql = f"INSERT INTO {tabla} ({', '.join(nombres)}) VALUES ({', '.join('?' * len(nombres))})"
+
+        conexion = self.conectar()
+        lotes = 0
+        try:
+            cursor = conexion.cursor()
+            self.preparar_cursor(cursor)
+            cursor.execute(f"DELETE FROM {tabla} WHERE factura_id = ?", (factura_id,))
+            for desde in range(0, total, self.filas_por_lote):
+                cursor.executemany(sql, filas[desde:desde + self.filas_por_lote])
+                lotes += 1
+                insertadas = min(desde + self.filas_por_lote, total)
+                logger.info(f"[{request_id}] Lote {lotes}: {insertadas}/{total} registros en {tabla}")
+                if progreso is not None:
+                    progreso(insertadas, total)
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.close()
+
+        tiempo = round(time.time() - inicio, 2)
+        logger.info(f"[{request_id}] Factura {factura_id}: {total} registros guardados en {tiempo}s")
+        return {
+            'factura_id': factura_id,
+            'tabla': tabla,
+            'registros_guardados': total,
+            'lotes': lotes,
+            'tiempo_segundos': tiempo
+        }
+
+
+class DestinoODBC(DestinoBulk):
+    """SQL Server vía pyodbc; fast_executemany manda cada lote como arreglo de parámetros"""
+
+    def __init__(self, cadena_conexion, filas_por_lote=FILAS_POR_LOTE):
+        super().__init__(filas_por_lote)
+        self.cadena_conexion = cadena_conexion
+
+    def conectar(self):
+        try:
+            import pyodbc
+        except ImportError:
+            raise RuntimeError("pyodbc no está instalado: pip install pyodbc")
+        return pyodbc.connect(self.cadena_conexion, autocommit=False)
+
+    def preparar_cursor(self, cursor):
+        cursor.fast_executemany = True
+
+
+class DestinoSQLite(DestinoBulk):
+    """SQLite con el mismo esquema de detalle (sin el prefijo [FacBol])"""
+
+    def __init__(self, ruta, filas_por_lote=FILAS_POR_LOTE):
+        super().__init__(filas_por_lote)
+        self.ruta = ruta
+
+    def nombre_tabla(self, tabla):
+        return tabla.split('.')[-1].strip('[]')
+
+    def conectar(self):
+        import sqlite3
+        conexion = sqlite3.connect(self.ruta)
+        tipos = {'texto': 'TEXT', 'entero': 'INTEGER', 'fecha': 'TEXT'}
+        for destino in DESTINOS.values():
+            columnas = ', '.join(f"{columna} {tipos[tipo]}" for columna, _, tipo in destino['columnas'])
+            tabla = self.nombre_tabla(destino['tabla'])
+            conexion.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (factura_id INTEGER, {columnas})")
+            conexion.execute(f"CREATE INDEX IF NOT EXISTS ix_{tabla}_factura ON {tabla} (factura_id)")
+        conexion.commit()
+        return conexion
+
+
+def crear_destino(url, filas_por_lote=FILAS_POR_LOTE):
+    """
+    Destino a partir de API_DB_DESTINO
+
+    Args:
+        url: 'odbc:<cadena>' o 'sqlite:<ruta>' (None/vacío = sin persistencia)
+
+    Returns:
+        DestinoBulk o None
+    """
+    if not url:
+        return None
+    esquema, _, resto = url.partition(':')
+    if esquema == 'odbc':
+        return DestinoODBC(resto, filas_por_lote)
+    if esquema == 'sqlite':
+        return DestinoSQLite(os.path.expanduser(resto), filas_por_lote)
+    raise ValueError(f"Destino de persistencia no soportado: {esquema} (usar 'odbc:' o 'sqlite:')")
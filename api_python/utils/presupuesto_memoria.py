@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Presupuesto global de memoria para los procesamientos en curso
+Antes de parsear, cada procesamiento reserva la memoria que se estima que
+va a usar (del tamaño de la hoja sin comprimir, ver
+ProcesadorBase.planificar_memoria). Si no entra en lo que queda libre se
+prueba el camino por bloques, que es más barato; si tampoco entra, espera
+en cola a que otro termine y, pasado el tiempo de espera, se rechaza con
+un error claro en vez de que el proceso se quede sin memoria.
+
+El presupuesto es por proceso web (con varios workers pre-fork, cada uno
+tiene el suyo).
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BYTES_POR_MB = 1024 * 1024
+
+# Procesadores sin planificar_memoria (leen el libro entero con pandas y
+# openpyxl, que guarda un objeto por celda): memoria ~ FACTOR x bytes del
+# XML de la hoja más grande, o x bytes del archivo si no es .xlsx
+FACTOR_XLSX = 10
+FACTOR_ARCHIVO = 10
+
+
+def planificar(procesador, origen, request_id=None):
+    """
+    Plan de memoria de un procesamiento (ver PresupuestoMemoria.admitir)
+
+    Usa procesador.planificar_memoria si existe; si no (o si falla, ej: el
+    libro no tiene hoja Detail, error que el procesador informa después),
+    estima por el tamaño del libro sin camino por bloques.
+    """
+    planificar_memoria = getattr(procesador, 'planificar_memoria', None)
+    if planificar_memoria is not None:
+        try:
+            return planificar_memoria(origen, request_id)
+        except Exception as e:
+            logger.warning(f"[{request_id}] No se pudo estimar la memoria por la hoja Detail: {e}")
+    return {'completo_mb': round(estimar_libro(origen) / BYTES_POR_MB, 1), 'bloques_mb': None,
+            'por_bloques': False}
+
+
+def estimar_libro(origen):
+    """Bytes estimados de leer el libro (o CSV) entero con pandas"""
+    from utils.libro_excel import LibroExcel
+    from utils import subidas
+
+    with LibroExcel(origen) as libro:
+        if libro.es_xlsx:
+            tamanos = [libro.tamano_hoja(hoja) or 0 for hoja in libro.hojas]
+            if any(tamanos):
+                return max(tamanos) * FACTOR_XLSX
+    return subidas.tamano_origen(origen) * FACTOR_ARCHIVO
+
+
+class MemoriaInsuficiente(Exception):
+    """El procesamiento no entra en el presupuesto de memoria"""
+
+    def __init__(self, mensaje, estimado_mb, disponible_mb, temporal):
+        """
+        Args:
+            temporal: True si es porque hay otros procesamientos en curso
+                (reintentar más tarde); False si no entra nunca
+        """
+        super().__init__(mensaje)
+        self.estimado_mb = estimado_mb
+        self.disponible_mb = disponible_mb
+        self.temporal = temporal
+
+
+class Reserva:
+    """Memoria reservada por un procesamiento; se libera al salir del with"""
+
+    def __init__(self, presupuesto, mb, por_bloques, espera_s, estimado_mb=None):
+        """
+        Args:
+            mb: MB reservados (los del camino elegido)
+            por_bloques: Camino elegido
+            espera_s: Segundos que esperó en cola
+            estimado_mb: Estimación del camino en memoria (None si no aplica)
+        """
+        self.presupuesto = presupuesto
+        self.mb = mb
+        self.por_bloques = por_bloques
+        self.espera_s = espera_s
+        self.estimado_mb = estimado_mb
+        self._liberada = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.liberar()
+        return False
+
+    def liberar(self):
+        if not self._liberada:
+            self._liberada = True
+            self.presupuesto.liberar(self.mb)
+
+
+class PresupuestoMemoria:
+    """MB reservables entre procesamientos concurrentes (thread-safe)"""
+
+    def __init__(self, total_mb, espera_max=30):
+        """
+        Args:
+            total_mb: Memoria para procesamientos en curso (0 = sin límite)
+            espera_max: Segundos que un procesamiento espera en cola por memoria
+        """
+        self.total_mb = total_mb
+        self.espera_max = espera_max
+        self.reservado_mb = 0.0
+        self.en_espera = 0
+        self._condicion = threading.Condition()
+
+    def _tomar(self, mb, espera=0):
+        """Reserva mb si entran (esperando hasta 'espera' segundos); True si se pudo"""
+        limite = time.monotonic() + espera
+        en_cola = False
+        with self._condicion:
+            try:
+                while self.reservado_mb + mb > self.total_mb:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        return False
+                    if not en_cola:
+                        en_cola = True
+                        self.en_espera += 1
+                    self._condicion.wait(restante)
+                self.reservado_mb += mb
+                return True
+            finally:
+                if en_cola:
+                    self.en_espera -= 1
+
+    def liberar(self, mb):
+        with self._condicion:
+            self.reservado_mb = max(0.0, self.reservado_mb - mb)
+            self._condicion.notify_all()
+
+    def admitir(self, plan, request_id=None, espera=None):
+        """
+        Decide cómo correr un procesamiento y reserva su memoria
+
+        Args:
+            plan: Dict de planificar_memoria: completo_mb (camino en memoria;
+                None si no se pudo estimar), bloques_mb (camino por bloques;
+                None si el procesador no lo tiene) y por_bloques (ya decidido
+                por el presupuesto por petición)
+            espera: Segundos máximos en cola (None = espera_max)
+
+        Returns:
+            Reserva (con por_bloques = modo elegido)
+
+        Raises:
+            MemoriaInsuficiente
+        """
+        espera = self.espera_max if espera is None else espera
+        completo, bloques = plan.get('completo_mb'), plan.get('bloques_mb')
+
+        # (MB, por bloques) en orden de preferencia: el camino en memoria es el más rápido
+        opciones = []
+        if not plan.get('por_bloques'):
+            opciones.append((completo or 0.0, False))
+        if bloques is not None:
+            opciones.append((min(bloques, completo) if completo else bloques, True))
+
+        if not self.total_mb:
+            return Reserva(self, 0.0, opciones[0][1] if opciones else False, 0.0, completo)
+
+        factibles = [opcion for opcion in opciones if opcion[0] <= self.total_mb]
+        if not factibles:
+            estimado = min(mb for mb, _ in opciones)
+            raise MemoriaInsuficiente(
+                f"El archivo necesita ~{estimado:.0f} MB para procesarse y el límite de la API es "
+                f"{self.total_mb} MB; divídalo en archivos más chicos o expórtelo como CSV",
+                estimado, self.total_mb, temporal=False)
+
+        # Lo primero que entre ya, sin esperar
+        for mb, por_bloques in factibles:
+            if self._tomar(mb):
+                return self._reserva(mb, por_bloques, 0.0, completo, request_id)
+
+        # En cola por la opción más barata
+        mb, por_bloques = min(factibles)
+        logger.info(f"[{request_id}] Esperando memoria: ~{mb:.0f} MB "
+                    f"({self.reservado_mb:.0f}/{self.total_mb} MB reservados)")
+        inicio = time.monotonic()
+        if self._tomar(mb, espera):
+            return self._reserva(mb, por_bloques, time.monotonic() - inicio, completo, request_id)
+        raise MemoriaInsuficiente(
+            f"No hay memoria disponible para procesar el archivo (~{mb:.0f} MB) con los "
+            f"procesamientos en curso; reintente en unos minutos",
+            mb, self.total_mb - self.reservado_mb, temporal=True)
+
+    def _reserva(self, mb, por_bloques, espera_s, estimado_mb, request_id):
+        logger.info(f"[{request_id}] Memoria reservada: ~{mb:.0f} MB"
+                    f"{' (por bloques)' if por_bloques else ''}, "
+                    f"{self.reservado_mb:.0f}/{self.total_mb} MB en uso")
+        return Reserva(self, mb, por_bloques, espera_s, estimado_mb)
+
+    def estado(self):
+        with self._condicion:
+            return {
+                'total_mb': self.total_mb,
+                'reservado_mb': round(self.reservado_mb, 1),
+                'en_espera': self.en_espera
+            }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Serialización columnar de DataFrames a JSON
+Convierte cada columna una sola vez según su dtype y codifica directo a bytes
+"""
+
+import json
+import logging
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMATO_FECHA = '%d/%m/%Y'
+
+MIME_JSON = 'application/json'
+MIME_NDJSON = 'application/x-ndjson'
+
+# Filas que se serializan por bloque al transmitir en NDJSON
+FILAS_POR_BLOQUE = 5000
+
+
+def _a_nativo(obj):
+    """default= para json.dumps: escalares numpy/pandas a tipos nativos"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return None if np.isnan(obj) else float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f'Tipo no serializable: {type(obj).__name__}')
+
+
+class SerializadorJSON:
+    """Conversión columna a columna y codificación JSON a bytes"""
+
+    @staticmethod
+    def valor_a_json(obj):
+        """Regla escalar: vacío -> '', numpy -> nativo, fecha -> dd/mm/YYYY, resto -> str"""
+        if obj is None or (not isinstance(obj, (str, bytes)) and pd.isna(obj)):
+            return ''
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.floating):
+            return int(obj) if float(obj).is_integer() else float(obj)
+        if isinstance(obj, (np.datetime64, pd.Timestamp, datetime, date)):
+            return pd.Timestamp(obj).strftime(FORMATO_FECHA)
+        return str(obj)
+
+    @staticmethod
+    def _por_valores_distintos(valores, convertir):
+        """Factoriza y convierte cada valor distinto una sola vez"""
+        # El código -1 (NaN) cae en la última posición, que vale ''
+        codigos, unicos = pd.factorize(valores)
+        convertidos = np.empty(len(unicos) + 1, dtype=object)
+        convertidos[:-1] = [convertir(v) for v in unicos]
+        convertidos[-1] = ''
+        return convertidos[codigos].tolist()
+
+    @staticmethod
+    def columna_a_lista(serie):
+        """
+        Convierte una columna a lista de valores JSON según su dtype
+
+        - enteros: int
+        - flotantes: int si no tienen decimales, '' si NaN
+        - fechas: 'dd/mm/YYYY', '' si NaT
+        - categorías / texto / object: cada valor distinto convertido una vez
+        """
+        dtype = serie.dtype
+
+        if pd.api.types.is_bool_dtype(dtype):
+            return serie.astype(str).tolist()
+
+        if pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            return serie.tolist()
+
+        if pd.api.types.is_float_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            arr = serie.to_numpy(dtype='float64')
+            vacios = np.isnan(arr)
+            enteros = np.isfinite(arr) & (arr == np.floor(arr))
+            resultado = np.empty(len(arr), dtype=object)
+            resultado[:] = arr.tolist()
+            resultado[enteros] = arr[enteros].astype('int64').tolist()
+            resultado[vacios] = ''
+            return resultado.tolist()
+
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            codigos, unicos = pd.factorize(serie)
+            convertidos = np.empty(len(unicos) + 1, dtype=object)
+            convertidos[:-1] = np.asarray(unicos.strftime(FORMATO_FECHA), dtype=object)
+            convertidos[-1] = ''
+            return convertidos[codigos].tolist()
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            categorias = [SerializadorJSON.valor_a_json(v) for v in serie.cat.categories]
+            convertidos = np.empty(len(categorias) + 1, dtype=object)
+            convertidos[:-1] = categorias
+            convertidos[-1] = ''
+            return convertidos[serie.cat.codes.to_numpy()].tolist()
+
+        return SerializadorJSON._por_valores_distintos(
+            serie.to_numpy(dtype=object), SerializadorJSON.valor_a_json)
+
+    @staticmethod
+    def dataframe_a_filas(df):
+        """DataFrame a lista de filas (listas) convirtiendo por columna"""
+        if len(df.columns) == 0:
+            return [[] for _ in range(len(df))]
+        columnas = [SerializadorJSON.columna_a_lista(df.iloc[:, i]) for i in range(len(df.columns))]
+        return [list(fila) for fila in zip(*columnas)]
+
+    @staticmethod
+    def codificar(datos):
+        """Codifica a JSON compacto en bytes UTF-8"""
+        return json.dumps(datos, ensure_ascii=False, separators=(',', ':'),
+                          default=_a_nativo).encode('utf-8')
+
+    @staticmethod
+    def ndjson(cabecera, df, filas_por_bloque=FILAS_POR_BLOQUE):
+        """
+        Generador NDJSON: un registro de cabecera, una línea por fila y un cierre
+
+        Cada bloque de filas se serializa y se entrega por separado, así nunca
+        se arma el payload completo en memoria.
+
+        Args:
+            cabecera: Dict con headers, stats, metadata... (se marca registro='cabecera')
+            df: DataFrame agrupado
+        """
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_a_nativo)
+
+        yield encoder.encode(dict(cabecera, registro='cabecera')).encode('utf-8') + b'\n'
+
+        for inicio in range(0, len(df), filas_por_bloque):
+            filas = SerializadorJSON.dataframe_a_filas(df.iloc[inicio:inicio + filas_por_bloque])
+            yield ('\n'.join(map(encoder.encode, filas)) + '\n').encode('utf-8')
+
+        yield encoder.encode({'registro': 'fin', 'filas': len(df)}).encode('utf-8') + b'\n'
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Respuesta binaria columnar del resultado procesado (alternativa a JSON)
+Se elige por Accept:
+- application/vnd.apache.arrow.stream: Arrow IPC (si pyarrow está instalado)
+- application/x-npz: contenedor .npz de numpy (siempre disponible)
+
+En ambos, el texto va codificado como diccionario (códigos + valores únicos,
+con el mismo texto que en el JSON), las fechas como días desde 1970-01-01 y
+los enteros con el tipo más chico que los contiene. La cabecera de la
+respuesta JSON (success, headers, stats, metadata...) viaja como JSON en
+los metadatos del schema (Arrow) o en el array '__meta__' (npz).
+
+Formato npz, por columna (en el orden de '__meta__'.columnas):
+- tipo 'diccionario': '<nombre>' códigos (-1 = vacío) y '<nombre>.valores'
+  (bytes UTF-8)
+- tipo 'fecha': '<nombre>' int32 días desde 1970-01-01 (NULO_FECHA = vacía)
+- tipo 'numero': '<nombre>' tal cual (float NaN = vacío)
+"""
+
+import io
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils.serializador import SerializadorJSON
+
+logger = logging.getLogger(__name__)
+
+MIME_ARROW = 'application/vnd.apache.arrow.stream'
+MIME_NPZ = 'application/x-npz'
+
+# Fecha vacía en el npz (en Arrow va como null)
+NULO_FECHA = np.iinfo('int32').min
+
+
+def _arrow():
+    """pyarrow o None (dependencia opcional)"""
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _entero_minimo(arr):
+    """Baja un array entero al tipo más chico que contiene sus valores"""
+    if len(arr) == 0:
+        return arr.astype('int32')
+    minimo, maximo = arr.min(), arr.max()
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if info.min <= minimo and maximo <= info.max:
+            return arr.astype(dtype)
+    return arr
+
+
+def _columna(serie):
+    """
+    Codifica una columna
+
+    Returns:
+        tuple (tipo, array, valores únicos o None)
+    """
+    dtype = serie.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        fechas = serie.to_numpy(dtype='datetime64[ns]')
+        dias = fechas.astype('datetime64[D]').astype('int64')
+        dias = np.where(np.isnat(fechas), NULO_FECHA, dias).astype('int32')
+        return 'fecha', dias, None
+
+    if pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return 'numero', _entero_minimo(serie.to_numpy()), None
+
+    if (pd.api.types.is_float_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)) \
+            and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return 'numero', serie.to_numpy(), None
+
+    # Texto / object / categorías: diccionario con el mismo texto que el JSON
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+    valores = [str(SerializadorJSON.valor_a_json(v)) for v in unicos]
+    return 'diccionario', _entero_minimo(codigos), valores
+
+
+class SerializadorBinario:
+    """Frame agrupado + cabecera -> bytes Arrow IPC o npz"""
+
+    @staticmethod
+    def formatos():
+        """MIME binarios que se pueden generar en este entorno"""
+        formatos = [MIME_NPZ]
+        if _arrow() is not None:
+            formatos.insert(0, MIME_ARROW)
+        return formatos
+
+    @staticmethod
+    def codificar(cabecera, df, mime):
+        """
+        Args:
+            cabecera: Dict serializable (lo que iría en el JSON, sin 'data')
+            df: DataFrame con las columnas a enviar, en orden
+            mime: MIME_ARROW o MIME_NPZ
+        """
+        if mime == MIME_ARROW:
+            return SerializadorBinario.arrow(cabecera, df)
+        return SerializadorBinario.npz(cabecera, df)
+
+    @staticmethod
+    def npz(cabecera, df):
+        arrays = {}
+        columnas = []
+        for nombre in df.columns:
+            tipo, datos, valores = _columna(df[nombre])
+            arrays[nombre] = datos
+            if valores is not None:
+                # UTF-8 ('S'): el dtype unicode de numpy usa 4 bytes por carácter
+                arrays[f'{nombre}.valores'] = np.array([v.encode('utf-8') for v in valores], dtype=bytes)
+            columnas.append({'nombre': nombre, 'tipo': tipo})
+
+        arrays['__meta__'] = np.array(SerializadorJSON.codificar({
+            'cabecera': cabecera,
+            'columnas': columnas,
+            'filas': len(df),
+            'nulo_fecha': int(NULO_FECHA)
+        }).decode('utf-8'))
+
+        salida = io.BytesIO()
+        np.savez(salida, **arrays)
+        return salida.getvalue()
+
+    @staticmethod
+    def arrow(cabecera, df):
+        pa = _arrow()
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado")
+
+        arrays = []
+        for nombre in df.columns:
+            tipo, datos, valores = _columna(df[nombre])
+            if tipo == 'diccionario':
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(datos, mask=datos < 0), pa.array(valores, type=pa.string())))
+            elif tipo == 'fecha':
+                arrays.append(pa.array(datos, type=pa.date32(), mask=datos == NULO_FECHA))
+            else:
+                arrays.append(pa.array(datos, from_pandas=True))
+
+        tabla = pa.Table.from_arrays(arrays, names=[str(nombre) for nombre in df.columns])
+        tabla = tabla.replace_schema_metadata({
+            'cabecera': SerializadorJSON.codificar(cabecera)
+        })
+
+        salida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue().to_pybytes()
+
+    @staticmethod
+    def leer_npz(contenido):
+        """
+        Inversa de npz() (para clientes Python)
+
+        Returns:
+            tuple (cabecera, DataFrame); texto como object, fechas como datetime64
+        """
+        with np.load(io.BytesIO(contenido), allow_pickle=False) as datos:
+            meta = json.loads(str(datos['__meta__']))
+            df = pd.DataFrame(index=pd.RangeIndex(meta['filas']))
+            for columna in meta['columnas']:
+                nombre = columna['nombre']
+                arr = datos[nombre]
+                if columna['tipo'] == 'diccionario':
+                    tabla = np.append(np.char.decode(datos[f'{nombre}.valores'], 'utf-8').astype(object), '')
+                    df[nombre] = tabla[arr]
+                elif columna['tipo'] == 'fecha':
+                    fechas = arr.astype('int64').astype('datetime64[D]')
+                    fechas[arr == meta['nulo_fecha']] = np.datetime64('NaT')
+                    df[nombre] = fechas.astype('datetime64[ns]')
+                else:
+                    df[nombre] = arr
+        return meta['cabecera'], df
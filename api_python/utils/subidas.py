@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Manejo de archivos subidos sin copias temporales
+Las subidas chicas quedan en memoria; las grandes van directo a un archivo
+temporal con nombre (para poder pasarlo por ruta a un proceso worker) que se
+borra al cerrarse, es decir al terminar la petición.
+"""
+
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivoTemporal(io.FileIO):
+    """Archivo temporal con nombre que se borra al cerrarse"""
+
+    def __init__(self, directorio=None):
+        fd, ruta = tempfile.mkstemp(prefix='subida_', dir=directorio)
+        super().__init__(fd, 'w+b')
+        self.ruta = ruta
+        self._conservar = False
+
+    def conservar(self):
+        """
+        Desvincula el archivo del ciclo de la petición: al cerrar ya no se
+        borra y el llamador pasa a ser el responsable (ver liberar)
+
+        Returns:
+            Ruta del archivo
+        """
+        self.flush()
+        self._conservar = True
+        return self.ruta
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        if not self._conservar:
+            liberar(self.ruta)
+
+
+def crear_stream(tamano_total, max_en_memoria, directorio=None):
+    """
+    Destino de una subida según el tamaño anunciado de la petición
+
+    Args:
+        tamano_total: Content-Length de la petición (None si no se conoce)
+        max_en_memoria: Bytes hasta los que la subida se queda en memoria
+        directorio: Carpeta para las subidas grandes
+    """
+    if tamano_total is not None and tamano_total <= max_en_memoria:
+        return io.BytesIO()
+    return ArchivoTemporal(directorio)
+
+
+def tamano(stream):
+    """Tamaño en bytes de un stream subido (queda en la posición 0)"""
+    stream.seek(0, os.SEEK_END)
+    total = stream.tell()
+    stream.seek(0)
+    return total
+
+
+def tamano_origen(origen):
+    """Tamaño en bytes de un origen de procesador (ruta o stream)"""
+    if isinstance(origen, (str, bytes)) or hasattr(origen, '__fspath__'):
+        return os.path.getsize(origen)
+    return tamano(origen)
+
+
+def origen_para(stream, otro_proceso=False):
+    """
+    Lo que se le pasa al procesador como archivo_path
+
+    En el mismo proceso es el propio stream. Para un proceso worker, las
+    subidas en memoria viajan como BytesIO (se serializa el contenido) y las
+    que están en disco por ruta.
+    """
+    stream.seek(0)
+    if otro_proceso and isinstance(stream, ArchivoTemporal):
+        stream.flush()
+        return stream.ruta
+    return stream
+
+
+def desvincular(stream):
+    """
+    Origen que sobrevive a la petición (para trabajos asíncronos)
+
+    Returns:
+        Ruta (archivo en disco, liberar con liberar()) o un BytesIO propio
+    """
+    if isinstance(stream, ArchivoTemporal):
+        return stream.conservar()
+    stream.seek(0)
+    return io.BytesIO(stream.read())
+
+
+def liberar(origen):
+    """Borra el archivo si el origen es una ruta; los BytesIO no necesitan nada"""
+    if isinstance(origen, str):
+        try:
+            os.remove(origen)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar archivo temporal {origen}: {e}")
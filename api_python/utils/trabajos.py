@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Trabajos asíncronos de procesamiento con progreso por etapa
+POST /jobs/<tipo> encola el trabajo y responde al instante; GET /jobs/<id>
+consulta etapa, filas procesadas, porcentaje y finalmente el resultado
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Mínimo de segundos entre escrituras del estado en el directorio compartido
+INTERVALO_GUARDADO = 0.5
+
+_RE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Etapa -> (porcentaje al empezar, porcentaje al terminar)
+ETAPAS = OrderedDict([
+    ('lectura', (0, 60)),
+    ('extraccion', (60, 70)),
+    ('filtro_status', (70, 75)),
+    ('filtro_fecha', (75, 85)),
+    ('agrupacion', (85, 90)),
+    ('persistencia', (90, 97)),  # Solo si se pidió guardar en la BD (factura_id)
+    ('serializacion', (97, 100)),
+])
+
+_ORDEN_ETAPAS = {etapa: i for i, etapa in enumerate(ETAPAS)}
+
+EN_COLA = 'en_cola'
+PROCESANDO = 'procesando'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+
+def _orden(etapa):
+    return _ORDEN_ETAPAS.get(etapa, -1)
+
+
+class Trabajo:
+    """Estado de un trabajo; se actualiza desde el hilo que lo ejecuta"""
+
+    def __init__(self, tipo, nombre_archivo=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.nombre_archivo = nombre_archivo
+        self.estado = EN_COLA
+        self.etapa = None
+        self.filas_procesadas = 0
+        self.porcentaje = 0
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.actualizado = self.creado
+        self.ruta_estado = None
+        self._guardado = 0
+        self._lock = threading.Lock()
+
+    def progreso(self, etapa, filas=None, total=None):
+        """
+        Callback de progreso para los procesadores
+
+        Args:
+            etapa: Una de ETAPAS
+            filas: Filas procesadas hasta ahora en la etapa
+            total: Total estimado de filas (para avanzar dentro de la etapa)
+        """
+        inicio, fin = ETAPAS.get(etapa, (self.porcentaje, self.porcentaje))
+        porcentaje = inicio
+        if filas is not None and total:
+            porcentaje = inicio + (fin - inicio) * min(filas / total, 1.0)
+
+        with self._lock:
+            # Los avisos de un worker pueden llegar tarde: no retroceder
+            if self.estado in (COMPLETADO, ERROR) or _orden(etapa) < _orden(self.etapa):
+                return
+            cambio_etapa = etapa != self.etapa
+            self.estado = PROCESANDO
+            self.etapa = etapa
+            if filas is not None:
+                self.filas_procesadas = filas
+            self.porcentaje = max(self.porcentaje, round(porcentaje, 1))
+            self.actualizado = time.time()
+
+        self.guardar_estado(forzar=cambio_etapa)
+
+    def finalizar(self, resultado=None, error=None):
+        with self._lock:
+            if error is None:
+                self.estado = COMPLETADO
+                self.resultado = resultado
+                self.porcentaje = 100
+            else:
+                self.estado = ERROR
+                self.error = error
+            self.actualizado = time.time()
+
+        self.guardar_estado(forzar=True)
+
+    def guardar_estado(self, forzar=False):
+        """Escribe a_dict() en ruta_estado (si hay) de forma atómica"""
+        if self.ruta_estado is None or (not forzar and time.time() - self._guardado < INTERVALO_GUARDADO):
+            return
+        # Import diferido: este módulo se carga antes que pandas al arrancar la API
+        from utils.serializador import SerializadorJSON
+
+        self._guardado = time.time()
+        try:
+            fd, temporal = tempfile.mkstemp(dir=os.path.dirname(self.ruta_estado), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(SerializadorJSON.codificar(self.a_dict()))
+            os.replace(temporal, self.ruta_estado)
+        except OSError as e:
+            logger.warning(f"[{self.id}] No se pudo guardar el estado del trabajo: {e}")
+
+    def a_dict(self, incluir_resultado=True):
+        with self._lock:
+            datos = {
+                'job_id': self.id,
+                'tipo': self.tipo,
+                'archivo': self.nombre_archivo,
+                'estado': self.estado,
+                'etapa': self.etapa,
+                'filas_procesadas': self.filas_procesadas,
+                'porcentaje': self.porcentaje,
+                'segundos': round(self.actualizado - self.creado, 2)
+            }
+            if self.error is not None:
+                datos['error'] = self.error
+            if incluir_resultado and self.resultado is not None:
+                datos['resultado'] = self.resultado
+        return datos
+
+
+class GestorTrabajos:
+    """
+    Ejecuta trabajos en un pool de hilos y los conserva un tiempo al terminar
+
+    Los trabajos terminados se descartan tras `ttl` segundos. Si se indica
+    `directorio`, el estado de cada trabajo también se escribe ahí (JSON)
+    para que lo pueda consultar cualquier worker de un servidor pre-fork.
+    """
+
+    def __init__(self, max_workers=2, ttl=900, directorio=None):
+        self.ttl = ttl
+        self.directorio = directorio
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='trabajo')
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, job_id):
+        if not self.directorio or not _RE_ID.match(job_id):
+            return None
+        return os.path.join(self.directorio, f'{job_id}.json')
+
+    def _purgar(self):
+        limite = time.time() - self.ttl
+        with self._lock:
+            for job_id in [j for j, t in self._trabajos.items()
+                           if t.estado in (COMPLETADO, ERROR) and t.actualizado < limite]:
+                del self._trabajos[job_id]
+
+        if self.directorio:
+            for entrada in os.scandir(self.directorio):
+                try:
+                    if entrada.name.endswith('.json') and entrada.stat().st_mtime < limite:
+                        os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
+
+    def enviar(self, trabajo, funcion, *args, **kwargs):
+        """
+        Encola `funcion(trabajo, *args, **kwargs)`; su retorno es el resultado
+
+        Returns:
+            El mismo Trabajo
+        """
+        self._purgar()
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+        trabajo.ruta_estado = self._ruta(trabajo.id)
+        trabajo.guardar_estado(forzar=True)
+
+        def ejecutar():
+            try:
+                trabajo.finalizar(resultado=funcion(trabajo, *args, **kwargs))
+            except Exception as e:
+                logger.error(f"[{trabajo.id}] Trabajo falló: {e}", exc_info=True)
+                trabajo.finalizar(error=str(e))
+
+        self._executor.submit(ejecutar)
+        return trabajo
+
+    def obtener(self, job_id):
+        self._purgar()
+        with self._lock:
+            return self._trabajos.get(job_id)
+
+    def consultar(self, job_id):
+        """
+        Estado del trabajo como dict (ver Trabajo.a_dict), buscándolo también
+        en el directorio compartido si lo ejecuta otro proceso
+
+        Returns:
+            dict o None si no existe o expiró
+        """
+        trabajo = self.obtener(job_id)
+        if trabajo is not None:
+            return trabajo.a_dict()
+
+        ruta = self._ruta(job_id)
+        if not ruta:
+            return None
+        try:
+            with open(ruta, 'rb') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def cerrar(self, esperar=True):
+        self._executor.shutdown(wait=esperar)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Punto de entrada WSGI para servidores de producción
+Ej: gunicorn --preload -w 4 -k gthread --threads 4 wsgi:application
+(desde api_python/). Lo normal es arrancar con servidor.py, que ya arma la
+configuración.
+
+Los componentes pesados (pandas, procesadores) se cargan aquí mismo, antes
+de devolver la aplicación: con --preload quedan importados en el master y
+los workers los heredan por fork.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app as application, cerrar_recursos, iniciar_componentes  # noqa: E402
+
+iniciar_componentes(en_segundo_plano=False)
+
+__all__ = ['application', 'cerrar_recursos']
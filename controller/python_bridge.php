@@ -30,6 +30,23 @@ class PythonBridge {
         }
     }
     
+    /**
+     * Consulta /health cada medio segundo hasta que la API responda
+     * 
+     * @param int $segundos Tiempo máximo de espera
+     * @return bool true si la API respondió a tiempo
+     */
+    private function esperarApi($segundos) {
+        $limite = microtime(true) + $segundos;
+        do {
+            usleep(500000);
+            if ($this->checkHealth()) {
+                return true;
+            }
+        } while (microtime(true) < $limite);
+        return false;
+    }
+    
     /**
      * Procesa un archivo usando la API Python
      * 
@@ -48,12 +65,10 @@ class PythonBridge {
                 // Intentar iniciar la API automáticamente
                 $this->iniciarApiPython();
                 
-                // Esperar un momento
-                sleep(2);
-                
-                // Verificar de nuevo
-                if (!$this->checkHealth()) {
-                    throw new Exception("La API Python no está disponible. Asegúrate de ejecutar 'python api_python/app.py'");
+                // Esperar a que responda /health (escucha antes de cargar pandas;
+                // la subida espera del lado de la API hasta que esté lista)
+                if (!$this->esperarApi(10)) {
+                    throw new Exception("La API Python no está disponible. Asegúrate de ejecutar 'python api_python/servidor.py'");
                 }
             }
             
@@ -81,6 +96,14 @@ class PythonBridge {
             if (!empty($filtros['fecha_hasta'])) {
                 $postFields['fecha_hasta'] = $filtros['fecha_hasta'];
             }
+            // 'cursor': solo vista previa + cursor, el resto se pide con obtenerResultados()
+            if (!empty($filtros['modo'])) {
+                $postFields['modo'] = $filtros['modo'];
+            }
+            // factura_id: la API guarda el detalle directo en la BD (requiere API_DB_DESTINO)
+            if (!empty($filtros['factura_id'])) {
+                $postFields['factura_id'] = $filtros['factura_id'];
+            }
             
             // Hacer petición
             $start = microtime(true);
@@ -158,7 +181,7 @@ class PythonBridge {
             throw new Exception("Error CURL: $error");
         }
         
-        if ($httpCode !== 200) {
+        if ($httpCode < 200 || $httpCode >= 300) {
             throw new Exception("HTTP Error $httpCode: $response");
         }
         
@@ -180,10 +203,10 @@ class PythonBridge {
         // Detectar sistema operativo
         if (strtoupper(substr(PHP_OS, 0, 3)) === 'WIN') {
             // Windows
-            $command = 'start /B python ' . __DIR__ . '/../api_python/app.py > NUL 2>&1';
+            $command = 'start /B python ' . __DIR__ . '/../api_python/servidor.py > NUL 2>&1';
         } else {
             // Linux/Mac
-            $command = 'python3 ' . __DIR__ . '/../api_python/app.py > /dev/null 2>&1 &';
+            $command = 'python3 ' . __DIR__ . '/../api_python/servidor.py > /dev/null 2>&1 &';
         }
         
         // Ejecutar en segundo plano
@@ -221,6 +244,104 @@ class PythonBridge {
         }
     }
     
+    /**
+     * Obtiene una página de un resultado procesado en modo cursor
+     * 
+     * @param string $request_id ID devuelto en 'cursor'
+     * @param int $offset Primera fila
+     * @param int $limit Cantidad de filas
+     * @param array $fields Columnas a devolver (vacío = todas)
+     * @return array Respuesta decodificada
+     */
+    public function obtenerResultados($request_id, $offset = 0, $limit = 1000, $fields = []) {
+        $query = http_build_query([
+            'offset' => $offset,
+            'limit' => $limit,
+            'fields' => implode(',', $fields)
+        ]);
+        
+        try {
+            return $this->makeRequest('GET', '/resultados/' . rawurlencode($request_id) . '?' . $query);
+        } catch (Exception $e) {
+            $this->log("ERROR obteniendo resultados $request_id: " . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => $e->getMessage()
+            ];
+        }
+    }
+    
+    /**
+     * Encola el procesamiento de un archivo y devuelve enseguida el job_id
+     * 
+     * @param string $tipo Tipo de módulo (recepcion, despacho, etc.)
+     * @param array $file Datos del archivo $_FILES['archivo']
+     * @param array $filtros Filtros adicionales (fecha_desde, fecha_hasta, modo, factura_id)
+     * @return array Respuesta con 'job_id' y 'url' para consultarTrabajo()
+     */
+    public function crearTrabajo($tipo, $file, $filtros = []) {
+        $this->log("Encolando trabajo tipo: $tipo - " . $file['name']);
+        
+        $postFields = [
+            'archivo' => new CURLFile($file['tmp_name'], $file['type'], $file['name'])
+        ];
+        foreach (['fecha_desde', 'fecha_hasta', 'modo', 'factura_id'] as $campo) {
+            if (!empty($filtros[$campo])) {
+                $postFields[$campo] = $filtros[$campo];
+            }
+        }
+        
+        try {
+            return $this->makeRequest('POST', '/jobs/' . $tipo, $postFields, true);
+        } catch (Exception $e) {
+            $this->log("ERROR encolando trabajo: " . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => $e->getMessage()
+            ];
+        }
+    }
+    
+    /**
+     * Consulta estado, etapa y porcentaje de un trabajo; al completarse
+     * incluye 'resultado' con la misma forma que procesarArchivo()
+     * 
+     * @param string $job_id ID devuelto por crearTrabajo()
+     * @return array Respuesta decodificada
+     */
+    public function consultarTrabajo($job_id) {
+        try {
+            return $this->makeRequest('GET', '/jobs/' . rawurlencode($job_id));
+        } catch (Exception $e) {
+            $this->log("ERROR consultando trabajo $job_id: " . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => $e->getMessage()
+            ];
+        }
+    }
+    
+    /**
+     * Guarda en la BD el detalle de un resultado en modo cursor, sin que las
+     * filas pasen por PHP ni por el navegador
+     * 
+     * @param string $request_id cursor.request_id devuelto por procesarArchivo()
+     * @param int $factura_id ID de la cabecera ya creada en facturas_cabecera
+     * @return array Respuesta con 'persistencia' (registros_guardados, tiempo_segundos)
+     */
+    public function persistirResultado($request_id, $factura_id) {
+        try {
+            return $this->makeRequest('POST', '/resultados/' . rawurlencode($request_id) . '/persistir',
+                                      ['factura_id' => $factura_id], true);
+        } catch (Exception $e) {
+            $this->log("ERROR guardando resultado $request_id: " . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => $e->getMessage()
+            ];
+        }
+    }
+    
     /**
      * Obtiene información de la API
      */
@@ -33,12 +33,17 @@ if errorlevel 1 (
     echo Instalando dependencias...
     pip install -r requirements.txt
 )
+python -c "import waitress" >nul 2>&1
+if errorlevel 1 (
+    echo Instalando servidor de produccion...
+    pip install waitress==2.1.2
+)
 
 REM Iniciar API
 echo.
 echo Iniciando API en http://127.0.0.1:5000
 echo Presiona Ctrl+C para detener
 echo.
-python api_python/app.py
+python api_python/servidor.py
 
 pause
\ No newline at end of file
@@ -45,7 +45,7 @@ echo.
 REM Instalar dependencias
 echo Instalando dependencias...
 pip install --upgrade pip
-pip install pandas openpyxl flask flask-cors python-dotenv
+pip install pandas openpyxl flask flask-cors python-dotenv waitress
 echo OK
 echo.
 
@@ -67,6 +67,8 @@ echo openpyxl==3.1.2
 echo flask==2.3.2
 echo flask-cors==4.0.0
 echo python-dotenv==1.0.0
+echo waitress==2.1.2
+echo gunicorn==21.2.0; sys_platform != "win32"
 ) > requirements.txt
 echo OK
 echo.
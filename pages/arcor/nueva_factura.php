@@ -1903,6 +1903,7 @@ function debeMostrarModulo($modulo, $modulo_activo, $modulos_completados) {
                             if (valor === '' || valor === null || valor === undefined) {
                                 valor = '0';
                             }
+                            valor = String(valor);
                         }
                         
                         if (typeof valor === 'string' && valor.length > 50) {
@@ -6,6 +6,6 @@ REM Activar entorno virtual
 call venv\Scripts\activate
 
 REM Iniciar API
-python api_python/app.py
+python api_python/servidor.py
 
 pause
\ No newline at end of file
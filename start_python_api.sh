@@ -5,5 +5,13 @@ cd /var/www/html/Portal-Facturacion
 # Activar entorno virtual
 source venv/bin/activate
 
-# Iniciar API
-python api_python/app.py
\ No newline at end of file
+# gunicorn se instala con las dependencias (requirements.txt fija la versión),
+# no al arrancar
+if ! python -c "import gunicorn" > /dev/null 2>&1; then
+    echo "ERROR: gunicorn no está instalado en venv. Instalar con: pip install -r requirements.txt" >&2
+    exit 1
+fi
+
+# Iniciar API (gunicorn pre-fork; configurable con API_WORKERS, API_THREADS,
+# API_BACKLOG, API_KEEPALIVE, API_TIMEOUT...). Desarrollo: python api_python/app.py
+exec python api_python/servidor.py
\ No newline at end of file